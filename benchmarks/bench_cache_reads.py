@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""Compare the speed of reads from the persistent caches.
+
+Every cache holds the same entries (a wallet journal response, under
+distinct keys), which are then all read back, several times. The
+MmapLogCache is measured returning decoded values with get(), and the
+encoded bytes with get_buffer().
+
+    $ python -m benchmarks.bench_cache_reads
+"""
+
+import os
+import shutil
+import tempfile
+
+from evelink.cache.codec import DEFAULT_CODEC
+from evelink.cache.mmaplog import MmapLogCache
+from evelink.cache.shelf import ShelveCache
+from evelink.cache.sqlite import SqliteCache
+from benchmarks.utils import XML_DIR, best_of, report
+
+ENTRIES = 1000
+
+
+def measure(name, cache, payload, read=None):
+    keys = ['key%d' % i for i in range(ENTRIES)]
+    for key in keys:
+        cache.put(key, payload, 3600)
+    if hasattr(cache, 'flush'):
+        cache.flush()
+    read = read or cache.get
+    seconds = best_of(lambda: [read(key) for key in keys], number=3)
+    report(name, seconds / ENTRIES, 1, unit='gets')
+
+
+def main():
+    with open(os.path.join(XML_DIR, 'char', 'wallet_journal.xml')) as f:
+        payload = f.read()
+    print "%d entries of %d bytes" % (ENTRIES, len(payload))
+
+    tempdir = tempfile.mkdtemp()
+    try:
+        for codec_name, codec in (('', None), (' (zlib)', DEFAULT_CODEC)):
+            cache = ShelveCache(os.path.join(tempdir, 'shelve' + codec_name), codec=codec)
+            measure('ShelveCache' + codec_name, cache, payload)
+            cache.close()
+
+            cache = SqliteCache(os.path.join(tempdir, 'sqlite' + codec_name), codec=codec)
+            measure('SqliteCache' + codec_name, cache, payload)
+            cache.close()
+
+            cache = MmapLogCache(os.path.join(tempdir, 'mmaplog' + codec_name), codec=codec)
+            measure('MmapLogCache' + codec_name, cache, payload)
+            measure('MmapLogCache.get_buffer' + codec_name, cache, payload,
+                    read=cache.get_buffer)
+            cache.close()
+    finally:
+        shutil.rmtree(tempdir)
+
+
+if __name__ == '__main__':
+    main()
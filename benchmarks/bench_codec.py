@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""Compare the size and speed of the cache codecs.
+
+The corpus is made of the tests/xml fixtures, with the rows of each
+rowset repeated to make responses of realistic sizes; every copy of a
+row gets a distinct attribute, so that copies aren't identical. Each
+response is encoded and decoded with zlib at several levels, and
+without compression.
+
+    $ python -m benchmarks.bench_codec
+"""
+
+import re
+
+from evelink.cache.codec import Codec
+from benchmarks.utils import best_of, iter_fixtures
+
+COPIES = 50
+LEVELS = (0, 1, 6, 9)
+
+_ROW_RE = re.compile(r'^(\s*<row )(.*?/>)$', re.MULTILINE)
+
+
+def scale(xml, copies=COPIES):
+    """Repeat each single-line row of a response copies times."""
+    def repeat(match):
+        return '\n'.join('%sn="%d" %s' % (match.group(1), i, match.group(2))
+                         for i in range(copies))
+    return _ROW_RE.sub(repeat, xml)
+
+
+def main():
+    corpus = [scale(xml) for _, xml in iter_fixtures()]
+    raw_size = sum(len(xml) for xml in corpus)
+    print "%d responses, %d bytes" % (len(corpus), raw_size)
+
+    for level in LEVELS:
+        codec = Codec(level=level)
+        encoded = [codec.encode(xml) for xml in corpus]
+        size = sum(len(data) for data in encoded)
+        encode = best_of(lambda: [codec.encode(xml) for xml in corpus], number=3)
+        decode = best_of(lambda: [codec.decode(data) for data in encoded], number=3)
+        print "level %d %12d bytes %6.1fx %10.1f us/encode %10.1f us/decode" % (
+            level, size, float(raw_size) / size,
+            encode * 1e6 / len(corpus), decode * 1e6 / len(corpus))
+
+
+if __name__ == '__main__':
+    main()
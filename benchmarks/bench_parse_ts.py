@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""Benchmark api.parse_ts against the time.strptime implementation.
+
+Runs over every timestamp found in the tests/xml fixtures, and checks
+that both implementations agree on all of them.
+
+    $ python -m benchmarks.bench_parse_ts
+"""
+
+import calendar
+import re
+import time
+
+from evelink import api
+from benchmarks.utils import best_of, iter_fixtures, report
+
+TS_RE = re.compile(r'\d{4}-\d\d-\d\d \d\d:\d\d:\d\d')
+
+
+def strptime_parse_ts(v):
+    """The previous implementation of api.parse_ts."""
+    if v == '':
+        return None
+    ts = calendar.timegm(time.strptime(v, "%Y-%m-%d %H:%M:%S"))
+    return ts if ts > 0 else None
+
+
+def uncached_parse_ts(v):
+    api._ts_memo.clear()
+    return api.parse_ts(v)
+
+
+def main():
+    timestamps = []
+    for _, xml in iter_fixtures():
+        timestamps.extend(TS_RE.findall(xml))
+    timestamps.append('0001-01-01 00:00:00')
+
+    for ts in timestamps:
+        assert api.parse_ts(ts) == strptime_parse_ts(ts), ts
+
+    print "%d timestamps (%d distinct)" % (len(timestamps), len(set(timestamps)))
+    for name, func in [
+            ('time.strptime', strptime_parse_ts),
+            ('parse_ts (no memo)', uncached_parse_ts),
+            ('parse_ts', api.parse_ts),
+        ]:
+        seconds = best_of(lambda: [func(ts) for ts in timestamps], number=20)
+        report(name, seconds, len(timestamps), unit='timestamps')
+
+
+if __name__ == '__main__':
+    main()
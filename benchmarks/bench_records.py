@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""Compare the memory use and parse time of the result formats.
+
+The rows of a tests/xml fixture are repeated, with fresh IDs, to make a
+larger rowset, then parsed with result_format='dicts', 'records' and,
+where supported, 'columns'. Memory is the size of the result containers
+(dicts, records and lists); the values they hold are the same in both
+formats and not counted. For columns, it is the size of the arrays and
+string table.
+
+    $ python -m benchmarks.bench_records
+"""
+
+import os
+import sys
+from xml.etree import ElementTree
+
+from evelink.parsing import columns
+from evelink.parsing import contracts
+from evelink.parsing import member_tracking
+from evelink.parsing import orders
+from evelink.parsing import wallet_journal
+from evelink.parsing import wallet_transactions
+from evelink.parsing.formats import COLUMNS, DICTS, RECORDS, Record
+from benchmarks.utils import XML_DIR, best_of, report
+
+ROWS = 2000
+
+CASES = [
+    ('wallet_journal', wallet_journal.parse_wallet_journal,
+        'char/wallet_journal.xml', 'refID'),
+    ('wallet_transactions', wallet_transactions.parse_wallet_transactions,
+        'char/wallet_transactions.xml', 'transactionID'),
+    ('orders', orders.parse_market_orders, 'char/orders.xml', 'orderID'),
+    ('contracts', contracts.parse_contracts, 'corp/contracts.xml', 'contractID'),
+    ('member_tracking',
+        lambda api_result, result_format:
+            member_tracking.parse_member_tracking(api_result, True, result_format),
+        'corp/members.xml', 'characterID'),
+]
+
+
+def load_result(fixture, id_attr):
+    """Parse a fixture, with the rows of its rowset repeated to make ROWS.
+
+    Each copy gets its own id_attr, so that results keyed by ID keep
+    every row.
+    """
+    # The fixtures hold the <result> element of an API response.
+    result = ElementTree.parse(os.path.join(XML_DIR, fixture)).getroot()
+    rowset = result.find('rowset')
+    rows = list(rowset)
+    rowset[:] = [ElementTree.Element(row.tag, dict(row.attrib, **{id_attr: str(i + 1)}))
+                 for i, row in enumerate((rows * (ROWS // len(rows) + 1))[:ROWS])]
+    return result
+
+
+def container_size(value):
+    """Return the size in bytes of the containers making up value."""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(container_size(v) for v in value.itervalues())
+    if isinstance(value, list):
+        return sys.getsizeof(value) + sum(container_size(v) for v in value)
+    if isinstance(value, columns.Columns):
+        return (sum(len(c) * c.itemsize for c in value.columns.itervalues()) +
+                sys.getsizeof(value.strings) +
+                sum(sys.getsizeof(v) for v in value.strings))
+    if isinstance(value, Record):
+        return sys.getsizeof(value) + sum(
+            container_size(getattr(value, k, None)) for k in value.__slots__)
+    return 0
+
+
+def main():
+    print "%d rows per parser" % ROWS
+    for name, parse, fixture, id_attr in CASES:
+        api_result = load_result(fixture, id_attr)
+        sizes = []
+        for result_format in (DICTS, RECORDS, COLUMNS):
+            try:
+                parsed = parse(api_result, result_format)
+            except ValueError:
+                continue
+            seconds = best_of(lambda: parse(api_result, result_format), number=3)
+            report('%s (%s)' % (name, result_format), seconds, ROWS)
+            size = container_size(parsed)
+            sizes.append(size)
+            print "%-40s %10.0f bytes/row" % ('', float(size) / ROWS)
+        for result_format, size in zip((RECORDS, COLUMNS), sizes[1:]):
+            print "%-40s %10.1fx" % ('%s memory saving (%s)' % (name, result_format),
+                                     float(sizes[0]) / size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""Measure the throughput of SqliteCache with concurrent workers.
+
+Each worker thread puts its share of the entries (a wallet journal
+response, under distinct keys), then gets all of them back, with each
+put committed and with batched writes. The previous
+implementation, which committed every put and pickled every value, is
+measured too; its single connection can only be used by one thread.
+
+    $ python -m benchmarks.bench_sqlite_cache
+"""
+
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from evelink.cache.sqlite import SqliteCache
+from benchmarks.utils import XML_DIR
+
+ENTRIES = 2000
+WORKERS = (1, 4, 8)
+
+
+class PreviousSqliteCache(object):
+
+    def __init__(self, path):
+        # Only one worker thread uses it, but not the thread creating it.
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        cursor = self.connection.cursor()
+        cursor.execute('create table if not exists cache ("key" text primary key on conflict replace,'
+                       'value blob, expiration integer)')
+
+    def get(self, key):
+        cursor = self.connection.cursor()
+        cursor.execute('select value, expiration from cache where "key"=?',(key,))
+        result = cursor.fetchone()
+        if not result:
+            return None
+        value, expiration = result
+        if expiration < time.time():
+            cursor.execute('delete from cache where "key"=?', (key,))
+            self.connection.commit()
+            return None
+        cursor.close()
+        return pickle.loads(str(value))
+
+    def put(self, key, value, duration):
+        expiration = time.time() + duration
+        value_tuple = (key, sqlite3.Binary(pickle.dumps(value, 2)), expiration)
+        cursor = self.connection.cursor()
+        cursor.execute('insert into cache values (?, ?, ?)', value_tuple)
+        self.connection.commit()
+        cursor.close()
+
+    def flush(self):
+        pass
+
+
+def run_workers(workers, func):
+    """Run func(worker) on each worker thread; return the elapsed seconds."""
+    threads = [threading.Thread(target=func, args=(i,)) for i in range(workers)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.time() - start
+
+
+def measure(name, cache, workers, payload):
+    per_worker = ENTRIES // workers
+
+    def put(worker):
+        for i in range(per_worker):
+            cache.put('%d-%d' % (worker, i), payload, 3600)
+        cache.flush()
+
+    def get(worker):
+        for i in range(per_worker):
+            assert cache.get('%d-%d' % (worker, i)) == payload
+
+    count = per_worker * workers
+    put_seconds = run_workers(workers, put)
+    get_seconds = run_workers(workers, get)
+    print "%-32s %3d workers %10.0f puts/s %10.0f gets/s" % (
+        name, workers, count / put_seconds, count / get_seconds)
+
+
+def main():
+    with open(os.path.join(XML_DIR, 'char', 'wallet_journal.xml')) as f:
+        payload = f.read()
+    print "%d entries of %d bytes" % (ENTRIES, len(payload))
+
+    tempdir = tempfile.mkdtemp()
+    try:
+        cache = PreviousSqliteCache(os.path.join(tempdir, 'previous'))
+        measure('previous SqliteCache', cache, 1, payload)
+        cache.connection.close()
+
+        for batch_size in (1, 100):
+            for workers in WORKERS:
+                cache = SqliteCache(os.path.join(tempdir, 'cache%d-%d' % (batch_size, workers)),
+                                    batch_size=batch_size)
+                measure('SqliteCache(batch_size=%d)' % batch_size, cache, workers, payload)
+                cache.close()
+    finally:
+        shutil.rmtree(tempdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+import os
+import timeit
+
+XML_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'tests', 'xml')
+
+
+def iter_fixtures(subdir=''):
+    """Yield (relative path, contents) of the XML fixtures in tests/xml."""
+    root = os.path.join(XML_DIR, subdir)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith('.xml'):
+                path = os.path.join(dirpath, filename)
+                with open(path) as f:
+                    yield os.path.relpath(path, XML_DIR), f.read()
+
+
+def best_of(func, number, repeat=5):
+    """Return the best time, in seconds, of a single call to func."""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def report(name, seconds, count, unit='rows'):
+    print "%-40s %10.2f us %12.0f %s/s" % (name, seconds * 1e6, count / seconds, unit)
@@ -4,12 +4,16 @@ import logging
 
 from evelink import account
 from evelink import api
+from evelink import asyncapi
 from evelink import char
 from evelink import constants
 from evelink import corp
 from evelink import eve
 from evelink import map
+from evelink import planner
+from evelink import scheduler
 from evelink import server
+from evelink import transport
 
 __version__ = "0.3.0"
 
@@ -25,11 +29,15 @@ _log.addHandler(NullHandler())
 __all__ = [
   "account",
   "api",
+  "asyncapi",
   "char",
   "constants",
   "corp",
   "eve",
   "map",
   "parsing",
+  "planner",
+  "scheduler",
   "server",
+  "transport",
 ]
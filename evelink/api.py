@@ -1,12 +1,24 @@
 import calendar
+from collections import namedtuple, OrderedDict
+from cStringIO import StringIO
 import functools
+import hashlib
+import inspect
+import json
 import logging
+from multiprocessing.pool import ThreadPool
 from operator import itemgetter
 import re
+import sys
+import threading
 import time
 from urllib import urlencode
 import urllib2
+import weakref
 from xml.etree import ElementTree
+from xml.sax.saxutils import unescape
+
+from evelink.parsing import columns as parsed_columns
 
 _log = logging.getLogger('evelink.api')
 
@@ -18,6 +30,10 @@ except ImportError:
     _has_requests = None
 
 
+# Default number of threads used by the batch fetch helpers.
+DEFAULT_MAX_WORKERS = 8
+
+
 def _clean(v):
     """Convert parameters into an acceptable format for the API."""
     if isinstance(v, (list, set, tuple)):
@@ -26,13 +42,65 @@ def _clean(v):
         return str(v)
 
 
+_DAYS_IN_MONTH = (0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+# Memo of recently parsed timestamps; rows of a response often share them.
+_ts_memo = {}
+_TS_MEMO_SIZE = 4096
+
+
+def _days_from_civil(year, month, day):
+    """Number of days between 1970-01-01 and the given (proleptic) date."""
+    if month <= 2:
+        year -= 1
+        month += 9
+    else:
+        month -= 3
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * month + 2) // 5 + day - 1
+    day_of_era = (year_of_era * 365 + year_of_era // 4 - year_of_era // 100
+                  + day_of_year)
+    return era * 146097 + day_of_era - 719468
+
+
+def _parse_ts(v):
+    """Convert a 'YYYY-MM-DD HH:MM:SS' string to seconds since the epoch.
+
+    Well-formed values are converted with integer arithmetic; anything
+    else goes through time.strptime, which raises the usual ValueError.
+    """
+    digits = v[0:4] + v[5:7] + v[8:10] + v[11:13] + v[14:16] + v[17:19]
+    if (len(v) == 19 and digits.isdigit() and v[4] == '-' and v[7] == '-'
+            and v[10] == ' ' and v[13] == ':' and v[16] == ':'):
+        year, month, day = int(v[0:4]), int(v[5:7]), int(v[8:10])
+        hour, minute, second = int(v[11:13]), int(v[14:16]), int(v[17:19])
+        if (year >= 1 and 1 <= month <= 12 and 1 <= day <= _DAYS_IN_MONTH[month]
+                and (month != 2 or day < 29 or calendar.isleap(year))
+                and hour < 24 and minute < 60 and second < 62):
+            return (_days_from_civil(year, month, day) * 86400
+                    + hour * 3600 + minute * 60 + second)
+
+    return calendar.timegm(time.strptime(v, "%Y-%m-%d %H:%M:%S"))
+
+
 def parse_ts(v):
     """Parse a timestamp from EVE API XML into a unix-ish timestamp."""
+    try:
+        return _ts_memo[v]
+    except KeyError:
+        pass
+
     if v == '':
         return None
-    ts = calendar.timegm(time.strptime(v, "%Y-%m-%d %H:%M:%S"))
+    ts = _parse_ts(v)
     # Deal with EVE's nonexistent 0001-01-01 00:00:00 timestamp
-    return ts if ts > 0 else None
+    ts = ts if ts > 0 else None
+
+    if len(_ts_memo) >= _TS_MEMO_SIZE:
+        _ts_memo.clear()
+    _ts_memo[v] = ts
+    return ts
 
 
 def get_named_value(elem, field):
@@ -132,30 +200,172 @@ class APIError(Exception):
         return "%s (code=%d)" % (self.message, int(self.code))
 
 
+def _call_quietly(func):
+    """Call func, returning its exception instead of raising it."""
+    try:
+        return func()
+    except Exception as e:
+        return e
+
+
+def call_many(calls, max_workers=DEFAULT_MAX_WORKERS):
+    """Call each of the zero-argument callables in calls concurrently.
+
+    The calls are run on a pool of at most max_workers threads. Returns
+    a list with the return value of each call, in input order; a call
+    which raised (e.g. an APIError) has the exception in its slot instead.
+    """
+    calls = list(calls)
+    if not calls:
+        return []
+
+    pool = ThreadPool(max(1, min(max_workers, len(calls))))
+    try:
+        return pool.map(_call_quietly, calls)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def call_methods(obj, calls, max_workers=DEFAULT_MAX_WORKERS):
+    """Call several methods of an API wrapper (e.g. Char) concurrently.
+
+    calls is a sequence of method names, or of (method name, kwargs)
+    tuples. See call_many() for the return value.
+
+    Note that the wrapper's methods run on worker threads, so the cache
+    of the wrapper's API object needs to be usable from several threads.
+    """
+    funcs = []
+    for call in calls:
+        if isinstance(call, basestring):
+            name, kwargs = call, {}
+        else:
+            name, kwargs = call
+        funcs.append(functools.partial(getattr(obj, name), **kwargs))
+    return call_many(funcs, max_workers=max_workers)
+
+
+class _Flight(object):
+    """A call in progress, awaited by the callers sharing it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exc_info = None
+
+
+class SingleFlight(object):
+    """Coalesces concurrent calls made with the same key.
+
+    While a call for a key is in progress, further calls for that key
+    wait for it and share its return value (or exception) instead of
+    making the call again. Calls made after it completed are made anew.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        # Number of calls which shared the result of another one.
+        self.coalesced = 0
+
+    def do(self, key, func):
+        """Call func(), unless a call for key is in progress.
+
+        Returns a (result, shared) tuple; shared is True if the result
+        came from another caller's call.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.exc_info is not None:
+                raise flight.exc_info[0], flight.exc_info[1], flight.exc_info[2]
+            return flight.result, True
+
+        try:
+            flight.result = func()
+        except Exception:
+            flight.exc_info = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    def in_progress(self):
+        """Return the number of calls in progress."""
+        with self._lock:
+            return len(self._flights)
+
+
+# The SingleFlight of each cache, used by the API instances which aren't
+# given their own, so that identical requests made through different
+# instances sharing a cache are coalesced, and only those.
+_cache_single_flights = weakref.WeakKeyDictionary()
+_cache_single_flights_lock = threading.Lock()
+
+
+def _single_flight_for(cache):
+    """Return the SingleFlight shared by the users of a cache."""
+    with _cache_single_flights_lock:
+        flight = _cache_single_flights.get(cache)
+        if flight is None:
+            flight = _cache_single_flights[cache] = SingleFlight()
+        return flight
+
+
+_NOT_LOOKED_UP = object()
+
+
 class CacheContext(object):
     """A context Manager wich will try to update the cache value for a key
     if the context leaves with and APIError exception raise or none raised.
 
     For the cache entry to be updated, the value property needs to change and 
-    the duration property needs to be set.
+    the duration property needs to be set. Setting the write property to
+    False prevents the update, e.g. when another context stores the same
+    value.
+
+    The cached value can be given, e.g. when it was looked up together with
+    others by get_multi(). With a deferred list, updates are appended to
+    it as (key, value, duration) tuples, for a single put_multi() call,
+    instead of being written.
     
     """
 
-    def __init__(self, cache, key):
+    def __init__(self, cache, key, value=_NOT_LOOKED_UP, deferred=None):
         self.cache = cache
         self.key = key
-        self.value = cache.get(key)
+        if value is _NOT_LOOKED_UP:
+            value = cache.get(key)
+        self.value = value
         self._old_value = self.value
         self.duration = None
+        self.write = True
+        self.deferred = deferred
 
     def sync(self):
+        if not self.write:
+            return
+
         if self.value == self._old_value:
             return
 
         if self.duration is None:
             return
 
-        self.cache.put(self.key, self.value, self.duration)
+        if self.deferred is not None:
+            self.deferred.append((self.key, self.value, self.duration))
+        else:
+            self.cache.put(self.key, self.value, self.duration)
         self._old_value = self.value
 
     def __enter__(self):
@@ -179,17 +389,248 @@ class CacheContext(object):
         self.sync()
 
 
+CACHE_HEADER_MAGIC = '#evelink-cache:1 '
+
+
+class CacheHeader(namedtuple('CacheHeader', ['stored', 'current_time',
+        'cached_until', 'size', 'error_code', 'error_message'])):
+    """Metadata stored in front of a cached API response.
+
+    stored:
+        the local time at which the response was received.
+    current_time, cached_until:
+        the currentTime and cachedUntil timestamps of the response.
+    size:
+        the length of the response payload.
+    error_code, error_message:
+        the API error returned instead of a result, if any.
+    """
+
+    @property
+    def expires(self):
+        """The local time at which the response stops being valid."""
+        if self.current_time is None or self.cached_until is None:
+            return self.stored
+        return self.stored + self.cached_until - self.current_time
+
+    def is_fresh(self, now=None):
+        if now is None:
+            now = time.time()
+        return now < self.expires
+
+    def api_error(self):
+        """Return the APIError recorded in this header, or None."""
+        if self.error_code is None:
+            return None
+        return APIError(self.error_code, self.error_message,
+            self.current_time, self.cached_until)
+
+
+def pack_cache_entry(header, payload):
+    """Serialize a CacheHeader and a response payload into a cache value."""
+    return '%s%s\n%s' % (CACHE_HEADER_MAGIC, json.dumps(list(header)), payload)
+
+
+def read_cache_header(value):
+    """Return the CacheHeader of a cache value, without reading the payload.
+
+    Returns None for values stored without a header (e.g. by an older
+    version of EVELink).
+    """
+    if not isinstance(value, basestring) or not value.startswith(CACHE_HEADER_MAGIC):
+        return None
+    end = value.index('\n')
+    return CacheHeader(*json.loads(value[len(CACHE_HEADER_MAGIC):end]))
+
+
+def unpack_cache_entry(value):
+    """Split a cache value into a (CacheHeader, payload) tuple.
+
+    The header is None for values stored without a header.
+    """
+    header = read_cache_header(value)
+    if header is None:
+        return None, value
+    return header, value[value.index('\n') + 1:]
+
+
+# The local expiry of the last response handled in each thread.
+_response_expiry = threading.local()
+
+
+def _record_expiry(expires):
+    _response_expiry.expires = expires
+
+
+def reset_response_expiry():
+    """Forget the expiry recorded for the calling thread."""
+    _response_expiry.expires = None
+
+
+def last_response_expiry():
+    """Return the local time at which the last response stops being cached.
+
+    This is the response last returned (or raised as an APIError) by an
+    API, or a result cache, in the calling thread. It is the expiry of the
+    cache entry, so a response served from the cache expires sooner than
+    its cache_for() suggests, and a stale one has already expired. Returns
+    None if unknown.
+    """
+    return getattr(_response_expiry, 'expires', None)
+
+
+# What to do with a cached response, according to a RefreshPolicy.
+USE_CACHED = 'use'
+REFRESH_IN_BACKGROUND = 'refresh'
+FETCH = 'fetch'
+
+
+class RefreshPolicy(object):
+    """When an API refreshes cached responses without blocking callers.
+
+    refresh_ahead:
+        a fraction (between 0 and 1) of the time a response is cached for.
+        Once less than that fraction of it remains, a request for the
+        response is answered from the cache and starts a background
+        refresh (refresh-ahead).
+    max_stale:
+        a number of seconds for which responses are kept after they
+        expire. A request for an expired response is answered with it
+        immediately, and starts a background refresh
+        (stale-while-revalidate). Responses which expired longer ago are
+        fetched again synchronously.
+
+    At most one background refresh runs for a given request at a time.
+    Only responses cached with a CacheHeader are refreshed this way.
+    """
+
+    def __init__(self, refresh_ahead=0, max_stale=0):
+        if not 0 <= refresh_ahead < 1:
+            raise ValueError("refresh_ahead must be between 0 and 1.")
+        if max_stale < 0:
+            raise ValueError("max_stale must not be negative.")
+        self.refresh_ahead = refresh_ahead
+        self.max_stale = max_stale
+
+    def action(self, header, now=None):
+        """Return USE_CACHED, REFRESH_IN_BACKGROUND or FETCH for a response."""
+        if now is None:
+            now = time.time()
+        expires = header.expires
+        if now >= expires + self.max_stale:
+            return FETCH
+        if now >= expires:
+            return REFRESH_IN_BACKGROUND
+        ahead = (expires - header.stored) * self.refresh_ahead
+        if ahead and now >= expires - ahead:
+            return REFRESH_IN_BACKGROUND
+        return USE_CACHED
+
+
+_CURRENT_TIME_RE = re.compile(r'<currentTime>([^<]*)</currentTime>')
+_CACHED_UNTIL_RE = re.compile(r'<cachedUntil>([^<]*)</cachedUntil>')
+_ERROR_RE = re.compile(r'<error\s+code="([^"]*)"\s*>([^<]*)</error>')
+
+
+def scan_response_header(response):
+    """Build the CacheHeader of an API response without parsing it.
+
+    Only the envelope elements (currentTime, error and cachedUntil) are
+    looked up, so this is cheap even for very large responses.
+    """
+    result_start = response.find('<result')
+    head = response if result_start < 0 else response[:result_start]
+
+    match = _CURRENT_TIME_RE.search(head)
+    current_time = parse_ts(match.group(1)) if match else None
+
+    match = _CACHED_UNTIL_RE.search(response, response.rfind('<cachedUntil>'))
+    cached_until = parse_ts(match.group(1)) if match else None
+
+    error_code = error_message = None
+    match = _ERROR_RE.search(head)
+    if match:
+        error_code = match.group(1)
+        error_message = unescape(match.group(2)).strip()
+
+    return CacheHeader(time.time(), current_time, cached_until,
+        len(response), error_code, error_message)
+
+
+def iter_result_rows(response):
+    """Yield the rows of the first rowset of an API response's result.
+
+    The response is parsed incrementally with ElementTree.iterparse, and
+    each row is cleared once the consumer asks for the next one, so memory
+    use doesn't grow with the number of rows. A row (with any nested
+    rowsets) must be fully processed before advancing the iterator.
+    """
+    path = []
+    rowset = None
+    for event, elem in ElementTree.iterparse(StringIO(response), ('start', 'end')):
+        if event == 'start':
+            path.append(elem.tag)
+            if (rowset is None and elem.tag == 'rowset'
+                    and path[-2:-1] == ['result']):
+                rowset = elem
+                rowset_depth = len(path)
+            continue
+
+        path.pop()
+        if elem is rowset:
+            return
+        if (rowset is not None and len(path) == rowset_depth
+                and elem.tag == 'row'):
+            yield elem
+            elem.clear()
+            del rowset[:]
+
+
+def _value_size(value):
+    """Return the size in bytes counted for a cached value."""
+    if isinstance(value, basestring):
+        return len(value)
+    return _approx_size(value)
+
+
 class APICache(object):
     """Minimal interface for caching API requests.
 
-    This very basic implementation simply stores values in
-    memory, with no other persistence. You can subclass it
-    to define a more complex/featureful/persistent cache.
+    This basic implementation stores values in memory, with no other
+    persistence. You can subclass it to define a more
+    complex/featureful/persistent cache.
 
+    The least recently used entries are evicted once there are more than
+    max_entries of them, or their values take more than max_size bytes;
+    either limit can be None. Expired entries are dropped when they are
+    requested, and by a sweep of the whole cache every sweep_interval
+    seconds (run by the next put()).
+
+    hits, misses, evictions and expirations count the lookups and the
+    dropped entries.
     """
 
-    def __init__(self):
-        self.cache = {}
+    def __init__(self, max_entries=10000, max_size=256 * 1024 * 1024,
+                 sweep_interval=300):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.sweep_interval = sweep_interval
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_sweep = time.time() + sweep_interval
+
+    def __len__(self):
+        return len(self.cache)
+
+    def __nonzero__(self):
+        # A cache is true even when empty, and for subclasses without a
+        # __len__ of their own, so that 'cache or default' keeps it.
+        return True
 
     def cache_for(self, key):
         return CacheContext(self, key)
@@ -200,14 +641,57 @@ class APICache(object):
         key:
             a hashable type.
         """
-        result = self.cache.get(key)
-        if not result:
-            return None
-        value, expiration = result
-        if expiration < time.time():
-            del self.cache[key]
-            return None
-        return value
+        with self._lock:
+            entry = self.cache.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expiration = entry
+            if expiration < time.time():
+                self.size -= _value_size(value)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            # Re-insert to mark as most recently used.
+            self.cache[key] = entry
+            self.hits += 1
+            return value
+
+    def get_multi(self, keys):
+        """Return a dict of the values cached for several keys.
+
+        Keys which aren't cached are left out. Caches which can look up
+        several keys at once override this; by default, keys are looked
+        up one by one.
+        """
+        values = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                values[key] = value
+        return values
+
+    def put_multi(self, entries):
+        """Cache several values at once.
+
+        entries is a sequence of (key, value, duration) tuples, as the
+        arguments of put().
+        """
+        for key, value, duration in entries:
+            self.put(key, value, duration)
+
+    def get_with_expiration(self, key):
+        """Return a (value, expiration) tuple for 'key'.
+
+        The expiration is the time at which the entry expires, or None if
+        the cache can't tell; the value is None if 'key' isn't cached.
+        """
+        value = self.get(key)
+        if value is None:
+            return None, None
+        with self._lock:
+            entry = self.cache.get(key)
+        return value, entry[1] if entry else None
 
     def put(self, key, value, duration):
         """Cache the provided value, referenced by 'key', for the given duration.
@@ -220,8 +704,46 @@ class APICache(object):
             a number of seconds before this cache entry should expire.
 
         """
-        expiration = time.time() + duration
-        self.cache[key] = (value, expiration)
+        now = time.time()
+        size = _value_size(value)
+
+        with self._lock:
+            old = self.cache.pop(key, None)
+            if old is not None:
+                self.size -= _value_size(old[0])
+            if self.max_size is not None and size > self.max_size:
+                return
+            self.cache[key] = (value, now + duration)
+            self.size += size
+
+            if now >= self._next_sweep:
+                self._sweep(now)
+            while ((self.max_entries is not None
+                        and len(self.cache) > self.max_entries)
+                    or (self.max_size is not None and self.size > self.max_size)):
+                _, (evicted, _) = self.cache.popitem(last=False)
+                self.size -= _value_size(evicted)
+                self.evictions += 1
+
+    def _sweep(self, now):
+        expired = [key for key, entry in self.cache.iteritems()
+                   if entry[1] < now]
+        for key in expired:
+            self.size -= _value_size(self.cache.pop(key)[0])
+        self.expirations += len(expired)
+        self._next_sweep = now + self.sweep_interval
+
+    def sweep(self):
+        """Drop all of the expired entries; return how many there were."""
+        with self._lock:
+            expirations = self.expirations
+            self._sweep(time.time())
+            return self.expirations - expirations
+
+    def clear(self):
+        with self._lock:
+            self.cache.clear()
+            self.size = 0
 
 
 class APIResult(tuple):
@@ -238,6 +760,110 @@ class APIResult(tuple):
         return self.expires - self.timestamp
 
 
+def _array_size(values):
+    """Estimate the memory used by a typed array (numpy or array.array)."""
+    nbytes = getattr(values, 'nbytes', None)
+    if nbytes is None:
+        nbytes = values.buffer_info()[1] * values.itemsize
+    # An empty slice has the array's header, without its data.
+    return sys.getsizeof(values[:0]) + nbytes
+
+
+def _approx_size(obj):
+    """Estimate the memory used by a parsed result, in bytes."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.iteritems():
+            size += _approx_size(key) + _approx_size(value)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += _approx_size(item)
+    elif isinstance(obj, parsed_columns.Columns):
+        size += sys.getsizeof(obj.columns) + _approx_size(obj.kinds)
+        size += _approx_size(obj.strings)
+        for name, values in obj.columns.iteritems():
+            size += _approx_size(name) + _array_size(values)
+    elif hasattr(obj, '__slots__'):
+        # Records (see parsing.formats) keep their fields in slots.
+        for key in obj.__slots__:
+            size += _approx_size(getattr(obj, key, None))
+    return size
+
+
+class ResultCache(object):
+    """An in-memory cache of parsed API results.
+
+    Wrapper methods decorated with cache_result() store their APIResult
+    here, so that a hit returns the already-built result object without
+    parsing the XML payload again. Entries expire with the API response
+    they were parsed from; the least recently used entries are evicted
+    once there are more than max_entries of them or their estimated
+    size exceeds max_size bytes.
+
+    Cached results are shared between callers and must not be modified.
+    """
+
+    def __init__(self, max_entries=1000, max_size=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the APIResult cached for 'key', or None."""
+        return self.get_with_expiration(key)[0]
+
+    def get_with_expiration(self, key):
+        """Return a (result, expiration) tuple for 'key'.
+
+        Both are None if 'key' isn't cached.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[1] < time.time():
+                if entry is not None:
+                    self.size -= entry[2]
+                self.misses += 1
+                return None, None
+            # Re-insert to mark as most recently used.
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, key, result):
+        """Cache an APIResult until the response it came from expires."""
+        duration = result.cache_for()
+        if duration <= 0:
+            return
+
+        size = _approx_size(result.result)
+        if size > self.max_size:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[2]
+            self._entries[key] = (result, time.time() + duration, size)
+            self.size += size
+
+            while (len(self._entries) > self.max_entries
+                    or self.size > self.max_size):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
 class APIRequest(tuple):
     """
     Immutable representation of an api request.
@@ -285,6 +911,9 @@ class APIRequest(tuple):
         """
         Send the request and return the body as a string.
 
+        If the api has a transport, the request is sent with it; otherwise
+        a new connection is opened with urllib2.
+
         Raise an exception for a failed request (including 4xx and 5xx 
         response error code).
         
@@ -293,6 +922,9 @@ class APIRequest(tuple):
         or to the API server.
 
         """
+        if getattr(api, 'transport', None) is not None:
+            return self.send_with(api.transport)
+
         try:
             if self.params:
                 # POST request
@@ -310,22 +942,39 @@ class APIRequest(tuple):
             # TODO: Handle this better?
             raise e
 
+    def send_with(self, transport):
+        """Send the request with a transport.Transport."""
+        _log.debug("sending request using %s", type(transport).__name__)
+        data = self.encoded_params if self.params else None
+        return transport.send(self.absolute_url, data)
+
     def __str__(self):
         """
         Current cache key implementation.
-        
-        TODO: include base_url?
+
+        The key is the same in every process and host, so that they can
+        share a cache: it is made of the cache version, base_url, path and
+        keyID, followed by a SHA-1 digest of all of the parameters. The
+        vCode only goes into the digest.
 
         """
-        return '%s-%s' % (self.cache_version, hash(self[2:4]),)
+        params = dict(self.params)
+        digest = hashlib.sha1(urlencode(self.params)).hexdigest()
+        return '%s:%s:%s:%s:%s' % (self.cache_version, self.base_url,
+            self.path, params.get('keyID', '-'), digest)
 
 
 class APIRequestRequests(APIRequest):
     
     def send(self, api):
+        if getattr(api, 'transport', None) is not None:
+            return self.send_with(api.transport)
+
         _log.debug("sending request using requests")
         if api.session is None:
-            api.session = requests.Session()
+            with api.session_lock:
+                if api.session is None:
+                    api.session = requests.Session()
 
         try:
             if self.params:
@@ -346,7 +995,16 @@ class APIRequestRequests(APIRequest):
 
 
 class API(object):
-    """A wrapper around the EVE API."""
+    """A wrapper around the EVE API.
+
+    Requests are sent with the given transport (see evelink.transport),
+    e.g. a HTTPTransport reusing keep-alive connections. Without one,
+    each request opens a new connection with urllib2, or uses a shared
+    requests.Session if requests is installed.
+
+    With an access_planner (see evelink.planner), requests which the API
+    key isn't allowed to make raise an error without being sent.
+    """
 
     CACHE_VERSION = 1
 
@@ -355,7 +1013,12 @@ class API(object):
     else:
         Request = APIRequest
 
-    def __init__(self, base_url="api.eveonline.com", cache=None, api_key=None):
+    # An optional ResultCache for parsed results; see cache_result().
+    result_cache = None
+
+    def __init__(self, base_url="api.eveonline.com", cache=None, api_key=None,
+                 result_cache=None, transport=None, single_flight=None,
+                 refresh_policy=None, access_planner=None):
         self.base_url = base_url
 
         cache = cache or APICache()
@@ -366,8 +1029,16 @@ class API(object):
         if api_key and len(api_key) != 2:
             raise ValueError("The provided API key must be a tuple of (keyID, vCode).")
         self.api_key = api_key
+        self.result_cache = result_cache
+        self.transport = transport
+        self.single_flight = single_flight or _single_flight_for(cache)
+        self.refresh_policy = refresh_policy
+        self.access_planner = access_planner
+        self._refreshing = {}
+        self._refresh_lock = threading.Lock()
         self._set_last_timestamps()
         self.session = None
+        self.session_lock = threading.Lock()
 
     def _set_last_timestamps(self, current_time=0, cached_until=0):
         self.last_timestamps = {
@@ -385,16 +1056,214 @@ class API(object):
         """
         req = self.Request(self, path, params)
         with self.cache.cache_for(str(req)) as cache:
-            if cache.value is None:
-                cache.value = req.send(self)
+            if not self._use_cached(req, cache):
+                results = self._process_fresh(cache, self._fetch(req, cache))
             else:
                 _log.debug("Cache hit, returning cached payload")
-            
-            results = self.process_response(cache.value)
-            cache.duration = results.cache_for()
+                results = self._process_cached(cache.value)
+            cache.duration = self._cache_duration(results)
 
         return results
 
+    def get_many(self, requests, max_workers=DEFAULT_MAX_WORKERS):
+        """Request several paths from the EVE API concurrently.
+
+        requests is a sequence of (path, params) tuples, where params may
+        be None. Cache lookups and updates happen on the calling thread, in
+        a single get_multi() and put_multi() call; only the requests missing
+        from the cache are sent, on a pool of at most max_workers threads.
+
+        Returns a list with an APIResult for each request, in input order.
+        A request which failed has the exception (typically an APIError)
+        in its slot instead of an APIResult.
+        """
+        reqs = [self.Request(self, path, params) for path, params in requests]
+        keys = [str(req) for req in reqs]
+        values = self.cache.get_multi(keys)
+        updates = []
+        contexts = [CacheContext(self.cache, key, values.get(key), updates)
+                    for key in keys]
+
+        missing = [i for i, cache in enumerate(contexts)
+                   if not self._use_cached(reqs[i], cache)]
+        responses = dict(zip(missing, call_many(
+            [functools.partial(self._fetch, reqs[i], contexts[i]) for i in missing],
+            max_workers=max_workers,
+        )))
+
+        results = []
+        for i, cache in enumerate(contexts):
+            try:
+                with cache:
+                    if i in responses:
+                        response = responses[i]
+                        if isinstance(response, Exception):
+                            raise response
+                        result = self._process_fresh(cache, response)
+                    else:
+                        _log.debug("Cache hit, returning cached payload")
+                        result = self._process_cached(cache.value)
+                    cache.duration = self._cache_duration(result)
+            except Exception as e:
+                result = e
+            results.append(result)
+
+        if updates:
+            self.cache.put_multi(updates)
+        return results
+
+    def iter_rows(self, path, params=None):
+        """Request a path, streaming the rows of its result's rowset.
+
+        Works like get(), but the result portion of the returned APIResult
+        is an iterator of the top-level <row> elements, which are parsed
+        lazily and discarded as the iteration goes (see iter_result_rows).
+        The response is never parsed into a complete tree.
+        """
+        req = self.Request(self, path, params)
+        with self.cache.cache_for(str(req)) as cache:
+            if not self._use_cached(req, cache):
+                response = self._fetch(req, cache)
+                header = scan_response_header(response)
+                cache.value = pack_cache_entry(header, response)
+            else:
+                _log.debug("Cache hit, returning cached payload")
+                header, response = unpack_cache_entry(cache.value)
+                if header is None:
+                    header = scan_response_header(response)
+
+            self._set_last_timestamps(header.current_time, header.cached_until)
+            _record_expiry(header.expires)
+            exc = header.api_error()
+            if exc is not None:
+                _log.error("Raising API error: %r" % exc)
+                raise exc
+            result = APIResult(iter_result_rows(response),
+                header.current_time, header.cached_until)
+            cache.duration = self._cache_duration(result)
+
+        return result
+
+    def _cache_duration(self, result):
+        """Return how long to keep the response of a result in the cache."""
+        duration = result.cache_for()
+        if duration is not None and self.refresh_policy is not None:
+            duration += self.refresh_policy.max_stale
+        return duration
+
+    def _use_cached(self, req, cache):
+        """Return True if a request can be answered from its cache context.
+
+        With a refresh policy, this may start a background refresh of the
+        cached response.
+        """
+        if cache.value is None:
+            return False
+        if self.refresh_policy is None:
+            return True
+        header = read_cache_header(cache.value)
+        if header is None:
+            return True
+
+        action = self.refresh_policy.action(header)
+        if action == REFRESH_IN_BACKGROUND:
+            self.refresh_in_background(req)
+        return action != FETCH
+
+    def refresh_in_background(self, req):
+        """Fetch a request on a background thread and cache its response.
+
+        Does nothing if the request is already being refreshed. Returns
+        the thread doing the refresh.
+        """
+        key = str(req)
+        with self._refresh_lock:
+            thread = self._refreshing.get(key)
+            if thread is not None:
+                return thread
+            thread = threading.Thread(target=self._refresh, args=(req, key),
+                name='evelink-refresh')
+            thread.daemon = True
+            self._refreshing[key] = thread
+        _log.debug("Refreshing %s in the background", req.path)
+        thread.start()
+        return thread
+
+    def _refresh(self, req, key):
+        try:
+            with self.cache.cache_for(key) as cache:
+                result = self._process_fresh(cache, self._fetch(req, cache))
+                cache.duration = self._cache_duration(result)
+        except APIError as e:
+            _log.warning("Background refresh of %s failed: %r", req.path, e)
+        except Exception:
+            # Keep serving the cached response; the next request will
+            # try again.
+            _log.exception("Background refresh of %s failed", req.path)
+        finally:
+            with self._refresh_lock:
+                del self._refreshing[key]
+
+    def join_refreshes(self, timeout=None):
+        """Wait for the background refreshes in progress to complete."""
+        with self._refresh_lock:
+            threads = self._refreshing.values()
+        for thread in threads:
+            thread.join(timeout)
+
+    def _fetch(self, req, cache):
+        """Send a request missing from the cache, and return the response.
+
+        Concurrent identical requests made through APIs sharing a cache
+        are sent only once (see SingleFlight); the callers which shared
+        another's response leave the cache update to it.
+        """
+        if self.access_planner is not None:
+            self.access_planner.check(self, req.path, req.params)
+        response, shared = self.single_flight.do(
+            str(req), functools.partial(req.send, self))
+        if shared:
+            _log.debug("Shared the response of an identical request")
+            cache.write = False
+        return response
+
+    def _process_fresh(self, cache, response):
+        """Process a response just received from the API.
+
+        Sets the cache context value to the response, prefixed with a
+        CacheHeader, and returns the APIResult (or raises the APIError).
+        """
+        try:
+            results = self.process_response(response)
+        except APIError as e:
+            header = CacheHeader(time.time(), e.timestamp, e.expires,
+                len(response), e.code, e.message)
+            cache.value = pack_cache_entry(header, response)
+            _record_expiry(header.expires)
+            raise
+
+        header = CacheHeader(time.time(), results.timestamp, results.expires,
+            len(response), None, None)
+        cache.value = pack_cache_entry(header, response)
+        _record_expiry(header.expires)
+        return results
+
+    def _process_cached(self, value):
+        """Process a cached response.
+
+        Cached API errors are raised again from their header, without
+        parsing the payload.
+        """
+        header, payload = unpack_cache_entry(value)
+        _record_expiry(header.expires if header is not None else None)
+        if header is not None and header.error_code is not None:
+            self._set_last_timestamps(header.current_time, header.cached_until)
+            exc = header.api_error()
+            _log.error("Raising cached API error: %r" % exc)
+            raise exc
+
+        return self.process_response(payload)
+
     def process_response(self, response):
         """return the result (Element object), currentTime and cacheUntil 
         elements from an api call response.
@@ -418,6 +1287,55 @@ class API(object):
         return APIResult(result, current_time, expires_time)
 
 
+class NotFetched(Exception):
+    """Raised by FetchedAPI for a request it has no result for."""
+
+    def __init__(self, key, path, params):
+        super(NotFetched, self).__init__(key)
+        self.key = key
+        self.path = path
+        self.params = params
+
+
+class FetchedAPI(object):
+    """Stands in for an API, answering get() with results fetched beforehand.
+
+    results maps the cache keys of requests to their APIResult, or to the
+    exception the request raised. Any other request raises NotFetched, so
+    that the caller can fetch it (e.g. asynchronously) and run the calling
+    method again; see appengine.AppEngineWrapper and asyncapi.AsyncWrapper.
+    """
+
+    def __init__(self, api, results):
+        self._api = api
+        self._results = results
+
+    def get(self, path, params=None):
+        key = str(self._api.Request(self._api, path, params))
+        if key not in self._results:
+            raise NotFetched(key, path, params)
+        result = self._results[key]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def iter_rows(self, path, params=None):
+        """Like get(), with an iterator of the rows of the result's rowset
+        as the result.
+
+        The rows come from the fetched response, which is parsed as a
+        whole: the wrapped iter_* methods never block, but don't save any
+        memory either.
+        """
+        api_result = self.get(path, params)
+        rowset = api_result.result.find('rowset')
+        rows = rowset.findall('row') if rowset is not None else []
+        return APIResult(iter(rows), api_result.timestamp, api_result.expires)
+
+    def __getattr__(self, name):
+        return getattr(self._api, name)
+
+
 def auto_api(func):
     """A decorator to automatically provide an API instance.
 
@@ -434,4 +1352,52 @@ def auto_api(func):
     return wrapper
 
 
+def cache_result(func):
+    """A decorator to cache the parsed result of an API wrapper method.
+
+    If the wrapper's API object has a ResultCache, the APIResult returned
+    by the decorated method is cached under a key made of the API key,
+    the method and its arguments, and returned as is by later calls until
+    the underlying response expires. Calls with an explicit api_result
+    (passed by keyword or position), or with arguments which can't be
+    hashed, are never cached.
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        result_cache = getattr(self.api, 'result_cache', None)
+        if not isinstance(result_cache, ResultCache):
+            return func(self, *args, **kwargs)
+        try:
+            callargs = inspect.getcallargs(func, self, *args, **kwargs)
+        except TypeError:
+            # Let the method raise its own error for bad arguments.
+            return func(self, *args, **kwargs)
+        if callargs.get('api_result') is not None:
+            return func(self, *args, **kwargs)
+
+        key = (
+            self.api.base_url,
+            self.api.api_key,
+            type(self).__name__,
+            func.__name__,
+            getattr(self, 'char_id', None),
+            args,
+            tuple(sorted(kwargs.iteritems())),
+        )
+        try:
+            hash(key)
+        except TypeError:
+            return func(self, *args, **kwargs)
+
+        result, expires = result_cache.get_with_expiration(key)
+        if result is None:
+            result = func(self, *args, **kwargs)
+            result_cache.put(key, result)
+        else:
+            _record_expiry(expires)
+        return result
+    return wrapper
+
+
 # vim: set ts=4 sts=4 sw=4 et:
@@ -1,8 +1,17 @@
+import copy
+import functools
+import time
+
 from google.appengine.api import memcache
 from google.appengine.api import urlfetch
 from google.appengine.ext import ndb
+from evelink import account
 from evelink import api
-import time
+from evelink import char
+from evelink import corp
+from evelink import eve
+from evelink import map
+from evelink import server
 
 
 class AppEngineAPIRequest(api.APIRequest):
@@ -49,43 +58,226 @@ class AppEngineAPI(api.API):
                 cache=cache, api_key=api_key)
 
     @ndb.tasklet
-    def get_async(self, path, params):
-        # req = self.Request(self, path, params)
-        # key = str(req)
-        # # TODO: add async method
-        # response = self.cache.get(key)
-        # cached = response is not None
+    def get_async(self, path, params=None):
+        """Asynchronous version of get(), for ndb tasklets.
+
+        The cache is read and updated asynchronously too, if it has
+        get_async() and put_async() methods, like the caches of this
+        module; the ndb context batches these calls with the ones of the
+        other tasklets.
+        """
+        req = self.Request(self, path, params)
+        key = str(req)
+        value = yield self._cache_get_async(key)
+        updates = []
+        try:
+            with api.CacheContext(self.cache, key, value=value,
+                                  deferred=updates) as cache:
+                if cache.value is None:
+                    response = yield req.send_async(self)
+                    results = self._process_fresh(cache, response)
+                else:
+                    results = self._process_cached(cache.value)
+                cache.duration = self._cache_duration(results)
+        finally:
+            # Cached API errors are written too.
+            if updates:
+                yield [self._cache_put_async(*update) for update in updates]
+
+        raise ndb.Return(results)
 
-        # if not cached:
-        #     response = yield req.send_async(self)
+    def _cache_get_async(self, key):
+        if hasattr(self.cache, 'get_async'):
+            return self.cache.get_async(key)
+        future = ndb.Future()
+        future.set_result(self.cache.get(key))
+        return future
 
-        # results = self.process_response(response)
+    def _cache_put_async(self, key, value, duration):
+        if hasattr(self.cache, 'put_async'):
+            return self.cache.put_async(key, value, duration)
+        future = ndb.Future()
+        future.set_result(self.cache.put(key, value, duration))
+        return future
 
-        # if not cached:
-        #     self.cache.put(key, response, results.cache_for())
 
-        # raise ndb.Return(results)
-        req = self.Request(self, path, params)
-        # TODO: replace by async method
-        with self.cache.cache_for(str(req)) as cache:
-            if cache.value is None:
-                cache.value = yield req.send_async(self)
-            
-            results = self.process_response(cache.value)
-            cache.duration = results.cache_for()
+class AppEngineWrapper(object):
+    """Base class of the ndb tasklet versions of the API wrappers.
+
+    Calling any public method of the wrapped class returns an ndb Future,
+    so that a request handler can wait for many calls at once:
+
+        char = AppEngineChar(char_id, api)
+        sheet, balance = yield char.character_sheet(), char.wallet_balance()
+
+    The method is run against a stand-in for the API. Each request it
+    makes is fetched with get_async(), and the method is run again with
+    the result, until it returns. The iter_* methods work the same way:
+    their rows are read from the fetched response (see
+    api.FetchedAPI.iter_rows).
+    """
+
+    wrapped_class = None
+
+    def __init__(self, *args, **kwargs):
+        self.wrapped = self.wrapped_class(*args, **kwargs)
+        if not isinstance(self.wrapped.api, AppEngineAPI):
+            raise ValueError("The provided api must be an AppEngineAPI.")
+        self.api = self.wrapped.api
+
+    def __getattr__(self, name):
+        attr = getattr(self.wrapped, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
 
+        @functools.wraps(attr)
+        @ndb.tasklet
+        def call_async(*args, **kwargs):
+            results = {}
+            while True:
+                wrapped = copy.copy(self.wrapped)
+                wrapped.api = api.FetchedAPI(self.api, results)
+                try:
+                    result = getattr(wrapped, name)(*args, **kwargs)
+                except api.NotFetched as e:
+                    results[e.key] = yield self.api.get_async(e.path, e.params)
+                else:
+                    raise ndb.Return(result)
+        return call_async
+
+    @ndb.tasklet
+    def get_many(self, calls):
+        """Call several of the wrapped class's methods at once.
+
+        calls is a sequence of method names, or of (method name, kwargs)
+        tuples. Returns a Future of the list of the results of the calls
+        in input order, with the exception raised by a failed call (e.g.
+        an APIError) in its slot instead.
+        """
+        futures = []
+        for call in calls:
+            if isinstance(call, basestring):
+                name, kwargs = call, {}
+            else:
+                name, kwargs = call
+            futures.append(getattr(self, name)(**kwargs))
+
+        results = []
+        for future in futures:
+            try:
+                results.append((yield future))
+            except Exception as e:
+                results.append(e)
         raise ndb.Return(results)
 
 
+def _auto_appengine_api(func):
+    """Like api.auto_api, but supplies a default AppEngineAPI instance."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if kwargs.get('api') is None:
+            kwargs['api'] = AppEngineAPI()
+        return func(*args, **kwargs)
+    return wrapper
+
+
+class AppEngineAccount(AppEngineWrapper):
+    """Tasklet version of account.Account."""
+    wrapped_class = account.Account
+
+
+class AppEngineChar(AppEngineWrapper):
+    """Tasklet version of char.Char."""
+    wrapped_class = char.Char
+
+
+class AppEngineCorp(AppEngineWrapper):
+    """Tasklet version of corp.Corp."""
+    wrapped_class = corp.Corp
+
+
+class AppEngineEVE(AppEngineWrapper):
+    """Tasklet version of eve.EVE."""
+    wrapped_class = eve.EVE
+
+    @_auto_appengine_api
+    def __init__(self, api=None):
+        super(AppEngineEVE, self).__init__(api=api)
+
+
+class AppEngineMap(AppEngineWrapper):
+    """Tasklet version of map.Map."""
+    wrapped_class = map.Map
+
+    @_auto_appengine_api
+    def __init__(self, api=None):
+        super(AppEngineMap, self).__init__(api=api)
+
+
+class AppEngineServer(AppEngineWrapper):
+    """Tasklet version of server.Server."""
+    wrapped_class = server.Server
+
+    @_auto_appengine_api
+    def __init__(self, api=None):
+        super(AppEngineServer, self).__init__(api=api)
+
+
 class AppEngineCache(api.APICache):
-    """Memcache backed APICache implementation."""
+    """Memcache backed APICache implementation.
+
+    Values are stored with their expiration, which get_with_expiration()
+    returns (e.g. for a TieredCache to promote them).
+    """
+
+    def _entry(self, value, duration):
+        """Return the (memcache expiry, stored entry) of a value."""
+        expiration = time.time() + duration
+        if duration < 0:
+            duration = expiration
+        return duration, (value, expiration)
+
     def get(self, key):
-        return memcache.get(key)
+        return self.get_with_expiration(key)[0]
+
+    def get_with_expiration(self, key):
+        return _unpack_entry(memcache.get(key))
 
     def put(self, key, value, duration):
-        if duration < 0:
-            duration = time.time() + duration
-        memcache.set(key, value, time=duration)
+        duration, entry = self._entry(value, duration)
+        memcache.set(key, entry, time=duration)
+
+    @ndb.tasklet
+    def get_async(self, key):
+        """Asynchronous get(), returning an ndb Future."""
+        entry = yield ndb.get_context().memcache_get(key)
+        raise ndb.Return(_unpack_entry(entry)[0])
+
+    def put_async(self, key, value, duration):
+        """Asynchronous put(), returning an ndb Future."""
+        duration, entry = self._entry(value, duration)
+        return ndb.get_context().memcache_set(key, entry, time=duration)
+
+    def get_multi(self, keys):
+        return dict((key, _unpack_entry(entry)[0])
+                    for key, entry in memcache.get_multi(keys).iteritems())
+
+    def put_multi(self, entries):
+        # memcache.set_multi() takes a single expiry for all of its values.
+        by_duration = {}
+        for key, value, duration in entries:
+            duration, entry = self._entry(value, duration)
+            by_duration.setdefault(duration, {})[key] = entry
+        for duration, mapping in by_duration.iteritems():
+            memcache.set_multi(mapping, time=duration)
+
+
+def _unpack_entry(entry):
+    """Split a memcache entry into a (value, expiration) tuple."""
+    if entry is None:
+        return None, None
+    return entry
 
 
 class EveLinkCache(ndb.Model):
@@ -100,14 +292,17 @@ class AppEngineDatastoreCache(api.APICache):
         super(AppEngineDatastoreCache, self).__init__()
 
     def get(self, cache_key):
+        return self.get_with_expiration(cache_key)[0]
+
+    def get_with_expiration(self, cache_key):
         db_key = ndb.Key(EveLinkCache, cache_key)
         result = db_key.get()
         if not result:
-            return None
+            return None, None
         if result.expiration < time.time():
             db_key.delete()
-            return None
-        return result.value
+            return None, None
+        return result.value, result.expiration
 
     def put(self, cache_key, value, duration):
         expiration = int(time.time() + duration)
@@ -115,3 +310,42 @@ class AppEngineDatastoreCache(api.APICache):
         cache.value = value
         cache.expiration = expiration
         cache.put()
+
+    @ndb.tasklet
+    def get_async(self, cache_key):
+        """Asynchronous get(), returning an ndb Future."""
+        db_key = ndb.Key(EveLinkCache, cache_key)
+        result = yield db_key.get_async()
+        if not result:
+            raise ndb.Return(None)
+        if result.expiration < time.time():
+            yield db_key.delete_async()
+            raise ndb.Return(None)
+        raise ndb.Return(result.value)
+
+    def put_async(self, cache_key, value, duration):
+        """Asynchronous put(), returning an ndb Future."""
+        return EveLinkCache(id=cache_key, value=value,
+                            expiration=int(time.time() + duration)).put_async()
+
+    def get_multi(self, cache_keys):
+        db_keys = [ndb.Key(EveLinkCache, cache_key) for cache_key in cache_keys]
+        now = time.time()
+        values = {}
+        expired = []
+        for cache_key, result in zip(cache_keys, ndb.get_multi(db_keys)):
+            if not result:
+                continue
+            if result.expiration < now:
+                expired.append(result.key)
+            else:
+                values[cache_key] = result.value
+        if expired:
+            ndb.delete_multi(expired)
+        return values
+
+    def put_multi(self, entries):
+        now = time.time()
+        ndb.put_multi([EveLinkCache(id=cache_key, value=value,
+                                    expiration=int(now + duration))
+                       for cache_key, value, duration in entries])
@@ -0,0 +1,824 @@
+"""Non-blocking counterparts of the EVE API wrappers.
+
+Python 2 has no event loop in its standard library, so this module has
+a minimal one: an EventLoop waits on sockets with select.poll (or
+select.select where poll is missing) and runs callbacks when they are
+ready. Asynchronous calls return a Future; its result() method runs the
+loop until the call completes, so that all of the calls in flight make
+progress together, on a single thread:
+
+    eve_api = AsyncAPI(api_key=(key_id, v_code))
+    char = AsyncChar(char_id, api=eve_api)
+    sheet, balance = gather([char.character_sheet(), char.wallet_balance()]).result()
+
+AsyncHTTPTransport sends the requests over non-blocking sockets. The
+wrappers (AsyncChar, AsyncCorp, ...) run the methods of the regular
+wrapper classes, so they share all of their parsing code.
+
+Nothing here is thread-safe: an AsyncAPI, its transport and their loop
+must be used from a single thread.
+"""
+
+import collections
+import copy
+import errno
+import functools
+import heapq
+import itertools
+import logging
+import os
+import select
+import socket
+import ssl
+import time
+import urllib2
+import urlparse
+from StringIO import StringIO
+
+from evelink import account
+from evelink import api
+from evelink import char
+from evelink import corp
+from evelink import eve
+from evelink import map
+from evelink import server
+from evelink import transport
+
+_log = logging.getLogger('evelink.asyncapi')
+
+_WOULD_BLOCK = (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINPROGRESS)
+
+
+class _Timer(object):
+
+    def __init__(self, when, callback):
+        self.when = when
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class EventLoop(object):
+    """Runs callbacks when sockets are ready, or at a given time.
+
+    Sockets are watched by file descriptor, with add_reader() and
+    add_writer(); each descriptor has at most one callback of each kind.
+    """
+
+    def __init__(self):
+        self._readers = {}
+        self._writers = {}
+        self._timers = []
+        self._ready = collections.deque()
+        self._sequence = itertools.count()
+
+    def add_reader(self, fd, callback):
+        self._readers[fd] = callback
+
+    def remove_reader(self, fd):
+        self._readers.pop(fd, None)
+
+    def add_writer(self, fd, callback):
+        self._writers[fd] = callback
+
+    def remove_writer(self, fd):
+        self._writers.pop(fd, None)
+
+    def call_soon(self, callback, *args):
+        """Run callback(*args) on the next iteration of the loop."""
+        self._ready.append(functools.partial(callback, *args))
+
+    def call_later(self, delay, callback, *args):
+        """Run callback(*args) in delay seconds.
+
+        Returns a timer, whose cancel() method drops the call.
+        """
+        timer = _Timer(time.time() + delay, functools.partial(callback, *args))
+        heapq.heappush(self._timers, (timer.when, next(self._sequence), timer))
+        return timer
+
+    def run_until_complete(self, future, timeout=None):
+        """Run the loop until future is done, or for at most timeout seconds.
+
+        The loop may be run again from one of its callbacks, e.g. by a
+        blocking get() made while handling a response.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while not future.done():
+            wait = None if deadline is None else deadline - time.time()
+            if wait is not None and wait <= 0:
+                break
+            if not self._run_once(wait):
+                raise RuntimeError("The event loop has nothing left to run.")
+
+    def _run_once(self, max_wait=None):
+        """Wait for the next callbacks to be due, and run them.
+
+        Returns False if there is nothing to wait for.
+        """
+        while self._timers and self._timers[0][2].cancelled:
+            heapq.heappop(self._timers)
+        if not (self._ready or self._readers or self._writers or self._timers):
+            return False
+
+        wait = max_wait
+        if self._ready:
+            wait = 0
+        elif self._timers:
+            until_timer = max(self._timers[0][0] - time.time(), 0)
+            wait = until_timer if wait is None else min(wait, until_timer)
+
+        if self._readers or self._writers:
+            for fd, readable, writable in self._poll(wait):
+                if readable and fd in self._readers:
+                    self._ready.append(functools.partial(
+                        self._dispatch, self._readers, fd, self._readers[fd]))
+                if writable and fd in self._writers:
+                    self._ready.append(functools.partial(
+                        self._dispatch, self._writers, fd, self._writers[fd]))
+        elif wait:
+            time.sleep(wait)
+
+        now = time.time()
+        while self._timers and self._timers[0][0] <= now:
+            timer = heapq.heappop(self._timers)[2]
+            if not timer.cancelled:
+                self._ready.append(timer.callback)
+
+        for _ in xrange(len(self._ready)):
+            if not self._ready:
+                # Run by a nested run of the loop.
+                break
+            self._ready.popleft()()
+        return True
+
+    def _dispatch(self, registry, fd, callback):
+        # An earlier callback may have dropped this one, or closed the
+        # descriptor and registered another socket with the same number.
+        if registry.get(fd) == callback:
+            callback()
+
+    def _poll(self, wait):
+        """Return (fd, readable, writable) for the descriptors which are ready."""
+        try:
+            if hasattr(select, 'poll'):
+                return self._poll_poll(wait)
+            return self._poll_select(wait)
+        except (select.error, IOError, OSError) as e:
+            if e.args[0] == errno.EINTR:
+                return []
+            raise
+
+    def _poll_poll(self, wait):
+        poller = select.poll()
+        for fd in set(self._readers).union(self._writers):
+            mask = 0
+            if fd in self._readers:
+                mask |= select.POLLIN
+            if fd in self._writers:
+                mask |= select.POLLOUT
+            poller.register(fd, mask)
+        errors = select.POLLERR | select.POLLHUP | select.POLLNVAL
+        return [(fd, bool(event & (select.POLLIN | errors)),
+                 bool(event & (select.POLLOUT | errors)))
+                for fd, event in poller.poll(None if wait is None else wait * 1000)]
+
+    def _poll_select(self, wait):
+        # Windows reports failed connections as exceptional conditions.
+        readers, writers, failed = select.select(
+            list(self._readers), list(self._writers), list(self._writers), wait)
+        writers = set(writers).union(failed)
+        return [(fd, fd in readers, fd in writers)
+                for fd in set(readers).union(writers)]
+
+
+class Future(object):
+    """The result of an asynchronous call.
+
+    result() returns the value of the call, or raises its exception,
+    running the event loop until the call is done.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self._done = False
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+
+    def done(self):
+        return self._done
+
+    def result(self):
+        self._wait()
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self):
+        """Return the exception raised by the call, or None."""
+        self._wait()
+        return self._exception
+
+    def add_done_callback(self, callback):
+        """Call callback(future) once the future is done (or now, if it is)."""
+        if self._done:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def set_result(self, result):
+        self._complete(result, None)
+
+    def set_exception(self, exception):
+        self._complete(None, exception)
+
+    def _complete(self, result, exception):
+        if self._done:
+            raise RuntimeError("The future is already done.")
+        self._done = True
+        self._result = result
+        self._exception = exception
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                _log.exception("Callback of %r failed", self)
+
+    def _wait(self):
+        if not self._done:
+            self.loop.run_until_complete(self)
+
+
+def _resolve(future, func, *args):
+    """Complete future with the value returned, or the exception raised,
+    by func(*args)."""
+    try:
+        result = func(*args)
+    except Exception as e:
+        future.set_exception(e)
+    else:
+        future.set_result(result)
+
+
+def _outcome(future):
+    """Return the result of a done future, or the exception it raised."""
+    exception = future.exception()
+    if exception is not None:
+        return exception
+    return future.result()
+
+
+def gather(futures):
+    """Return a Future of the list of the results of futures.
+
+    The results are in input order; a call which raised (e.g. an
+    APIError) has the exception in its slot instead.
+    """
+    futures = list(futures)
+    gathered = Future(futures[0].loop if futures else None)
+    if not futures:
+        gathered.set_result([])
+        return gathered
+
+    remaining = [len(futures)]
+
+    def done(_):
+        remaining[0] -= 1
+        if not remaining[0]:
+            gathered.set_result([_outcome(f) for f in futures])
+
+    for future in futures:
+        future.add_done_callback(done)
+    return gathered
+
+
+def _parse_headers(head):
+    """Return the headers of a response head, by lower-case name."""
+    headers = {}
+    for line in head.split('\r\n')[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+class _Exchange(object):
+    """A single request and response of an AsyncHTTPTransport.
+
+    Requests are made with HTTP/1.0, so that the response is never
+    chunked: it ends after its Content-Length, or when the server closes
+    the connection.
+    """
+
+    def __init__(self, owner, future, url, data):
+        self.owner = owner
+        self.loop = owner.loop
+        self.future = future
+        self.url = url
+        parts = urlparse.urlsplit(url)
+        self.https = parts.scheme == 'https'
+        self.host = parts.netloc
+        self.address = (parts.hostname, parts.port or (443 if self.https else 80))
+
+        path = parts.path or '/'
+        if parts.query:
+            path = '%s?%s' % (path, parts.query)
+        lines = ['%s %s HTTP/1.0' % ('GET' if data is None else 'POST', path),
+                 'Host: %s' % self.host,
+                 'Connection: close']
+        if data is not None:
+            lines.append('Content-Type: application/x-www-form-urlencoded')
+            lines.append('Content-Length: %d' % len(data))
+        self.request = '\r\n'.join(lines) + '\r\n\r\n' + (data or '')
+        self.response = []
+        self.received = 0
+        # The length of the whole response, once its headers are read.
+        self.expected = None
+        self.sock = None
+        self.timer = None
+
+    def start(self):
+        self.timer = self.loop.call_later(self.owner.timeout, self._timed_out)
+        try:
+            # Name resolution blocks; the hosts of the EVE API are few, so
+            # the system's resolver cache answers most lookups.
+            family, socktype, proto, _, address = socket.getaddrinfo(
+                self.address[0], self.address[1], 0, socket.SOCK_STREAM)[0]
+            self.sock = socket.socket(family, socktype, proto)
+            self.sock.setblocking(0)
+            error = self.sock.connect_ex(address)
+            if error and error not in _WOULD_BLOCK:
+                raise socket.error(error, os.strerror(error))
+        except socket.error as e:
+            # Failures are reported from the loop, as for the later steps.
+            self.loop.call_soon(self._fail, e)
+            return
+        self._wait(False, self._connected)
+
+    def _wait(self, readable, callback):
+        fd = self.sock.fileno()
+        self.loop.remove_reader(fd)
+        self.loop.remove_writer(fd)
+        if readable:
+            self.loop.add_reader(fd, callback)
+        else:
+            self.loop.add_writer(fd, callback)
+
+    def _wait_ssl(self, error, callback):
+        """Wait for the socket an SSL operation needs; return False if
+        the error isn't about waiting."""
+        if error.args[0] == ssl.SSL_ERROR_WANT_READ:
+            self._wait(True, callback)
+        elif error.args[0] == ssl.SSL_ERROR_WANT_WRITE:
+            self._wait(False, callback)
+        else:
+            return False
+        return True
+
+    def _connected(self):
+        error = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if error:
+            return self._fail(socket.error(error, os.strerror(error)))
+        if not self.https:
+            return self._send()
+        try:
+            self.sock = self.owner._wrap_ssl(self.sock, self.address[0])
+        except (socket.error, ssl.SSLError) as e:
+            return self._fail(e)
+        self._handshake()
+
+    def _handshake(self):
+        try:
+            self.sock.do_handshake()
+        except ssl.SSLError as e:
+            if not self._wait_ssl(e, self._handshake):
+                self._fail(e)
+            return
+        except Exception as e:
+            # e.g. ssl.CertificateError, for a certificate of another host.
+            return self._fail(e)
+        self._send()
+
+    def _send(self):
+        try:
+            sent = self.sock.send(self.request)
+        except ssl.SSLError as e:
+            if not self._wait_ssl(e, self._send):
+                self._fail(e)
+            return
+        except socket.error as e:
+            if e.args[0] in _WOULD_BLOCK:
+                return self._wait(False, self._send)
+            return self._fail(e)
+        self.request = self.request[sent:]
+        if self.request:
+            return self._wait(False, self._send)
+        self._wait(True, self._receive)
+
+    def _receive(self):
+        # Read until the socket would block: an SSL socket may hold more
+        # decrypted data than the descriptor signals.
+        while True:
+            try:
+                chunk = self.sock.recv(65536)
+            except ssl.SSLError as e:
+                if self._wait_ssl(e, self._receive):
+                    return
+                if not self.response:
+                    return self._fail(e)
+                # Servers often close the connection without ending the
+                # TLS session; the response is checked for completeness.
+                return self._received()
+            except socket.error as e:
+                if e.args[0] in _WOULD_BLOCK:
+                    return
+                return self._fail(e)
+            if not chunk:
+                return self._received()
+            self.response.append(chunk)
+            self.received += len(chunk)
+            if self.expected is None:
+                self.expected = self._expected_length()
+            if self.expected is not None and 0 <= self.expected <= self.received:
+                return self._received()
+
+    def _expected_length(self):
+        """Return the length of the response from its Content-Length, -1
+        if it has none, or None if its headers haven't been read yet."""
+        data = ''.join(self.response)
+        end = data.find('\r\n\r\n')
+        if end < 0:
+            return None
+        length = _parse_headers(data[:end]).get('content-length', '')
+        if not length.isdigit():
+            return -1
+        return end + 4 + int(length)
+
+    def _received(self):
+        self._close()
+        head, separator, body = ''.join(self.response).partition('\r\n\r\n')
+        status = head.split('\r\n', 1)[0].split(None, 2)
+        if (not separator or len(status) < 2 or not status[0].startswith('HTTP/')
+                or not status[1].isdigit()):
+            return self._fail(socket.error("Bad response from %s: %r" %
+                                           (self.host, head[:100])))
+        headers = _parse_headers(head)
+        length = headers.get('content-length', '')
+        if length.isdigit():
+            if len(body) < int(length):
+                return self._fail(socket.error("Incomplete response from %s" %
+                                               self.host))
+            body = body[:int(length)]
+
+        code = int(status[1])
+        if code >= 400:
+            reason = status[2] if len(status) > 2 else ''
+            return self._finish(None, urllib2.HTTPError(
+                self.url, code, reason, headers, StringIO(body)))
+        self._finish(body, None)
+
+    def _timed_out(self):
+        self.timer = None
+        self._fail(socket.timeout('timed out'))
+
+    def _fail(self, error):
+        self._close()
+        self._finish(None, urllib2.URLError(error))
+
+    def _close(self):
+        if self.sock is not None:
+            fd = self.sock.fileno()
+            self.loop.remove_reader(fd)
+            self.loop.remove_writer(fd)
+            self.sock.close()
+            self.sock = None
+
+    def _finish(self, result, exception):
+        if self.future.done():
+            return
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.owner._release(self)
+        if exception is not None:
+            self.future.set_exception(exception)
+        else:
+            self.future.set_result(result)
+
+
+class AsyncHTTPTransport(transport.Transport):
+    """A transport sending requests over non-blocking sockets.
+
+    send_async() returns a Future of the body of the response; send()
+    runs the loop until the response is received. Requests beyond
+    max_connections, or max_per_host for their host, wait in a queue.
+    Each request is made on a new connection. As with HTTPTransport,
+    error responses (4xx and 5xx) raise urllib2.HTTPError, and network
+    failures and timeouts raise urllib2.URLError.
+
+    The loop is given with the loop keyword argument; by default the
+    transport has its own.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.loop = kwargs.pop('loop', None) or EventLoop()
+        super(AsyncHTTPTransport, self).__init__(*args, **kwargs)
+        self._queue = collections.deque()
+        self._active = set()
+        self._active_per_host = {}
+        self._ssl_context = None
+
+    def send(self, url, data=None):
+        return self.send_async(url, data).result()
+
+    def send_async(self, url, data=None):
+        """Start a request for url; return a Future of the response body."""
+        future = Future(self.loop)
+        self._queue.append(_Exchange(self, future, url, data))
+        self._start_queued()
+        return future
+
+    def _start_queued(self):
+        for _ in xrange(len(self._queue)):
+            if len(self._active) >= self.max_connections:
+                break
+            exchange = self._queue.popleft()
+            if self._active_per_host.get(exchange.host, 0) >= self.max_per_host:
+                self._queue.append(exchange)
+                continue
+            self._active.add(exchange)
+            self._active_per_host[exchange.host] = (
+                self._active_per_host.get(exchange.host, 0) + 1)
+            exchange.start()
+
+    def _release(self, exchange):
+        self._active.discard(exchange)
+        self._active_per_host[exchange.host] -= 1
+        if not self._active_per_host[exchange.host]:
+            del self._active_per_host[exchange.host]
+        self._start_queued()
+
+    def _wrap_ssl(self, sock, hostname):
+        if hasattr(ssl, 'create_default_context'):
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            return self._ssl_context.wrap_socket(sock, server_hostname=hostname,
+                do_handshake_on_connect=False)
+        # Before Python 2.7.9, certificates aren't checked (as by httplib).
+        return ssl.wrap_socket(sock, do_handshake_on_connect=False)
+
+    def close(self):
+        """Fail the requests in flight or queued."""
+        self._queue.clear()
+        for exchange in list(self._active):
+            exchange._fail(socket.error("The transport was closed."))
+
+
+class AsyncAPI(api.API):
+    """An API whose requests can be made without blocking.
+
+    get_async() returns a Future of the APIResult of a request. The
+    request is sent with the transport's send_async() (by default, an
+    AsyncHTTPTransport's); a blocking transport, e.g. a FakeTransport,
+    is called at once instead. Identical requests in flight share a
+    single response.
+
+    The cache is read and updated on the loop's thread, without waiting
+    for the network: an in-process APICache keeps the loop from blocking.
+    get() and get_many() run the loop until their requests complete.
+    """
+
+    def __init__(self, *args, **kwargs):
+        loop = kwargs.pop('loop', None)
+        super(AsyncAPI, self).__init__(*args, **kwargs)
+        if self.transport is None:
+            self.transport = AsyncHTTPTransport(loop=loop)
+        self.loop = getattr(self.transport, 'loop', None) or loop or EventLoop()
+        self._in_flight = {}
+
+    def get(self, path, params=None):
+        return self.get_async(path, params).result()
+
+    def get_many(self, requests, max_workers=None):
+        """Request several paths concurrently, on the event loop.
+
+        Returns a list like API.get_many(); max_workers is ignored.
+        """
+        return gather([self.get_async(path, params)
+                       for path, params in requests]).result()
+
+    def get_async(self, path, params=None):
+        """Asynchronous version of get(), returning a Future."""
+        req = self.Request(self, path, params)
+        cache = self.cache.cache_for(str(req))
+        if not self._use_cached(req, cache):
+            return self._fetch_async(req, cache)
+
+        _log.debug("Cache hit, returning cached payload")
+        future = Future(self.loop)
+        _resolve(future, self._complete, cache,
+                 functools.partial(self._process_cached, cache.value))
+        return future
+
+    def _complete(self, cache, process):
+        with cache:
+            results = process()
+            cache.duration = self._cache_duration(results)
+        return results
+
+    def _fetch_async(self, req, cache):
+        """Send a request missing from the cache; return a Future of its
+        APIResult, which is cached once received."""
+        future = Future(self.loop)
+        try:
+            response = self._send_async(req, cache)
+        except Exception as e:
+            future.set_exception(e)
+            return future
+
+        def process(response):
+            _resolve(future, self._complete, cache,
+                     lambda: self._process_fresh(cache, response.result()))
+        response.add_done_callback(process)
+        return future
+
+    def _send_async(self, req, cache):
+        """Return a Future of the response of a request."""
+        if self.access_planner is not None:
+            self.access_planner.check(self, req.path, req.params)
+        key = str(req)
+        response = self._in_flight.get(key)
+        if response is not None:
+            _log.debug("Shared the response of an identical request")
+            cache.write = False
+            return response
+
+        send_async = getattr(self.transport, 'send_async', None)
+        if send_async is not None:
+            response = send_async(req.absolute_url,
+                                  req.encoded_params if req.params else None)
+        else:
+            response = Future(self.loop)
+            _resolve(response, req.send, self)
+        self._in_flight[key] = response
+        response.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return response
+
+    def refresh_in_background(self, req):
+        """Fetch a request on the event loop and cache its response.
+
+        Does nothing if the request is already in flight. Returns the
+        Future of the refreshed APIResult, or None.
+        """
+        key = str(req)
+        if key in self._in_flight:
+            return None
+        _log.debug("Refreshing %s in the background", req.path)
+        future = self._fetch_async(req, api.CacheContext(self.cache, key, value=None))
+        self._refreshing[key] = future
+
+        def done(future):
+            del self._refreshing[key]
+            exception = future.exception()
+            if isinstance(exception, api.APIError):
+                _log.warning("Background refresh of %s failed: %r", req.path, exception)
+            elif exception is not None:
+                # Keep serving the cached response; the next request will
+                # try again.
+                _log.error("Background refresh of %s failed: %r", req.path, exception)
+        future.add_done_callback(done)
+        return future
+
+    def join_refreshes(self, timeout=None):
+        """Run the loop until the background refreshes in progress complete."""
+        refreshes = gather(self._refreshing.values())
+        if not refreshes.done():
+            self.loop.run_until_complete(refreshes, timeout)
+
+
+class AsyncWrapper(object):
+    """Base class of the asynchronous versions of the API wrappers.
+
+    Calling any public method of the wrapped class returns a Future:
+
+        char = AsyncChar(char_id, api=eve_api)
+        futures = [char.character_sheet(), char.wallet_balance()]
+        sheet, balance = gather(futures).result()
+
+    The method is run against a stand-in for the API. Each request it
+    makes is fetched with get_async(), and the method is run again with
+    the result, until it returns. The iter_* methods work the same way:
+    their rows are read from the fetched response (see
+    api.FetchedAPI.iter_rows).
+    """
+
+    wrapped_class = None
+
+    def __init__(self, *args, **kwargs):
+        self.wrapped = self.wrapped_class(*args, **kwargs)
+        if not isinstance(self.wrapped.api, AsyncAPI):
+            raise ValueError("The provided api must be an AsyncAPI.")
+        self.api = self.wrapped.api
+
+    def __getattr__(self, name):
+        attr = getattr(self.wrapped, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def call_async(*args, **kwargs):
+            future = Future(self.api.loop)
+            self._run(future, {}, name, args, kwargs)
+            return future
+        return call_async
+
+    def _run(self, future, results, name, args, kwargs):
+        wrapped = copy.copy(self.wrapped)
+        wrapped.api = api.FetchedAPI(self.api, results)
+        try:
+            result = getattr(wrapped, name)(*args, **kwargs)
+        except api.NotFetched as e:
+            def fetched(response, key=e.key):
+                results[key] = _outcome(response)
+                self._run(future, results, name, args, kwargs)
+            self.api.get_async(e.path, e.params).add_done_callback(fetched)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    def get_many(self, calls):
+        """Call several of the wrapped class's methods at once.
+
+        calls is a sequence of method names, or of (method name, kwargs)
+        tuples. Returns a Future of the list of the results of the calls
+        in input order, with the exception raised by a failed call (e.g.
+        an APIError) in its slot instead.
+        """
+        futures = []
+        for call in calls:
+            if isinstance(call, basestring):
+                name, kwargs = call, {}
+            else:
+                name, kwargs = call
+            futures.append(getattr(self, name)(**kwargs))
+        return gather(futures)
+
+
+def _auto_async_api(func):
+    """Like api.auto_api, but supplies a default AsyncAPI instance."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if kwargs.get('api') is None:
+            kwargs['api'] = AsyncAPI()
+        return func(*args, **kwargs)
+    return wrapper
+
+
+class AsyncAccount(AsyncWrapper):
+    """Asynchronous version of account.Account."""
+    wrapped_class = account.Account
+
+
+class AsyncChar(AsyncWrapper):
+    """Asynchronous version of char.Char."""
+    wrapped_class = char.Char
+
+
+class AsyncCorp(AsyncWrapper):
+    """Asynchronous version of corp.Corp."""
+    wrapped_class = corp.Corp
+
+
+class AsyncEVE(AsyncWrapper):
+    """Asynchronous version of eve.EVE."""
+    wrapped_class = eve.EVE
+
+    @_auto_async_api
+    def __init__(self, api=None):
+        super(AsyncEVE, self).__init__(api=api)
+
+
+class AsyncMap(AsyncWrapper):
+    """Asynchronous version of map.Map."""
+    wrapped_class = map.Map
+
+    @_auto_async_api
+    def __init__(self, api=None):
+        super(AsyncMap, self).__init__(api=api)
+
+
+class AsyncServer(AsyncWrapper):
+    """Asynchronous version of server.Server."""
+    wrapped_class = server.Server
+
+    @_auto_async_api
+    def __init__(self, api=None):
+        super(AsyncServer, self).__init__(api=api)
+
+
+# vim: set ts=4 sts=4 sw=4 et:
@@ -0,0 +1,77 @@
+"""Encoding of the values stored by the persistent caches.
+
+API responses are repetitive XML, which zlib shrinks by an order of
+magnitude; smaller cache files mean fewer page cache misses when reading
+them back. A Codec turns a value into a byte string starting with a
+type tag:
+
+    'S'  a byte string, stored as it is
+    'Z'  a byte string, compressed with zlib
+    'P'  any other value, pickled
+    'Y'  any other value, pickled then compressed with zlib
+
+Values shorter than the threshold are not compressed, since zlib saves
+little on them and costs a call.
+
+The persistent caches (SqliteCache, ShelveCache, MmapLogCache and
+RedisCache) encode the values they store with their codec argument,
+DEFAULT_CODEC unless given. With None, values are not compressed:
+SqliteCache and ShelveCache then store them as they did before codecs,
+and the others use a Codec with level 0.
+"""
+
+import pickle
+import zlib
+
+RAW = 'S'
+ZLIB = 'Z'
+PICKLE = 'P'
+ZLIB_PICKLE = 'Y'
+
+
+class Codec(object):
+    """Encode cache values, compressing the larger ones with zlib.
+
+    level:
+        the zlib compression level, from 1 (fastest) to 9 (smallest), or 0
+        not to compress at all.
+    threshold:
+        the minimum length in bytes of the values to compress.
+    """
+
+    def __init__(self, level=6, threshold=512):
+        if not 0 <= level <= 9:
+            raise ValueError("level must be between 0 and 9.")
+        self.level = level
+        self.threshold = threshold
+
+    def encode(self, value):
+        """Return a value as a tagged byte string."""
+        if isinstance(value, str):
+            tag, data = RAW, value
+        else:
+            tag, data = PICKLE, pickle.dumps(value, 2)
+        if self.level and len(data) >= self.threshold:
+            tag = ZLIB if tag == RAW else ZLIB_PICKLE
+            data = zlib.compress(data, self.level)
+        return tag + data
+
+    def decode(self, data):
+        """Return the value encoded in a tagged byte string."""
+        tag = data[:1]
+        if tag == RAW:
+            return data[1:]
+        if tag == ZLIB:
+            return zlib.decompress(data[1:])
+        if tag == PICKLE:
+            return pickle.loads(data[1:])
+        if tag == ZLIB_PICKLE:
+            return pickle.loads(zlib.decompress(data[1:]))
+        raise ValueError("Unknown cache value encoding %r" % tag)
+
+    def __repr__(self):
+        return 'Codec(level=%d, threshold=%d)' % (self.level, self.threshold)
+
+
+# Used by the persistent caches unless they are given another codec.
+DEFAULT_CODEC = Codec()
@@ -0,0 +1,350 @@
+"""A cache stored in an append-only, memory-mapped log file.
+
+The file starts with MAGIC, followed by records made of a header, the
+key and the encoded value (see evelink.cache.codec):
+
+    crc32       4 bytes, of the rest of the record
+    key length  4 bytes
+    value size  4 bytes
+    expiration  8 bytes, a float; 0 for a deleted entry
+    key
+    value
+
+All integers are little-endian. A later record for a key supersedes the
+earlier ones. An interrupted write leaves an incomplete record at the end
+of the file, which the crc32 reveals; it is ignored, and the next write
+rewrites the log without it. The log is never truncated in place, since
+accessing the truncated part of a map kills the process: it is rewritten
+to a new file, which replaces it.
+"""
+
+import contextlib
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from evelink import api
+from evelink.cache import codec as cache_codec
+
+MAGIC = 'evelink-mmaplog-1\n'
+
+_HEADER = struct.Struct('<IIId')
+_BODY = struct.Struct('<IId')
+
+
+class MmapLogCache(api.APICache):
+    """An implementation of APICache using an append-only log file.
+
+    The log is memory-mapped and indexed in memory: a get() is a dict
+    lookup and a slice of the map, without any SQL, unpickling or system
+    call, and get_buffer() returns the stored bytes without copying them.
+    The index is rebuilt by reading the log when the cache is opened.
+
+    Several processes can use the same log: writes take an exclusive lock
+    on path + '.lock', and each process reads the records appended by the
+    others, at the latest refresh_interval seconds after they are
+    written, and right away when a key is missing. Since the file is only
+    ever appended to, the processes share its pages through the page cache.
+
+    Superseded and expired records are garbage; expired entries are
+    dropped from the index, and their records counted as garbage, every
+    sweep_interval seconds (by the next put()). Once the garbage takes
+    more than compact_ratio of a log larger than compact_min_size bytes,
+    a background thread compacts the log: it writes the live records to a
+    new file, which then replaces the log. Reads carry on from the old
+    map meanwhile.
+    """
+
+    def __init__(self, path, refresh_interval=1.0, compact_ratio=0.5,
+                 compact_min_size=1024 * 1024, sweep_interval=300,
+                 codec=cache_codec.DEFAULT_CODEC):
+        super(MmapLogCache, self).__init__(sweep_interval=sweep_interval)
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.compact_ratio = compact_ratio
+        self.compact_min_size = compact_min_size
+        self.codec = codec or cache_codec.Codec(level=0)
+        self.compactions = 0
+        self._write_lock = threading.Lock()
+        self._lock_file = open(path + '.lock', 'a')
+        self._compactor = None
+        self._closed = False
+        with self._write_locks():
+            self._open()
+
+    @contextlib.contextmanager
+    def _write_locks(self):
+        """Lock the log against the writes of the other threads and processes.
+
+        The flock() is shared by the threads of the process, hence the
+        thread lock.
+        """
+        with self._write_lock:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _open(self):
+        """(Re)open the log, and rebuild the index from it."""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        if os.fstat(fd).st_size == 0:
+            os.write(fd, MAGIC)
+        elif os.read(fd, len(MAGIC)) != MAGIC:
+            os.close(fd)
+            raise ValueError("%s is not a cache log." % self.path)
+        with self._lock:
+            old_fd = getattr(self, '_fd', None)
+            self._fd = fd
+            self._inode = os.fstat(fd).st_ino
+            self._map = None
+            self._mapped = 0
+            self._index = {}
+            self._end = len(MAGIC)
+            self._garbage = 0
+            self._next_refresh = 0
+            self._scan()
+        if old_fd is not None:
+            os.close(old_fd)
+
+    def _remap(self, size):
+        """Map the first size bytes of the log; the caller holds the lock.
+
+        The previous map isn't closed: the buffers returned by
+        get_buffer() may still refer to it, and it is unmapped once they
+        are gone.
+        """
+        if size > self._mapped:
+            self._map = mmap.mmap(self._fd, size, access=mmap.ACCESS_READ)
+            self._mapped = size
+
+    def _scan(self):
+        """Index the records written since the last scan; the caller holds the lock.
+
+        Returns the offset of the end of the last complete record.
+        """
+        size = os.fstat(self._fd).st_size
+        if size > self._end:
+            self._remap(size)
+        now = time.time()
+        offset = self._end
+        data = self._map
+        while offset + _HEADER.size <= size:
+            crc, key_length, value_size, expiration = _HEADER.unpack_from(data, offset)
+            end = offset + _HEADER.size + key_length + value_size
+            if end > size:
+                break
+            if zlib.crc32(data[offset + 4:end]) & 0xffffffff != crc:
+                break
+            key_start = offset + _HEADER.size
+            key = data[key_start:key_start + key_length]
+            previous = self._index.pop(key, None)
+            if previous is not None:
+                self._garbage += previous[1]
+            if expiration >= now:
+                self._index[key] = (offset, end - offset, key_start + key_length,
+                                    value_size, expiration)
+            else:
+                self._garbage += end - offset
+            offset = end
+        self._end = offset
+        self._next_refresh = time.time() + self.refresh_interval
+        return offset
+
+    def _refresh(self):
+        """Catch up with the writes (and compactions) of other processes."""
+        try:
+            inode = os.stat(self.path).st_ino
+        except OSError:
+            inode = None
+        if inode != self._inode:
+            with self._write_locks():
+                self._reopen_if_replaced()
+        else:
+            with self._lock:
+                self._scan()
+
+    def _lookup(self, key):
+        """Return the (map, value offset, size, expiration) of a live key, or None."""
+        if time.time() >= self._next_refresh:
+            self._refresh()
+        with self._lock:
+            entry = self._index.get(key)
+            data = self._map
+        if entry is None:
+            self._refresh()
+            with self._lock:
+                entry = self._index.get(key)
+                data = self._map
+            if entry is None:
+                self.misses += 1
+                return None
+        _, _, value_offset, value_size, expiration = entry
+        if expiration < time.time():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data, value_offset, value_size, expiration
+
+    def __len__(self):
+        now = time.time()
+        with self._lock:
+            return sum(1 for entry in self._index.itervalues() if entry[4] >= now)
+
+    def get(self, key):
+        return self.get_with_expiration(key)[0]
+
+    def get_with_expiration(self, key):
+        found = self._lookup(key)
+        if found is None:
+            return None, None
+        data, value_offset, value_size, expiration = found
+        return self.codec.decode(data[value_offset:value_offset + value_size]), expiration
+
+    def get_buffer(self, key):
+        """Return the encoded value of a key as a buffer over the map, or None.
+
+        The buffer starts with the type tag of the codec; it shares the
+        map's memory, so nothing is copied until it is read.
+        """
+        found = self._lookup(key)
+        if found is None:
+            return None
+        data, value_offset, value_size, _ = found
+        return buffer(data, value_offset, value_size)
+
+    def put(self, key, value, duration):
+        self.put_multi([(key, value, duration)])
+
+    def put_multi(self, entries):
+        now = time.time()
+        records = []
+        for key, value, duration in entries:
+            if isinstance(key, unicode):
+                key = key.encode('utf-8')
+            if duration > 0:
+                payload = self.codec.encode(value)
+                expiration = now + duration
+            else:
+                payload = ''
+                expiration = 0
+            body = _BODY.pack(len(key), len(payload), expiration) + key + payload
+            records.append(struct.pack('<I', zlib.crc32(body) & 0xffffffff) + body)
+        if not records:
+            return
+        with self._write_locks():
+            if self._closed:
+                raise ValueError("The cache is closed.")
+            self._reopen_if_replaced()
+            with self._lock:
+                end = self._scan()
+            if os.fstat(self._fd).st_size > end:
+                # A crashed writer left an incomplete record.
+                self._rewrite()
+            os.write(self._fd, ''.join(records))
+            with self._lock:
+                self._scan()
+        self._maybe_compact()
+
+    def _reopen_if_replaced(self):
+        """Reopen the log if another process replaced it; the caller holds
+        the write locks."""
+        if os.stat(self.path).st_ino != self._inode:
+            self._open()
+
+    def _maybe_compact(self):
+        now = time.time()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            size = self._end
+            garbage = self._garbage
+        if (size < self.compact_min_size or garbage < size * self.compact_ratio
+                or self._compactor is not None):
+            return
+        with self._lock:
+            if self._compactor is not None or self._closed:
+                return
+            self._compactor = threading.Thread(target=self._compact_in_background,
+                                               name='evelink-mmaplog-compactor')
+            self._compactor.daemon = True
+            self._compactor.start()
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        finally:
+            self._compactor = None
+
+    def compact(self):
+        """Rewrite the log without its expired and superseded records."""
+        with self._write_locks():
+            if self._closed:
+                return
+            self._reopen_if_replaced()
+            with self._lock:
+                self._scan()
+            self._rewrite()
+        self.compactions += 1
+
+    def _rewrite(self, keep=True):
+        """Replace the log with a copy of its live records (or an empty
+        one); the caller holds the write locks."""
+        now = time.time()
+        with self._lock:
+            live = sorted(entry[:2] for entry in self._index.itervalues()
+                          if keep and entry[4] >= now)
+            data = self._map
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            for offset, length in live:
+                f.write(data[offset:offset + length])
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp_path, self.path)
+        self._open()
+
+    def _sweep(self, now):
+        """Drop the expired entries from the index, counting their records
+        as garbage; the caller holds the lock."""
+        expired = [key for key, entry in self._index.iteritems() if entry[4] < now]
+        for key in expired:
+            self._garbage += self._index.pop(key)[1]
+        self.expirations += len(expired)
+        self._next_sweep = now + self.sweep_interval
+        return len(expired)
+
+    def sweep(self):
+        """Drop the expired entries from the index; return how many there were.
+
+        Their records are removed by the next compaction.
+        """
+        with self._lock:
+            count = self._sweep(time.time())
+        self._maybe_compact()
+        return count
+
+    def clear(self):
+        with self._write_locks():
+            self._rewrite(keep=False)
+
+    def close(self):
+        """Wait for a running compaction, and close the log."""
+        if self._closed:
+            return
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        with self._write_locks():
+            if self._closed:
+                return
+            self._closed = True
+            os.close(self._fd)
+        self._lock_file.close()
+
@@ -0,0 +1,107 @@
+from __future__ import absolute_import
+
+import logging
+import time
+
+from evelink import api
+from evelink.cache import codec as cache_codec
+
+_log = logging.getLogger('evelink.cache.redis')
+
+try:
+    import redis
+    _has_redis = True
+except ImportError:
+    _log.info('`redis` not available, RedisCache is disabled')
+    _has_redis = False
+
+# The maximum number of keys looked up by one MGET of get_multi().
+_MAX_KEYS_PER_COMMAND = 1000
+
+
+class RedisCache(api.APICache):
+    """An implementation of APICache using a redis server (with redis-py),
+    which every host making requests can share."""
+
+    def __init__(self, host='localhost', port=6379, db=0, password=None,
+                 unix_socket_path=None, timeout=5, key_prefix='evelink:',
+                 codec=cache_codec.DEFAULT_CODEC):
+        if not _has_redis:
+            raise ValueError("RedisCache requires the redis library.")
+        super(RedisCache, self).__init__()
+        # Keys are prefixed, so that the cache can share a database with
+        # other data; clear() only deletes the prefixed keys.
+        self.key_prefix = key_prefix
+        self.codec = codec or cache_codec.Codec(level=0)
+        # The client's connection pool is shared by the threads.
+        self.client = redis.StrictRedis(host=host, port=port, db=db,
+            password=password, unix_socket_path=unix_socket_path,
+            socket_timeout=timeout)
+
+    def _key(self, key):
+        return self.key_prefix + key
+
+    def _iter_keys(self):
+        """Yield the (prefixed) keys of the cache."""
+        return self.client.scan_iter(match=self.key_prefix + '*', count=1000)
+
+    def __len__(self):
+        return sum(1 for _ in self._iter_keys())
+
+    def get(self, key):
+        value = self.client.get(self._key(key))
+        if value is None:
+            return None
+        return self.codec.decode(value)
+
+    def get_with_expiration(self, key):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(self._key(key))
+        pipe.pttl(self._key(key))
+        value, ttl = pipe.execute()
+        if value is None or ttl is None or ttl < 0:
+            return None, None
+        return self.codec.decode(value), time.time() + ttl / 1000.0
+
+    def get_multi(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        pipe = self.client.pipeline(transaction=False)
+        for i in range(0, len(keys), _MAX_KEYS_PER_COMMAND):
+            pipe.mget([self._key(key) for key in keys[i:i + _MAX_KEYS_PER_COMMAND]])
+        values = [value for reply in pipe.execute() for value in reply]
+        return dict((key, self.codec.decode(value))
+                    for key, value in zip(keys, values) if value is not None)
+
+    def put(self, key, value, duration):
+        self.put_multi([(key, value, duration)])
+
+    def put_multi(self, entries):
+        pipe = self.client.pipeline(transaction=False)
+        for key, value, duration in entries:
+            milliseconds = int(duration * 1000)
+            if milliseconds > 0:
+                pipe.psetex(self._key(key), milliseconds, self.codec.encode(value))
+            else:
+                pipe.delete(self._key(key))
+        if len(pipe):
+            pipe.execute()
+
+    def sweep(self):
+        """Redis expires the entries itself; there is nothing to sweep."""
+        return 0
+
+    def clear(self):
+        batch = []
+        for key in self._iter_keys():
+            batch.append(key)
+            if len(batch) == _MAX_KEYS_PER_COMMAND:
+                self.client.delete(*batch)
+                batch = []
+        if batch:
+            self.client.delete(*batch)
+
+    def close(self):
+        """Close the connections to the server."""
+        self.client.connection_pool.disconnect()
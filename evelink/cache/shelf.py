@@ -1,10 +1,253 @@
+import contextlib
+import os
 import shelve
+import time
+import whichdb
+
+try:
+    import fcntl
+except ImportError:
+    # Without flock() (e.g. on Windows), a shelf can only be shared by the
+    # threads of one process.
+    fcntl = None
 
 from evelink import api
+from evelink.cache import codec as cache_codec
+
+# The files which the dbm modules make out of a path.
+_DBM_SUFFIXES = ('', '.db', '.dat', '.dir', '.bak', '.pag')
+
+# The width of the write counter kept in the lock file.
+_GENERATION_WIDTH = 20
 
 class ShelveCache(api.APICache):
-    """An implementation of APICache using shelve."""
+    """An implementation of APICache using shelve, which several processes
+    can share where flock() is available; with writeback, puts are queued
+    until flush()."""
+
+    def __init__(self, path, codec=cache_codec.DEFAULT_CODEC, writeback=False,
+                 batch_size=100, flush_interval=1.0, sweep_interval=3600):
+        super(ShelveCache, self).__init__(sweep_interval=sweep_interval)
+        self.path = path
+        self.codec = codec
+        self.writeback = writeback
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # The entries to write, queued by put() with writeback until there
+        # are batch_size of them, or the oldest is flush_interval seconds
+        # old. get() sees them.
+        self._pending = {}
+        self._pending_since = None
+        # The shelf opened read-only by the readers, and the write counter
+        # of the lock file when it was opened.
+        self.cache = None
+        self._generation = None
+        open(path + '.lock', 'a').close()
+        self._lock_file = open(path + '.lock', 'r+')
+        with self._writing():
+            # Create the shelf, so that readers can open it.
+            pass
+
+    def _files(self):
+        return [self.path + suffix for suffix in _DBM_SUFFIXES
+                if os.path.exists(self.path + suffix)]
+
+    @contextlib.contextmanager
+    def _locked(self, write=False):
+        """Hold the thread lock and, where available, a shared flock() of
+        path + '.lock' (an exclusive one to write)."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fcntl.flock(self._lock_file.fileno(),
+                        fcntl.LOCK_EX if write else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _open(self, flag):
+        # gdbm locks the file for as long as it is open, which would keep
+        # the other caches out; the flock() does the locking instead.
+        if whichdb.whichdb(self.path) == 'gdbm':
+            flag += 'u'
+        return shelve.open(self.path, flag)
+
+    def _read_generation(self):
+        """Read the write counter, unbuffered so as to see the other
+        processes' writes."""
+        fd = self._lock_file.fileno()
+        os.lseek(fd, 0, os.SEEK_SET)
+        return os.read(fd, _GENERATION_WIDTH)
+
+    def _reader(self):
+        """Return the shelf opened for reading; the caller holds the locks.
+
+        The shelf stays open between calls, and is only reopened after a
+        write by any cache (which increments the counter in the lock
+        file), since dbm modules such as dumbdbm keep their index in
+        memory. Being read-only, it never writes that index back over
+        the writes of others.
+        """
+        generation = self._read_generation()
+        if self.cache is None or generation != self._generation:
+            if self.cache is not None:
+                self.cache.close()
+            self.cache = self._open('r')
+            self._generation = generation
+        return self.cache
+
+    @contextlib.contextmanager
+    def _writing(self):
+        """Hold the exclusive locks, with the shelf opened for writing as
+        the value; it is closed, and the write counter incremented, at the
+        end."""
+        with self._locked(write=True):
+            shelf = self._open('c')
+            try:
+                yield shelf
+            finally:
+                shelf.close()
+                self._increment_generation()
+
+    def _increment_generation(self):
+        generation = int(self._read_generation() or 0) + 1
+        fd = self._lock_file.fileno()
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.write(fd, '%*d' % (_GENERATION_WIDTH, generation))
+
+    def __len__(self):
+        self.flush()
+        now = time.time()
+        with self._locked():
+            return sum(1 for entry in self._reader().itervalues() if entry[1] >= now)
+
+    def _decode(self, entry):
+        value, expiration = entry[:2]
+        if expiration < time.time():
+            return None
+        if len(entry) > 2:
+            # Entries without a third item were stored without a codec.
+            return (self.codec or cache_codec.DEFAULT_CODEC).decode(value)
+        return value
+
+    def get(self, key):
+        return self.get_with_expiration(key)[0]
+
+    def get_with_expiration(self, key):
+        with self._lock:
+            entry = self._pending.get(key)
+        if entry is None:
+            self._maybe_flush()
+            with self._locked():
+                entry = self._reader().get(key)
+            if not entry:
+                return None, None
+        value = self._decode(entry)
+        if value is None:
+            return None, None
+        return value, entry[1]
+
+    def get_multi(self, keys):
+        values = {}
+        with self._lock:
+            entries = dict((key, self._pending[key]) for key in keys
+                           if key in self._pending)
+        missing = [key for key in keys if key not in entries]
+        if missing:
+            self._maybe_flush()
+            with self._locked():
+                shelf = self._reader()
+                for key in missing:
+                    entry = shelf.get(key)
+                    if entry:
+                        entries[key] = entry
+        for key, entry in entries.iteritems():
+            value = self._decode(entry)
+            if value is not None:
+                values[key] = value
+        return values
+
+    def _encode(self, value, duration):
+        expiration = time.time() + duration
+        if self.codec is not None:
+            return (self.codec.encode(value), expiration, True)
+        return (value, expiration)
+
+    def put(self, key, value, duration):
+        self.put_multi([(key, value, duration)])
+
+    def put_multi(self, entries):
+        encoded = [(key, self._encode(value, duration))
+                   for key, value, duration in entries]
+        with self._lock:
+            self._pending.update(encoded)
+            if self._pending_since is None:
+                self._pending_since = time.time()
+        if self.writeback:
+            self._maybe_flush()
+        else:
+            self.flush()
+
+    def _maybe_flush(self):
+        since = self._pending_since
+        if since is None:
+            return
+        if (len(self._pending) >= self.batch_size or
+                time.time() - since >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Write the queued entries to the shelf."""
+        if self._pending:
+            with self._writing() as shelf:
+                shelf.update(self._pending)
+                self._pending = {}
+                self._pending_since = None
+        if time.time() >= self._next_sweep:
+            self.sweep()
+
+    def sweep(self):
+        """Rewrite the shelf without its expired entries, so that its files
+        don't grow forever; return how many there were."""
+        now = time.time()
+        tmp_path = self.path + '.tmp'
+        with self._writing() as shelf:
+            self._next_sweep = now + self.sweep_interval
+            count = 0
+            new = shelve.open(tmp_path, 'n')
+            try:
+                for key, entry in shelf.iteritems():
+                    if entry[1] < now:
+                        count += 1
+                    else:
+                        new[key] = entry
+            finally:
+                new.close()
+            shelf.close()
+            for path in self._files():
+                os.remove(path)
+            for suffix in _DBM_SUFFIXES:
+                if os.path.exists(tmp_path + suffix):
+                    os.rename(tmp_path + suffix, self.path + suffix)
+        self.expirations += count
+        return count
+
+    def clear(self):
+        with self._writing() as shelf:
+            self._pending = {}
+            self._pending_since = None
+            shelf.clear()
+
+    def close(self):
+        """Write the queued entries, and close the shelf and the lock file."""
+        if self._lock_file.closed:
+            return
+        self.flush()
+        with self._lock:
+            if self.cache is not None:
+                self.cache.close()
+                self.cache = None
+        self._lock_file.close()
 
-    def __init__(self, path):
-        super(ShelveCache, self).__init__()
-        self.cache = shelve.open(path)
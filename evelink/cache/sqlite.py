@@ -1,37 +1,231 @@
 import pickle
 import time
+import threading
 import sqlite3
+import weakref
 
 from evelink import api
+from evelink.cache import codec as cache_codec
+
+# The maximum number of keys looked up by one query of get_multi(); sqlite
+# limits the number of parameters of a statement.
+_MAX_KEYS_PER_QUERY = 500
+
+# Formats of the values, in the 'pickled' column.
+_RAW = 0
+_PICKLED = 1
+_ENCODED = 2
+
+class _ThreadConnection(object):
+    """Holds the connection of a thread, in its thread-local storage.
+
+    The connection is closed when the thread exits and the storage is
+    released, so that caches used by short-lived threads (e.g. the pools
+    of api.call_many()) don't accumulate connections.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __del__(self):
+        self.connection.close()
+
 
 class SqliteCache(api.APICache):
-    """An implementation of APICache using sqlite."""
+    """An implementation of APICache using sqlite, with a connection per
+    thread; with batch_size > 1, puts are queued until flush()."""
+
+    def __init__(self, path, batch_size=1, flush_interval=1.0,
+                 timeout=30, sweep_interval=300,
+                 codec=cache_codec.DEFAULT_CODEC):
+        super(SqliteCache, self).__init__(sweep_interval=sweep_interval)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.codec = codec
+        self._local = threading.local()
+        self._connections = weakref.WeakSet()
+        # The entries queued by put() until there are batch_size of them,
+        # or the oldest is flush_interval seconds old. get() sees them.
+        self._pending = {}
+        self._pending_since = None
+        # The batch being written by flush(), which get() still sees until
+        # it is committed. Flushes take _flush_lock, so that batches are
+        # written in order; readers only wait for _lock.
+        self._flushing = {}
+        self._flush_lock = threading.Lock()
 
-    def __init__(self, path):
-        super(SqliteCache, self).__init__()
-        self.connection = sqlite3.connect(path)
         cursor = self.connection.cursor()
+        # In WAL mode, readers don't wait for writers.
+        cursor.execute('pragma journal_mode=wal')
         cursor.execute('create table if not exists cache ("key" text primary key on conflict replace,'
-                       'value blob, expiration integer)')
+                       'value blob, expiration integer, pickled integer default 1)')
+        columns = [row[1] for row in cursor.execute('pragma table_info(cache)')]
+        if 'pickled' not in columns:
+            # Tables created by older versions hold pickled values only.
+            cursor.execute('alter table cache add column pickled integer default 1')
+        cursor.execute('create index if not exists cache_expiration on cache (expiration)')
+        self.connection.commit()
+        cursor.close()
+
+    @property
+    def connection(self):
+        """The connection to the database of the calling thread."""
+        holder = getattr(self._local, 'connection', None)
+        if holder is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout,
+                                         check_same_thread=False)
+            connection.execute('pragma synchronous=normal')
+            holder = self._local.connection = _ThreadConnection(connection)
+            with self._lock:
+                self._connections.add(holder)
+        return holder.connection
+
+    def __len__(self):
+        self.flush()
+        cursor = self.connection.execute('select count(*) from cache')
+        return cursor.fetchone()[0]
 
     def get(self, key):
-        cursor = self.connection.cursor()
-        cursor.execute('select value, expiration from cache where "key"=?',(key,))
-        result = cursor.fetchone()
-        if not result:
-            return None
-        value, expiration = result
+        return self.get_with_expiration(key)[0]
+
+    def _queued(self, key):
+        """Return the entry of a key waiting to be committed, or None; the
+        caller holds the lock."""
+        entry = self._pending.get(key)
+        if entry is None:
+            entry = self._flushing.get(key)
+        return entry
+
+    def get_with_expiration(self, key):
+        with self._lock:
+            pending = self._queued(key)
+        if pending is not None:
+            value, pickled, expiration = pending
+        else:
+            self._maybe_flush()
+            cursor = self.connection.cursor()
+            cursor.execute('select value, pickled, expiration from cache where "key"=?', (key,))
+            result = cursor.fetchone()
+            cursor.close()
+            if not result:
+                return None, None
+            value, pickled, expiration = result
         if expiration < time.time():
-            cursor.execute('delete from cache where "key"=?', (key,))
-            self.connection.commit()
-            return None
-        cursor.close()
-        return pickle.loads(str(value))
+            return None, None
+        return self._decode(value, pickled), expiration
 
-    def put(self, key, value, duration):
+    def get_multi(self, keys):
+        now = time.time()
+        rows = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                entry = self._queued(key)
+                if entry is None:
+                    missing.append(key)
+                else:
+                    rows[key] = entry
+        if missing:
+            self._maybe_flush()
+            cursor = self.connection.cursor()
+            for i in range(0, len(missing), _MAX_KEYS_PER_QUERY):
+                chunk = missing[i:i + _MAX_KEYS_PER_QUERY]
+                cursor.execute('select "key", value, pickled, expiration from cache '
+                               'where "key" in (%s)' % ','.join('?' * len(chunk)), chunk)
+                for key, value, pickled, expiration in cursor:
+                    rows[key] = (value, pickled, expiration)
+            cursor.close()
+        return dict((key, self._decode(value, pickled))
+                    for key, (value, pickled, expiration) in rows.iteritems()
+                    if expiration >= now)
+
+    def _decode(self, value, pickled):
+        if pickled == _ENCODED:
+            return (self.codec or cache_codec.DEFAULT_CODEC).decode(str(value))
+        if pickled:
+            return pickle.loads(str(value))
+        return str(value)
+
+    def _encode(self, value, duration):
         expiration = time.time() + duration
-        value_tuple = (key, sqlite3.Binary(pickle.dumps(value, 2)), expiration)
-        cursor = self.connection.cursor()
-        cursor.execute('insert into cache values (?, ?, ?)', value_tuple)
-        self.connection.commit()
-        cursor.close()
+        if self.codec is not None:
+            return (sqlite3.Binary(self.codec.encode(value)), _ENCODED, expiration)
+        if isinstance(value, str):
+            return (sqlite3.Binary(value), _RAW, expiration)
+        return (sqlite3.Binary(pickle.dumps(value, 2)), _PICKLED, expiration)
+
+    def put(self, key, value, duration):
+        self.put_multi([(key, value, duration)])
+
+    def put_multi(self, entries):
+        encoded = [(key, self._encode(value, duration))
+                   for key, value, duration in entries]
+        with self._lock:
+            self._pending.update(encoded)
+            if self._pending_since is None:
+                self._pending_since = time.time()
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        since = self._pending_since
+        if since is None:
+            return
+        if (len(self._pending) >= self.batch_size or
+                time.time() - since >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Write the queued entries to the database."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._pending_since = None
+                self._flushing = batch
+            if batch:
+                try:
+                    with self.connection as connection:
+                        connection.executemany('insert into cache values (?, ?, ?, ?)',
+                            [(key, value, expiration, pickled) for key, (value, pickled, expiration)
+                             in batch.iteritems()])
+                except Exception:
+                    # Queue the batch again, behind any newer puts.
+                    with self._lock:
+                        for key, entry in batch.iteritems():
+                            self._pending.setdefault(key, entry)
+                        if self._pending_since is None:
+                            self._pending_since = time.time()
+                    raise
+                finally:
+                    with self._lock:
+                        self._flushing = {}
+        if time.time() >= self._next_sweep:
+            self.sweep()
+
+    def sweep(self):
+        """Delete all of the expired entries; return how many there were."""
+        now = time.time()
+        with self.connection as connection:
+            count = connection.execute('delete from cache where expiration < ?',
+                                       (now,)).rowcount
+        self._next_sweep = now + self.sweep_interval
+        self.expirations += count
+        return count
+
+    def clear(self):
+        with self._flush_lock:
+            with self._lock:
+                self._pending = {}
+                self._pending_since = None
+            with self.connection as connection:
+                connection.execute('delete from cache')
+
+    def close(self):
+        """Write the queued entries, and close the connections of all threads."""
+        self.flush()
+        with self._lock:
+            holders = list(self._connections)
+        for holder in holders:
+            holder.connection.close()
+        self._local = threading.local()
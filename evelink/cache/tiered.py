@@ -0,0 +1,114 @@
+import time
+
+from evelink import api
+
+class TieredCache(api.APICache):
+    """An APICache made of a fast first level over a persistent second level.
+
+    Typically the first level is an in-memory APICache, and the second a
+    SqliteCache or ShelveCache:
+
+        cache = TieredCache(api.APICache(max_entries=1000),
+                            SqliteCache(path))
+
+    get() looks in the first level, then in the second one; a value found
+    in the second level is copied (promoted) to the first one, until the
+    second level's entry expires, so that the next reads of a hot key are
+    in-memory lookups. put() writes to both levels; wrap the second level
+    in a WriteBehindCache for these writes to happen in the background:
+
+        cache = TieredCache(api.APICache(),
+                            WriteBehindCache(SqliteCache(path)))
+
+    max_l1_duration, if set, bounds how long an entry stays in the first
+    level, so that changes made to the second level by other processes
+    are seen after that long.
+    """
+
+    def __init__(self, l1, l2, max_l1_duration=None):
+        super(TieredCache, self).__init__()
+        self.l1 = l1
+        self.l2 = l2
+        self.max_l1_duration = max_l1_duration
+        self.promotions = 0
+
+    def __len__(self):
+        return len(self.l2)
+
+    def _l1_duration(self, duration):
+        if self.max_l1_duration is not None:
+            return min(duration, self.max_l1_duration)
+        return duration
+
+    def get(self, key):
+        return self.get_with_expiration(key)[0]
+
+    def get_with_expiration(self, key):
+        value, expiration = self.l1.get_with_expiration(key)
+        if value is not None:
+            self.hits += 1
+            return value, expiration
+
+        value, expiration = self.l2.get_with_expiration(key)
+        if value is None:
+            self.misses += 1
+            return None, None
+        self.hits += 1
+        if expiration is not None:
+            duration = expiration - time.time()
+            if duration > 0:
+                self.l1.put(key, value, self._l1_duration(duration))
+                self.promotions += 1
+        return value, expiration
+
+    def get_multi(self, keys):
+        values = self.l1.get_multi(keys)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            found = self.l2.get_multi(missing)
+            now = time.time()
+            promoted = []
+            for key, value in found.iteritems():
+                # API responses carry their expiry, which is never later
+                # than the one of their second level entry.
+                header = api.read_cache_header(value)
+                if header is not None and header.expires > now:
+                    promoted.append((key, value,
+                                     self._l1_duration(header.expires - now)))
+            self.l1.put_multi(promoted)
+            self.promotions += len(promoted)
+            values.update(found)
+        self.hits += len(values)
+        self.misses += len(keys) - len(values)
+        return values
+
+    def put(self, key, value, duration):
+        self.l1.put(key, value, self._l1_duration(duration))
+        self.l2.put(key, value, duration)
+
+    def put_multi(self, entries):
+        self.l1.put_multi([(key, value, self._l1_duration(duration))
+                           for key, value, duration in entries])
+        self.l2.put_multi(entries)
+
+    def sweep(self):
+        """Drop the expired entries of both levels; return how many of the
+        second level's there were."""
+        self.l1.sweep()
+        return self.l2.sweep()
+
+    def clear(self):
+        self.l1.clear()
+        self.l2.clear()
+
+    def flush(self):
+        """Write the pending entries of the levels which queue them."""
+        for cache in (self.l1, self.l2):
+            if hasattr(cache, 'flush'):
+                cache.flush()
+
+    def close(self):
+        """Close the levels which hold resources (e.g. connections)."""
+        for cache in (self.l1, self.l2):
+            if hasattr(cache, 'close'):
+                cache.close()
@@ -0,0 +1,199 @@
+import atexit
+from collections import OrderedDict
+import logging
+import threading
+import time
+import weakref
+
+from evelink import api
+
+_log = logging.getLogger('evelink.cache.writebehind')
+
+# Caches with a flusher thread, closed at exit so that no entry is lost.
+_open_caches = weakref.WeakSet()
+
+
+def _close_all():
+    for cache in list(_open_caches):
+        cache.close()
+
+atexit.register(_close_all)
+
+
+def _remaining_time(deadline):
+    """Return the seconds left until deadline, or None without one."""
+    if deadline is None:
+        return None
+    return max(0, deadline - time.time())
+
+
+class WriteBehindCache(api.APICache):
+    """An APICache writing to another one from a background thread.
+
+    put() queues the entry and returns, so that the requests of an API
+    don't wait for a sqlite commit or a datastore write. A flusher thread
+    writes the queued entries to the wrapped cache, up to batch_size at a
+    time, as soon as there are some. get() returns the queued entries
+    too, so that a value is readable as soon as it is put.
+
+    At most max_pending entries are queued; put() blocks until the flusher
+    makes room for more. Call flush() to wait for the queue to be written,
+    and close() to stop the flusher; caches still open at exit are closed
+    then.
+
+        cache = WriteBehindCache(SqliteCache(path))
+    """
+
+    def __init__(self, cache, max_pending=1000, batch_size=100):
+        super(WriteBehindCache, self).__init__()
+        self.wrapped = cache
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.writes = 0
+        self.errors = 0
+        self._pending = OrderedDict()
+        self._writing = {}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def __len__(self):
+        self.flush()
+        return len(self.wrapped)
+
+    def _queued(self, key):
+        """Return the queued (value, expiration) of 'key', or None."""
+        with self._condition:
+            entry = self._pending.get(key)
+            if entry is None:
+                entry = self._writing.get(key)
+        return entry
+
+    def get(self, key):
+        return self.get_with_expiration(key)[0]
+
+    def get_with_expiration(self, key):
+        entry = self._queued(key)
+        if entry is None:
+            return self.wrapped.get_with_expiration(key)
+        value, expiration = entry
+        if expiration < time.time():
+            return None, None
+        return value, expiration
+
+    def get_multi(self, keys):
+        values = {}
+        missing = []
+        now = time.time()
+        for key in keys:
+            entry = self._queued(key)
+            if entry is None:
+                missing.append(key)
+            elif entry[1] >= now:
+                values[key] = entry[0]
+        if missing:
+            values.update(self.wrapped.get_multi(missing))
+        return values
+
+    def put(self, key, value, duration):
+        with self._condition:
+            if self._closed:
+                raise ValueError("The cache is closed.")
+            while len(self._pending) >= self.max_pending and key not in self._pending:
+                self._condition.wait()
+            self._pending.pop(key, None)
+            self._pending[key] = (value, time.time() + duration)
+            self._condition.notify_all()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                    name='evelink-write-behind')
+                self._thread.daemon = True
+                self._thread.start()
+                _open_caches.add(self)
+
+    def _take_batch(self):
+        """Move a batch of entries from the queue; the caller holds the condition."""
+        batch = []
+        while self._pending and len(batch) < self.batch_size:
+            key, entry = self._pending.popitem(last=False)
+            self._writing[key] = entry
+            batch.append((key, entry))
+        self._condition.notify_all()
+        return batch
+
+    def _write(self, batch):
+        now = time.time()
+        try:
+            self.wrapped.put_multi([(key, value, expiration - now)
+                                    for key, (value, expiration) in batch])
+        except Exception:
+            self.errors += 1
+            _log.exception("Failed to write %d cache entries", len(batch))
+        with self._condition:
+            for key, _ in batch:
+                self._writing.pop(key, None)
+            self.writes += len(batch)
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                batch = self._take_batch()
+            self._write(batch)
+
+    def flush(self, timeout=None):
+        """Wait until the queued entries are written to the wrapped cache.
+
+        Returns False if they weren't all written before the timeout.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._condition:
+            while self._pending or self._writing:
+                if self._thread is None or not self._thread.is_alive():
+                    # No flusher (e.g. after close()): write them here.
+                    batch = self._take_batch()
+                    if not batch:
+                        # Another thread is writing the last entries.
+                        self._condition.wait(_remaining_time(deadline))
+                        continue
+                    self._condition.release()
+                    try:
+                        self._write(batch)
+                    finally:
+                        self._condition.acquire()
+                    continue
+                remaining = _remaining_time(deadline)
+                if remaining == 0:
+                    return False
+                self._condition.wait(remaining)
+        if hasattr(self.wrapped, 'flush'):
+            self.wrapped.flush()
+        return True
+
+    def sweep(self):
+        return self.wrapped.sweep()
+
+    def clear(self):
+        with self._condition:
+            self._pending.clear()
+        self.flush()
+        self.wrapped.clear()
+
+    def close(self):
+        """Write the queued entries, stop the flusher and close the wrapped cache."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self.flush()
+        _open_caches.discard(self)
+        if hasattr(self.wrapped, 'close'):
+            self.wrapped.close()
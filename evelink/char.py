@@ -1,26 +1,50 @@
 from evelink import api, constants
-from evelink.parsing.assets import parse_assets
+from evelink.parsing.assets import parse_asset_item, parse_assets
 from evelink.parsing.contact_list import parse_contact_list
 from evelink.parsing.contract_bids import parse_contract_bids
 from evelink.parsing.contract_items import parse_contract_items
 from evelink.parsing.contracts import parse_contracts
+from evelink.parsing.formats import DICTS
 from evelink.parsing.industry_jobs import parse_industry_jobs
-from evelink.parsing.kills import parse_kills
+from evelink.parsing.kills import parse_kill, parse_kills
+from evelink.parsing.locations import parse_locations
+from evelink.parsing.medals import parse_char_medals
 from evelink.parsing.orders import parse_market_orders
-from evelink.parsing.wallet_journal import parse_wallet_journal
+from evelink.parsing.standings import parse_npc_standings
+from evelink.parsing.wallet_journal import parse_wallet_journal, parse_wallet_journal_entry
 from evelink.parsing.wallet_transactions import parse_wallet_transactions
 
 class Char(object):
     """Wrapper around /char/ of the EVE API.
 
     Note that a valid API key is required.
+
+    Methods returning many rows (assets, contracts, kills, orders, the
+    wallet journal and transactions, and corp members) accept a
+    result_format argument: 'dicts' (the default) returns nested dicts,
+    while 'records' returns compact slotted records with the same fields,
+    for keeping large histories in memory. The wallet journal and
+    transactions also support 'columns', returning a
+    parsing.columns.Columns of typed arrays (numpy arrays if available).
     """
 
     def __init__(self, char_id, api):
         self.api = api
         self.char_id = char_id
 
-    def assets(self):
+    def get_many(self, calls, max_workers=api.DEFAULT_MAX_WORKERS):
+        """Call several of this wrapper's methods concurrently.
+
+        calls is a sequence of method names, or of (method name, kwargs)
+        tuples, e.g. ['assets', ('wallet_journal', {'limit': 100})].
+
+        Returns a list with the APIResult of each call in input order, or
+        the exception (typically an APIError) raised by a failed call.
+        """
+        return api.call_methods(self, calls, max_workers=max_workers)
+
+    @api.cache_result
+    def assets(self, result_format=DICTS):
         """Get information about corp assets.
 
         Each item is a dict, with keys 'id', 'item_type_id',
@@ -44,7 +68,21 @@ class Char(object):
         """
         api_result = self.api.get('char/AssetList', {'characterID': self.char_id})
 
-        return api.APIResult(parse_assets(api_result.result), api_result.timestamp, api_result.expires)
+        return api.APIResult(parse_assets(api_result.result, result_format), api_result.timestamp, api_result.expires)
+
+    def iter_assets(self, result_format=DICTS):
+        """Stream the character's assets.
+
+        The result is an iterator over the top-level items, in the format
+        described in assets() (including the contents of containers),
+        which are not grouped by location. The response is parsed
+        incrementally, so memory use stays flat however many items there
+        are.
+        """
+        api_result = self.api.iter_rows('char/AssetList', {'characterID': self.char_id})
+
+        items = (parse_asset_item(row, None, result_format) for row in api_result.result)
+        return api.APIResult(items, api_result.timestamp, api_result.expires)
 
     def contract_bids(self):
         """Lists the latest bids that have been made to any recent auctions."""
@@ -59,12 +97,14 @@ class Char(object):
 
         return api.APIResult(parse_contract_items(api_result.result), api_result.timestamp, api_result.expires)
 
-    def contracts(self):
+    @api.cache_result
+    def contracts(self, result_format=DICTS):
         """Returns a record of all contracts for a specified character"""
         api_result = self.api.get('char/Contracts', {'characterID': self.char_id})
-        return api.APIResult(parse_contracts(api_result.result), api_result.timestamp, api_result.expires)
+        return api.APIResult(parse_contracts(api_result.result, result_format), api_result.timestamp, api_result.expires)
 
-    def wallet_journal(self, before_id=None, limit=None):
+    @api.cache_result
+    def wallet_journal(self, before_id=None, limit=None, result_format=DICTS):
         """Returns a complete record of all wallet activity for a specified character"""
         params = {'characterID': self.char_id}
         if before_id is not None:
@@ -73,7 +113,23 @@ class Char(object):
             params['rowCount'] = limit
         api_result = self.api.get('char/WalletJournal', params)
 
-        return api.APIResult(parse_wallet_journal(api_result.result), api_result.timestamp, api_result.expires)
+        return api.APIResult(parse_wallet_journal(api_result.result, result_format), api_result.timestamp, api_result.expires)
+
+    def iter_wallet_journal(self, before_id=None, limit=None, result_format=DICTS):
+        """Stream the character's wallet journal.
+
+        The result is an iterator over the journal entries in the order
+        the API returns them (see wallet_journal() for their format).
+        """
+        params = {'characterID': self.char_id}
+        if before_id is not None:
+            params['fromID'] = before_id
+        if limit is not None:
+            params['rowCount'] = limit
+        api_result = self.api.iter_rows('char/WalletJournal', params)
+
+        entries = (parse_wallet_journal_entry(row, result_format) for row in api_result.result)
+        return api.APIResult(entries, api_result.timestamp, api_result.expires)
 
     def wallet_info(self):
         """Return a given character's wallet."""
@@ -94,7 +150,8 @@ class Char(object):
         api_result = self.wallet_info()
         return api.APIResult(api_result.result['balance'], api_result.timestamp, api_result.expires)
 
-    def wallet_transactions(self, before_id=None, limit=None):
+    @api.cache_result
+    def wallet_transactions(self, before_id=None, limit=None, result_format=DICTS):
         """Returns wallet transactions for a character."""
         params = {'characterID': self.char_id}
         if before_id is not None:
@@ -103,15 +160,17 @@ class Char(object):
             params['rowCount'] = limit
         api_result = self.api.get('char/WalletTransactions', params)
 
-        return api.APIResult(parse_wallet_transactions(api_result.result), api_result.timestamp, api_result.expires)
+        return api.APIResult(parse_wallet_transactions(api_result.result, result_format), api_result.timestamp, api_result.expires)
 
+    @api.cache_result
     def industry_jobs(self):
         """Get a list of jobs for a character"""
         api_result = self.api.get('char/IndustryJobs', {'characterID': self.char_id})
 
         return api.APIResult(parse_industry_jobs(api_result.result), api_result.timestamp, api_result.expires)
 
-    def kills(self, before_kill=None):
+    @api.cache_result
+    def kills(self, before_kill=None, result_format=DICTS):
         """Look up recent kills for a character.
 
         before_kill:
@@ -123,7 +182,21 @@ class Char(object):
             params['beforeKillID'] = before_kill
         api_result = self.api.get('char/KillLog', params)
 
-        return api.APIResult(parse_kills(api_result.result), api_result.timestamp, api_result.expires)
+        return api.APIResult(parse_kills(api_result.result, result_format), api_result.timestamp, api_result.expires)
+
+    def iter_kills(self, before_kill=None, result_format=DICTS):
+        """Stream recent kills for a character.
+
+        The result is an iterator over the kills, in the format used by
+        kills().
+        """
+        params = {'characterID': self.char_id}
+        if before_kill is not None:
+            params['beforeKillID'] = before_kill
+        api_result = self.api.iter_rows('char/KillLog', params)
+
+        kills = (parse_kill(row, result_format) for row in api_result.result)
+        return api.APIResult(kills, api_result.timestamp, api_result.expires)
 
     def notifications(self):
         """Returns the message headers for notifications."""
@@ -170,27 +243,8 @@ class Char(object):
         api_result = self.api.get('char/Standings',
             {'characterID': self.char_id})
 
-        result = {}
-        rowsets = {}
-        for rowset in api_result.result.find('characterNPCStandings').findall('rowset'):
-            rowsets[rowset.attrib['name']] = rowset
-
-        _name_map = {
-            'agents': 'agents',
-            'corps': 'NPCCorporations',
-            'factions': 'factions',
-        }
-
-        for key, rowset_name in _name_map.iteritems():
-            result[key] = {}
-            for row in rowsets[rowset_name].findall('row'):
-                a = row.attrib
-                from_id = int(a['fromID'])
-                result[key][from_id] = {
-                    'id': from_id,
-                    'name': a['fromName'],
-                    'standing': float(a['standing']),
-                }
+        container = api_result.result.find('characterNPCStandings')
+        result = parse_npc_standings(container)
 
         return api.APIResult(result, api_result.timestamp, api_result.expires)
 
@@ -289,12 +343,13 @@ class Char(object):
 
         return api.APIResult(parse_contact_list(api_result.result), api_result.timestamp, api_result.expires)
 
-    def orders(self):
+    @api.cache_result
+    def orders(self, result_format=DICTS):
         """Return a given character's buy and sell orders."""
         api_result = self.api.get('char/MarketOrders',
             {'characterID': self.char_id})
 
-        return api.APIResult(parse_market_orders(api_result.result), api_result.timestamp, api_result.expires)
+        return api.APIResult(parse_market_orders(api_result.result, result_format), api_result.timestamp, api_result.expires)
 
     def research(self):
         """Returns information about the agents with whom the character is doing research."""
@@ -531,26 +586,7 @@ class Char(object):
         api_result = self.api.get('char/Medals',
             {'characterID': self.char_id})
 
-        result = {'current': {}, 'other': {}}
-        _map = {
-            'currentCorporation': 'current',
-            'otherCorporations': 'other',
-        }
-
-        for rowset in api_result.result.findall('rowset'):
-            name = _map[rowset.attrib['name']]
-            for row in rowset.findall('row'):
-                a = row.attrib
-                medal_id = int(a['medalID'])
-                result[name][medal_id] = {
-                    'id': medal_id,
-                    'reason': a['reason'],
-                    'public': a['status'] == 'public',
-                    'issuer_id': int(a['issuerID']),
-                    'corp_id': int(a['corporationID']),
-                    'title': a['title'],
-                    'description': a['description'],
-                }
+        result = parse_char_medals(api_result.result)
 
         return api.APIResult(result, api_result.timestamp, api_result.expires)
 
@@ -581,24 +617,7 @@ class Char(object):
             'characterID' : self.char_id,
         }
         api_result = self.api.get('char/Locations', params)
-        rowset = api_result.result.find('rowset')
-        rows = rowset.findall('row')
-
-        results = {}
-        for row in rows:
-            name = row.attrib['itemName'] or None
-            id = int(row.attrib['itemID']) or None
-            x = float(row.attrib['x']) or None
-            y = float(row.attrib['y']) or None
-            z = float(row.attrib['z']) or None
-
-            results[id] = {
-                'name': name,
-                'id' : id,
-                'x' : x,
-                'y' : y,
-                'z' : z,
-            }
+        results = parse_locations(api_result.result)
         return api.APIResult(results, api_result.timestamp, api_result.expires)
 
 
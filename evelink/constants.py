@@ -38,3 +38,65 @@ class APIKey(object):
         'Character': CHARACTER,
         'Corporation': CORPORATION,
     }
+
+    # The bit of the key's accessMask each API path requires.
+    access_masks = {
+        'char/AccountBalance': 1,
+        'char/AssetList': 2,
+        'char/CalendarEventAttendees': 4,
+        'char/CharacterSheet': 8,
+        'char/ContactList': 16,
+        'char/ContactNotifications': 32,
+        'char/FacWarStats': 64,
+        'char/IndustryJobs': 128,
+        'char/KillLog': 256,
+        'char/MailBodies': 512,
+        'char/MailingLists': 1024,
+        'char/MailMessages': 2048,
+        'char/MarketOrders': 4096,
+        'char/Medals': 8192,
+        'char/Notifications': 16384,
+        'char/NotificationTexts': 32768,
+        'char/Research': 65536,
+        'char/SkillInTraining': 131072,
+        'char/SkillQueue': 262144,
+        'char/Standings': 524288,
+        'char/UpcomingCalendarEvents': 1048576,
+        'char/WalletJournal': 2097152,
+        'char/WalletTransactions': 4194304,
+        'char/Contracts': 67108864,
+        'char/ContractBids': 67108864,
+        'char/ContractItems': 67108864,
+        'char/Locations': 134217728,
+
+        'corp/AccountBalance': 1,
+        'corp/AssetList': 2,
+        'corp/MemberMedals': 4,
+        'corp/CorporationSheet': 8,
+        'corp/ContactList': 16,
+        'corp/ContainerLog': 32,
+        'corp/FacWarStats': 64,
+        'corp/IndustryJobs': 128,
+        'corp/KillLog': 256,
+        'corp/MemberSecurity': 512,
+        'corp/MemberSecurityLog': 1024,
+        'corp/MemberTracking': 2048,
+        'corp/MarketOrders': 4096,
+        'corp/Medals': 8192,
+        'corp/OutpostList': 16384,
+        'corp/OutpostServiceDetail': 32768,
+        'corp/Shareholders': 65536,
+        'corp/StarbaseDetail': 131072,
+        'corp/Standings': 262144,
+        'corp/StarbaseList': 524288,
+        'corp/WalletJournal': 1048576,
+        'corp/WalletTransactions': 2097152,
+        'corp/Titles': 4194304,
+        'corp/Contracts': 8388608,
+        'corp/ContractBids': 8388608,
+        'corp/ContractItems': 8388608,
+        'corp/Locations': 16777216,
+    }
+
+    # corp/MemberTracking with extended=1 requires its own bit.
+    extended_member_tracking_mask = 33554432
@@ -1,24 +1,48 @@
 from evelink import api, constants
-from evelink.parsing.assets import parse_assets
+from evelink.parsing.assets import parse_asset_item, parse_assets
 from evelink.parsing.contact_list import parse_contact_list
 from evelink.parsing.contract_bids import parse_contract_bids
 from evelink.parsing.contract_items import parse_contract_items
 from evelink.parsing.contracts import parse_contracts
+from evelink.parsing.formats import DICTS
 from evelink.parsing.industry_jobs import parse_industry_jobs
-from evelink.parsing.kills import parse_kills
+from evelink.parsing.kills import parse_kill, parse_kills
+from evelink.parsing.locations import parse_locations
+from evelink.parsing.medals import parse_corp_medals
+from evelink.parsing.member_tracking import parse_member, parse_member_tracking
 from evelink.parsing.orders import parse_market_orders
-from evelink.parsing.wallet_journal import parse_wallet_journal
+from evelink.parsing.standings import parse_npc_standings
+from evelink.parsing.wallet_journal import parse_wallet_journal, parse_wallet_journal_entry
 from evelink.parsing.wallet_transactions import parse_wallet_transactions
 
 class Corp(object):
     """Wrapper around /corp/ of the EVE API.
 
     Note that a valid corp API key is required.
+
+    Methods returning many rows (assets, contracts, kills, orders, the
+    wallet journal and transactions, and corp members) accept a
+    result_format argument: 'dicts' (the default) returns nested dicts,
+    while 'records' returns compact slotted records with the same fields,
+    for keeping large histories in memory. The wallet journal and
+    transactions also support 'columns', returning a
+    parsing.columns.Columns of typed arrays (numpy arrays if available).
     """
 
     def __init__(self, api):
         self.api = api
 
+    def get_many(self, calls, max_workers=api.DEFAULT_MAX_WORKERS):
+        """Call several of this wrapper's methods concurrently.
+
+        calls is a sequence of method names, or of (method name, kwargs)
+        tuples, e.g. ['assets', ('wallet_journal', {'limit': 100})].
+
+        Returns a list with the APIResult of each call in input order, or
+        the exception (typically an APIError) raised by a failed call.
+        """
+        return api.call_methods(self, calls, max_workers=max_workers)
+
     def corporation_sheet(self, corp_id=None, api_result=None):
         """Get information about a corporation.
 
@@ -95,6 +119,7 @@ class Corp(object):
 
         return api.APIResult(result, api_result.timestamp, api_result.expires)
 
+    @api.cache_result
     def industry_jobs(self, api_result=None):
         """Get a list of jobs for a corporation."""
 
@@ -114,33 +139,12 @@ class Corp(object):
             api_result = self.api.get('corp/Standings')
 
         container = api_result.result.find('corporationNPCStandings')
-
-        rowsets = dict((r.attrib['name'], r) for r in container.findall('rowset'))
-        results = {
-            'agents': {},
-            'corps': {},
-            'factions': {},
-        }
-
-        _standing_types = {
-            'agents': 'agents',
-            'corps': 'NPCCorporations',
-            'factions': 'factions',
-        }
-
-        for key, rowset_name in _standing_types.iteritems():
-            for row in rowsets[rowset_name].findall('row'):
-                a = row.attrib
-                standing = {
-                    'id': int(a['fromID']),
-                    'name': a['fromName'],
-                    'standing': float(a['standing']),
-                }
-                results[key][standing['id']] = standing
+        results = parse_npc_standings(container)
 
         return api.APIResult(results, api_result.timestamp, api_result.expires)
 
-    def kills(self, before_kill=None, api_result=None):
+    @api.cache_result
+    def kills(self, before_kill=None, api_result=None, result_format=DICTS):
         """Look up recent kills for a corporation.
 
         before_kill:
@@ -154,7 +158,21 @@ class Corp(object):
 
             api_result = self.api.get('corp/KillLog', params)
 
-        return api.APIResult(parse_kills(api_result.result), api_result.timestamp, api_result.expires)
+        return api.APIResult(parse_kills(api_result.result, result_format), api_result.timestamp, api_result.expires)
+
+    def iter_kills(self, before_kill=None, result_format=DICTS):
+        """Stream recent kills for a corporation.
+
+        The result is an iterator over the kills, in the format used by
+        kills().
+        """
+        params = {}
+        if before_kill is not None:
+            params['beforeKillID'] = before_kill
+        api_result = self.api.iter_rows('corp/KillLog', params)
+
+        kills = (parse_kill(row, result_format) for row in api_result.result)
+        return api.APIResult(kills, api_result.timestamp, api_result.expires)
 
     def wallet_info(self, api_result=None):
         """Get information about corp wallets."""
@@ -174,7 +192,8 @@ class Corp(object):
 
         return api.APIResult(results, api_result.timestamp, api_result.expires)
 
-    def wallet_journal(self, before_id=None, limit=None, api_result=None):
+    @api.cache_result
+    def wallet_journal(self, before_id=None, limit=None, api_result=None, result_format=DICTS):
         """Returns wallet journal for a corporation."""
 
         if api_result is None:
@@ -186,9 +205,26 @@ class Corp(object):
             
             api_result = self.api.get('corp/WalletJournal', params)
 
-        return api.APIResult(parse_wallet_journal(api_result.result), api_result.timestamp, api_result.expires)
+        return api.APIResult(parse_wallet_journal(api_result.result, result_format), api_result.timestamp, api_result.expires)
 
-    def wallet_transactions(self, before_id=None, limit=None, api_result=None):
+    def iter_wallet_journal(self, before_id=None, limit=None, result_format=DICTS):
+        """Stream the corporation's wallet journal.
+
+        The result is an iterator over the journal entries in the order
+        the API returns them (see wallet_journal() for their format).
+        """
+        params = {}
+        if before_id is not None:
+            params['fromID'] = before_id
+        if limit is not None:
+            params['rowCount'] = limit
+        api_result = self.api.iter_rows('corp/WalletJournal', params)
+
+        entries = (parse_wallet_journal_entry(row, result_format) for row in api_result.result)
+        return api.APIResult(entries, api_result.timestamp, api_result.expires)
+
+    @api.cache_result
+    def wallet_transactions(self, before_id=None, limit=None, api_result=None, result_format=DICTS):
         """Returns wallet transactions for a corporation."""
 
         if api_result is None:
@@ -200,16 +236,18 @@ class Corp(object):
             
             api_result = self.api.get('corp/WalletTransactions', params)
 
-        return api.APIResult(parse_wallet_transactions(api_result.result), api_result.timestamp, api_result.expires)
+        return api.APIResult(parse_wallet_transactions(api_result.result, result_format), api_result.timestamp, api_result.expires)
 
-    def orders(self, api_result=None):
+    @api.cache_result
+    def orders(self, api_result=None, result_format=DICTS):
         """Return a corporation's buy and sell orders."""
         if api_result is None:
             api_result = self.api.get('corp/MarketOrders')
 
-        return api.APIResult(parse_market_orders(api_result.result), api_result.timestamp, api_result.expires)
+        return api.APIResult(parse_market_orders(api_result.result, result_format), api_result.timestamp, api_result.expires)
 
-    def assets(self, api_result=None):
+    @api.cache_result
+    def assets(self, api_result=None, result_format=DICTS):
         """Get information about corp assets.
 
         Each item is a dict, with keys 'id', 'item_type_id',
@@ -235,7 +273,21 @@ class Corp(object):
         if api_result is None:
             api_result = self.api.get('corp/AssetList')
 
-        return api.APIResult(parse_assets(api_result.result), api_result.timestamp, api_result.expires)
+        return api.APIResult(parse_assets(api_result.result, result_format), api_result.timestamp, api_result.expires)
+
+    def iter_assets(self, result_format=DICTS):
+        """Stream the corporation's assets.
+
+        The result is an iterator over the top-level items, in the format
+        described in assets() (including the contents of containers),
+        which are not grouped by location. The response is parsed
+        incrementally, so memory use stays flat however many items there
+        are.
+        """
+        api_result = self.api.iter_rows('corp/AssetList')
+
+        items = (parse_asset_item(row, None, result_format) for row in api_result.result)
+        return api.APIResult(items, api_result.timestamp, api_result.expires)
 
     def faction_warfare_stats(self, api_result=None):
         """Returns stats from faction warfare if this corp is enrolled.
@@ -283,12 +335,13 @@ class Corp(object):
 
         return api.APIResult(parse_contract_items(api_result.result), api_result.timestamp, api_result.expires)
 
-    def contracts(self, api_result=None):
+    @api.cache_result
+    def contracts(self, api_result=None, result_format=DICTS):
         """Get information about corp contracts."""
         if api_result is None:
             api_result = self.api.get('corp/Contracts')
 
-        return api.APIResult(parse_contracts(api_result.result), api_result.timestamp, api_result.expires)
+        return api.APIResult(parse_contracts(api_result.result, result_format), api_result.timestamp, api_result.expires)
 
     def shareholders(self, api_result=None):
         """Get information about a corp's shareholders."""
@@ -487,7 +540,8 @@ class Corp(object):
 
         return api.APIResult(result, api_result.timestamp, api_result.expires)
 
-    def members(self, extended=True, api_result=None):
+    @api.cache_result
+    def members(self, extended=True, api_result=None, result_format=DICTS):
         """Returns details about each member of the corporation."""
         
         if api_result is None:
@@ -497,44 +551,21 @@ class Corp(object):
             
             api_result = self.api.get('corp/MemberTracking', args)
 
-        rowset = api_result.result.find('rowset')
-        results = {}
-        for row in rowset.findall('row'):
-            a = row.attrib
-            member = {
-                'id': int(a['characterID']),
-                'name': a['name'],
-                'join_ts': api.parse_ts(a['startDateTime']),
-                'base': {
-                    # TODO(aiiane): Maybe remove this?
-                    # It doesn't seem to ever have a useful value.
-                    'id': int(a['baseID']),
-                    'name': a['base'],
-                },
-                # Note that title does not include role titles,
-                # only ones like 'CEO'
-                'title': a['title'],
-            }
-            if extended:
-                member.update({
-                    'logon_ts': api.parse_ts(a['logonDateTime']),
-                    'logoff_ts': api.parse_ts(a['logoffDateTime']),
-                    'location': {
-                        'id': int(a['locationID']),
-                        'name': a['location'],
-                    },
-                    'ship_type': {
-                        # "Not available" = -1 ship id; we change to None
-                        'id': max(int(a['shipTypeID']), 0) or None,
-                        'name': a['shipType'] or None,
-                    },
-                    'roles': int(a['roles']),
-                    'can_grant': int(a['grantableRoles']),
-                })
+        return api.APIResult(parse_member_tracking(api_result.result, extended, result_format), api_result.timestamp, api_result.expires)
 
-            results[member['id']] = member
+    def iter_members(self, extended=True, result_format=DICTS):
+        """Stream details about each member of the corporation.
 
-        return api.APIResult(results, api_result.timestamp, api_result.expires)
+        The result is an iterator over the members, in the format used
+        by members().
+        """
+        args = {}
+        if extended:
+            args['extended'] = 1
+        api_result = self.api.iter_rows('corp/MemberTracking', args)
+
+        members = (parse_member(row, extended, result_format) for row in api_result.result)
+        return api.APIResult(members, api_result.timestamp, api_result.expires)
 
     def permissions(self, api_result=None):
         """Returns information about corporation member permissions."""
@@ -673,18 +704,7 @@ class Corp(object):
         if api_result is None:
             api_result = self.api.get('corp/Medals')
 
-        rowset = api_result.result.find('rowset')
-        results = {}
-        for row in rowset.findall('row'):
-            a = row.attrib
-            medal = {
-                'id': int(a['medalID']),
-                'creator_id': int(a['creatorID']),
-                'title': a['title'],
-                'description': a['description'],
-                'create_ts': api.parse_ts(a['created']),
-            }
-            results[medal['id']] = medal
+        results = parse_corp_medals(api_result.result)
 
         return api.APIResult(results, api_result.timestamp, api_result.expires)
 
@@ -758,24 +778,7 @@ class Corp(object):
         
             api_result = self.api.get('corp/Locations', params)
         
-        rowset = api_result.result.find('rowset')
-        rows = rowset.findall('row')
-
-        results = {}
-        for row in rows:
-            name = row.attrib['itemName'] or None
-            id = int(row.attrib['itemID']) or None
-            x = float(row.attrib['x']) or None
-            y = float(row.attrib['y']) or None
-            z = float(row.attrib['z']) or None
-
-            results[id] = {
-                'name': name,
-                'id' : id,
-                'x' : x,
-                'y' : y,
-                'z' : z,
-            }
+        results = parse_locations(api_result.result)
 
         return api.APIResult(results, api_result.timestamp, api_result.expires)
 
@@ -1,21 +1,32 @@
-def parse_assets(api_result):
-    def handle_rowset(rowset, parent_location):
-        results = []
-        for row in rowset.findall('row'):
-            item = {'id': int(row.attrib['itemID']),
-                    'item_type_id': int(row.attrib['typeID']),
-                    'location_id': int(row.attrib.get('locationID', parent_location)),
-                    'location_flag': int(row.attrib['flag']),
-                    'quantity': int(row.attrib['quantity']),
-                    'packaged': row.attrib['singleton'] == '0',
-            }
-            contents = row.find('rowset')
-            if contents is not None:
-                item['contents'] = handle_rowset(contents, item['location_id'])
-            results.append(item)
-        return results
+from evelink.parsing import formats
+from evelink.parsing.formats import DICTS
 
-    result_list = handle_rowset(api_result.find('rowset'), None)
+AssetItem = formats.record_type('AssetItem', [
+    'id', 'item_type_id', 'location_id', 'location_flag', 'quantity',
+    'packaged', 'contents',
+], optional=['contents'])
+
+
+def parse_asset_item(row, parent_location, result_format=DICTS):
+    """Parse an asset <row> (and its contents, if it is a container)."""
+    convert = formats.converter(result_format, AssetItem)
+    item = {'id': int(row.attrib['itemID']),
+            'item_type_id': int(row.attrib['typeID']),
+            'location_id': int(row.attrib.get('locationID', parent_location)),
+            'location_flag': int(row.attrib['flag']),
+            'quantity': int(row.attrib['quantity']),
+            'packaged': row.attrib['singleton'] == '0',
+    }
+    contents = row.find('rowset')
+    if contents is not None:
+        item['contents'] = [parse_asset_item(r, item['location_id'], result_format)
+                            for r in contents.findall('row')]
+    return convert(item)
+
+
+def parse_assets(api_result, result_format=DICTS):
+    result_list = [parse_asset_item(row, None, result_format)
+                   for row in api_result.find('rowset').findall('row')]
     # For convenience, key the result by top-level location ID.
     result_dict = {}
     for item in result_list:
@@ -0,0 +1,154 @@
+"""Columnar results, holding one typed array per field.
+
+Columns are numpy arrays when numpy is available, and array.array
+otherwise. Strings are interned in a table shared by all of the columns
+of a result, and stored in their columns as indices into the table.
+"""
+
+import array
+import logging
+
+_log = logging.getLogger('evelink.parsing.columns')
+
+try:
+    import numpy
+    _has_numpy = True
+except ImportError:
+    _log.info('`numpy` not available, falling back to array.array')
+    numpy = None
+    _has_numpy = False
+
+# Kinds of columns.
+INT = 'int'
+FLOAT = 'float'
+BOOL = 'bool'
+STR = 'str'
+
+# Python 2's array module has no 64-bit typecode on platforms where a C
+# long is 32 bits; doubles hold every id and timestamp exactly there.
+_INT64 = 'l' if array.array('l').itemsize >= 8 else 'd'
+
+_TYPECODES = {
+    INT: _INT64,
+    FLOAT: 'd',
+    BOOL: 'b',
+    STR: _INT64,
+}
+
+if _has_numpy:
+    _DTYPES = {
+        INT: numpy.int64,
+        FLOAT: numpy.float64,
+        BOOL: numpy.bool_,
+        STR: numpy.int64,
+    }
+
+
+def make_array(kind, values):
+    """Convert a list of values to a typed array of the given kind."""
+    if _has_numpy:
+        return numpy.array(values, dtype=_DTYPES[kind])
+    return array.array(_TYPECODES[kind], values)
+
+
+class Columns(object):
+    """A parsed rowset, as a mapping of field names to typed arrays.
+
+    Nested fields are named with dots, e.g. 'party_1.id'. Columns of
+    strings hold indices into the strings table; text() returns their
+    values.
+    """
+
+    def __init__(self, columns, kinds, strings):
+        self.columns = columns
+        self.kinds = kinds
+        self.strings = strings
+
+    @classmethod
+    def build(cls, names, kinds, lists, interned):
+        """Create Columns from lists of values and a dict of interned strings."""
+        strings = [None] * len(interned)
+        for value, index in interned.iteritems():
+            strings[index] = value
+        columns = dict((name, make_array(kind, values))
+                       for name, kind, values in zip(names, kinds, lists))
+        return cls(columns, dict(zip(names, kinds)), strings)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __iter__(self):
+        return iter(sorted(self.columns))
+
+    def keys(self):
+        return sorted(self.columns)
+
+    def __len__(self):
+        for column in self.columns.itervalues():
+            return len(column)
+        return 0
+
+    def text(self, name):
+        """Return the values of a column of strings."""
+        if self.kinds[name] != STR:
+            raise ValueError("%r is not a column of strings" % name)
+        strings = self.strings
+        return [strings[i] for i in self.columns[name]]
+
+    def sort_by(self, name):
+        """Reorder all of the rows by the values of a column (stable)."""
+        column = self.columns[name]
+        if _has_numpy:
+            order = numpy.argsort(column, kind='mergesort')
+            for key, values in self.columns.iteritems():
+                self.columns[key] = values[order]
+        else:
+            order = sorted(xrange(len(column)), key=column.__getitem__)
+            for key, values in self.columns.iteritems():
+                self.columns[key] = array.array(values.typecode,
+                                                (values[i] for i in order))
+
+    def __repr__(self):
+        return '<Columns: %d rows of %s>' % (len(self), ', '.join(self.keys()))
+
+
+class ColumnsBuilder(object):
+    """Accumulates Columns row by row, from the dicts of the parsed rows.
+
+    fields is a sequence of (column name, kind) tuples. Nested values
+    are named with dots, e.g. 'party_1.id'. Values which are None, or in
+    an absent nested dict, are stored as 0 or an empty string.
+    """
+
+    def __init__(self, fields):
+        self.names = [name for name, _ in fields]
+        self.kinds = [kind for _, kind in fields]
+        self.lists = [[] for _ in fields]
+        self.interned = {}
+        self._columns = zip([name.split('.') for name in self.names],
+                            self.kinds, self.lists)
+
+    def append(self, entry):
+        """Add the values of the dict of a row."""
+        interned = self.interned
+        intern = interned.setdefault
+        for path, kind, values in self._columns:
+            value = entry
+            for key in path:
+                value = value.get(key)
+                if value is None:
+                    break
+            if kind == STR:
+                value = intern(value or '', len(interned))
+            elif value is None:
+                value = 0
+            values.append(value)
+
+    def build(self):
+        return Columns.build(self.names, self.kinds, self.lists, self.interned)
+
+
+# vim: set ts=4 sts=4 sw=4 et:
@@ -1,8 +1,17 @@
 from evelink import api
-from evelink import constants
-import time
+from evelink.parsing import formats
+from evelink.parsing.formats import DICTS
 
-def parse_contracts(api_result):
+Contract = formats.record_type('Contract', [
+    'id', 'issuer', 'issuer_corp', 'assignee', 'acceptor', 'start', 'end',
+    'type', 'status', 'corp', 'availability', 'issued', 'days', 'price',
+    'reward', 'collateral', 'buyout', 'volume', 'title', 'expired',
+    'accepted', 'completed',
+])
+
+
+def parse_contracts(api_result, result_format=DICTS):
+    convert = formats.converter(result_format, Contract)
     rowset = api_result.find('rowset')
     if rowset is None:
         return
@@ -29,10 +38,10 @@ def parse_contracts(api_result):
             'collateral': float(a['collateral']),
             'buyout': float(a['buyout']),
             'volume': float(a['volume']),
-            'title': a['title']
+            'title': a['title'],
+            'expired': api.parse_ts(a['dateExpired']),
+            'accepted': api.parse_ts(a['dateAccepted']),
+            'completed': api.parse_ts(a['dateCompleted']),
         }
-        contract['expired'] = api.parse_ts(a['dateExpired'])
-        contract['accepted'] = api.parse_ts(a['dateAccepted'])
-        contract['completed'] = api.parse_ts(a['dateCompleted'])
-        results[contract['id']] = contract
+        results[contract['id']] = convert(contract)
     return results
@@ -0,0 +1,187 @@
+"""Result formats of the parsers of high-volume endpoints.
+
+Parsers build each row as a dict. With another result_format, the dict
+of each row is converted as soon as it is parsed, so that only the
+converted rows are kept:
+
+RECORDS:
+    compact slotted Record objects, with the same fields as the dicts,
+    which take a fraction of their memory.
+COLUMNS:
+    a columns.Columns of typed arrays, for whole rowsets of the parsers
+    supporting it.
+"""
+
+DICTS = 'dicts'
+RECORDS = 'records'
+COLUMNS = 'columns'
+RESULT_FORMATS = (DICTS, RECORDS, COLUMNS)
+
+
+class Record(object):
+    """Base class of the record types of the parsers.
+
+    Records are slotted objects with the same fields as the dicts a
+    parser would build otherwise; nested dicts become nested records, and
+    keys the dicts may leave out are None. Fields can be read as
+    attributes or, like dicts, by key.
+    """
+
+    __slots__ = ()
+
+    # Keys left out of _asdict() when None, as the parsers' dicts omit
+    # them when they don't apply.
+    _optional = ()
+
+    # (key, slot setter) of each plain field, and (key, slot setter,
+    # Record type) of each nested one.
+    _fields = ()
+    _nested = ()
+
+    @classmethod
+    def from_dict(cls, entry):
+        """Convert a parsed dict, and its nested dicts, into a record."""
+        record = cls.__new__(cls)
+        get = entry.get
+        for key, set_value in cls._fields:
+            set_value(record, get(key))
+        for key, set_value, nested in cls._nested:
+            value = get(key)
+            if value is not None:
+                value = nested.from_dict(value)
+            set_value(record, value)
+        return record
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        try:
+            setattr(self, key, value)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def keys(self):
+        return list(self.__slots__)
+
+    def _asdict(self):
+        """Return the record as nested dicts."""
+        result = {}
+        for key in self.__slots__:
+            value = getattr(self, key, None)
+            if value is None and key in self._optional:
+                continue
+            if isinstance(value, Record):
+                value = value._asdict()
+            result[key] = value
+        return result
+
+    def __getstate__(self):
+        return tuple(getattr(self, key, None) for key in self.__slots__)
+
+    def __setstate__(self, state):
+        for key, value in zip(self.__slots__, state):
+            setattr(self, key, value)
+
+    def __reduce__(self):
+        # Record types are created by record_type(), so they are looked
+        # up again from their definition rather than imported by name.
+        return (_make_record,
+                (type(self).__name__, self.__slots__, self._optional),
+                self.__getstate__())
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.__getstate__() == other.__getstate__()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, ', '.join(
+            '%s=%r' % (key, getattr(self, key, None)) for key in self.__slots__))
+
+
+_record_types = {}
+
+
+def _record_name(name, key):
+    return name + ''.join(part.capitalize() for part in key.split('_'))
+
+
+def record_type(name, keys, optional=(), nested=None):
+    """Return a Record subclass with the given fields, sorted by name.
+
+    optional:
+        keys which the dicts leave out when they don't apply.
+    nested:
+        a dict of the keys holding nested dicts to their Record type, or
+        to the list of their keys (the type is then named after the key,
+        e.g. 'WalletJournalEntryParty1').
+
+    Types are shared by every parser defining the same record.
+    """
+    keys = tuple(sorted(keys))
+    optional = tuple(sorted(optional))
+    definition = (name, keys, optional)
+    cls = _record_types.get(definition)
+    if cls is None:
+        cls = type(name, (Record,), {'__slots__': keys, '_optional': optional})
+        _record_types[definition] = cls
+
+    nested = dict(nested or {})
+    for key, value in nested.iteritems():
+        if not isinstance(value, type):
+            nested[key] = record_type(_record_name(name, key), value)
+    # Slots named after keywords (e.g. 'for') can't be assigned with
+    # attribute syntax, so they are set through their descriptors.
+    cls._fields = tuple((key, cls.__dict__[key].__set__)
+                        for key in keys if key not in nested)
+    cls._nested = tuple((key, cls.__dict__[key].__set__, nested[key])
+                        for key in keys if key in nested)
+    return cls
+
+
+def _make_record(name, keys, optional):
+    cls = _record_types.get((name, keys, optional))
+    if cls is None:
+        cls = record_type(name, keys, optional)
+    return cls.__new__(cls)
+
+
+def _as_dict(entry):
+    return entry
+
+
+def converter(result_format, record):
+    """Return the function converting the dict of a row to result_format.
+
+    record is the Record type of the row. The columns format is built
+    from whole rowsets (see columns.ColumnsBuilder), not from single rows.
+    """
+    if result_format == DICTS:
+        return _as_dict
+    if result_format == RECORDS:
+        return record.from_dict
+    if result_format == COLUMNS:
+        raise ValueError("%s rows can't be parsed into columns." % record.__name__)
+    raise ValueError("Unknown result format %r (expected one of %s)" %
+                     (result_format, ', '.join(RESULT_FORMATS)))
+
+
+# vim: set ts=4 sts=4 sw=4 et:
@@ -1,22 +1,97 @@
 from evelink import api
+from evelink.parsing import formats
+from evelink.parsing.formats import DICTS
 
-def parse_kills(api_result):
-    rowset = api_result.find('rowset')
-    result = {}
-    for row in rowset.findall('row'):
-        a = row.attrib
-        kill_id = int(a['killID'])
-        result[kill_id] = {
-            'id': kill_id,
-            'system_id': int(a['solarSystemID']),
-            'time': api.parse_ts(a['killTime']),
-            'moon_id': int(a['moonID']),
-        }
-
-        victim = row.find('victim')
-        a = victim.attrib
-        result[kill_id]['victim'] = {
-            'id': int(a['characterID']),
+_PILOT_KEYS = ['id', 'name', 'corp', 'alliance', 'faction', 'ship_type_id']
+_PILOT_NESTED = {
+    'corp': ['id', 'name'],
+    'alliance': ['id', 'name'],
+    'faction': ['id', 'name'],
+}
+
+Kill = formats.record_type('Kill', [
+    'id', 'system_id', 'time', 'moon_id', 'victim', 'attackers', 'items',
+])
+
+Victim = formats.record_type('Victim', _PILOT_KEYS + ['damage'],
+                             nested=_PILOT_NESTED)
+
+Attacker = formats.record_type('Attacker', _PILOT_KEYS + [
+    'sec_status', 'damage', 'final_blow', 'weapon_type_id',
+], nested=_PILOT_NESTED)
+
+KillItem = formats.record_type('KillItem', [
+    'id', 'flag', 'dropped', 'destroyed',
+])
+
+
+def _get_items(rowset, convert):
+    items = []
+    for item in rowset.findall('row'):
+        a = item.attrib
+        type_id = int(a['typeID'])
+        items.append(convert({
+            'id': type_id,
+            'flag': int(a['flag']),
+            'dropped': int(a['qtyDropped']),
+            'destroyed': int(a['qtyDestroyed']),
+        }))
+
+        containers = item.findall('rowset')
+        for container in containers:
+            items.extend(_get_items(container, convert))
+
+    return items
+
+
+def parse_kill(row, result_format=DICTS):
+    convert = formats.converter(result_format, Kill)
+    convert_victim = formats.converter(result_format, Victim)
+    convert_attacker = formats.converter(result_format, Attacker)
+    convert_item = formats.converter(result_format, KillItem)
+
+    a = row.attrib
+    kill_id = int(a['killID'])
+    kill = {
+        'id': kill_id,
+        'system_id': int(a['solarSystemID']),
+        'time': api.parse_ts(a['killTime']),
+        'moon_id': int(a['moonID']),
+    }
+
+    victim = row.find('victim')
+    a = victim.attrib
+    kill['victim'] = convert_victim({
+        'id': int(a['characterID']),
+        'name': a['characterName'],
+        'corp': {
+            'id': int(a['corporationID']),
+            'name': a['corporationName'],
+        },
+        'alliance': {
+            'id': int(a['allianceID']),
+            'name': a['allianceName'],
+        },
+        'faction': {
+            'id': int(a['factionID']),
+            'name': a['factionName'],
+        },
+        'damage': int(a['damageTaken']),
+        'ship_type_id': int(a['shipTypeID']),
+    })
+
+    kill['attackers'] = {}
+
+    rowsets = {}
+    for rowset in row.findall('rowset'):
+        key = rowset.attrib['name']
+        rowsets[key] = rowset
+
+    for attacker in rowsets['attackers'].findall('row'):
+        a = attacker.attrib
+        attacker_id = int(a['characterID'])
+        kill['attackers'][attacker_id] = convert_attacker({
+            'id': attacker_id,
             'name': a['characterName'],
             'corp': {
                 'id': int(a['corporationID']),
@@ -30,60 +105,21 @@ def parse_kills(api_result):
                 'id': int(a['factionID']),
                 'name': a['factionName'],
             },
-            'damage': int(a['damageTaken']),
+            'sec_status': float(a['securityStatus']),
+            'damage': int(a['damageDone']),
+            'final_blow': a['finalBlow'] == '1',
+            'weapon_type_id': int(a['weaponTypeID']),
             'ship_type_id': int(a['shipTypeID']),
-        }
-
-        result[kill_id]['attackers'] = {}
-
-        rowsets = {}
-        for rowset in row.findall('rowset'):
-            key = rowset.attrib['name']
-            rowsets[key] = rowset
-
-        for attacker in rowsets['attackers'].findall('row'):
-            a = attacker.attrib
-            attacker_id = int(a['characterID'])
-            result[kill_id]['attackers'][attacker_id] = {
-                'id': attacker_id,
-                'name': a['characterName'],
-                'corp': {
-                    'id': int(a['corporationID']),
-                    'name': a['corporationName'],
-                },
-                'alliance': {
-                    'id': int(a['allianceID']),
-                    'name': a['allianceName'],
-                },
-                'faction': {
-                    'id': int(a['factionID']),
-                    'name': a['factionName'],
-                },
-                'sec_status': float(a['securityStatus']),
-                'damage': int(a['damageDone']),
-                'final_blow': a['finalBlow'] == '1',
-                'weapon_type_id': int(a['weaponTypeID']),
-                'ship_type_id': int(a['shipTypeID']),
-            }
-
-        def _get_items(rowset):
-            items = []
-            for item in rowset.findall('row'):
-                a = item.attrib
-                type_id = int(a['typeID'])
-                items.append({
-                    'id': type_id,
-                    'flag': int(a['flag']),
-                    'dropped': int(a['qtyDropped']),
-                    'destroyed': int(a['qtyDestroyed']),
-                })
-
-                containers = item.findall('rowset')
-                for container in containers:
-                    items.extend(_get_items(container))
-
-            return items
-
-        result[kill_id]['items'] = _get_items(rowsets['items'])
+        })
 
+    kill['items'] = _get_items(rowsets['items'], convert_item)
+    return convert(kill)
+
+
+def parse_kills(api_result, result_format=DICTS):
+    rowset = api_result.find('rowset')
+    result = {}
+    for row in rowset.findall('row'):
+        kill = parse_kill(row, result_format)
+        result[kill['id']] = kill
     return result
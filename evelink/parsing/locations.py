@@ -0,0 +1,20 @@
+def parse_locations(api_result):
+    rowset = api_result.find('rowset')
+    rows = rowset.findall('row')
+
+    results = {}
+    for row in rows:
+        name = row.attrib['itemName'] or None
+        id = int(row.attrib['itemID']) or None
+        x = float(row.attrib['x']) or None
+        y = float(row.attrib['y']) or None
+        z = float(row.attrib['z']) or None
+
+        results[id] = {
+            'name': name,
+            'id' : id,
+            'x' : x,
+            'y' : y,
+            'z' : z,
+        }
+    return results
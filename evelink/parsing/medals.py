@@ -0,0 +1,43 @@
+from evelink import api
+
+_CHAR_MEDAL_GROUPS = {
+    'currentCorporation': 'current',
+    'otherCorporations': 'other',
+}
+
+
+def parse_char_medals(api_result):
+    """Parse the medals awarded to a character, by awarding corporation."""
+    result = {'current': {}, 'other': {}}
+    for rowset in api_result.findall('rowset'):
+        name = _CHAR_MEDAL_GROUPS[rowset.attrib['name']]
+        for row in rowset.findall('row'):
+            a = row.attrib
+            medal_id = int(a['medalID'])
+            result[name][medal_id] = {
+                'id': medal_id,
+                'reason': a['reason'],
+                'public': a['status'] == 'public',
+                'issuer_id': int(a['issuerID']),
+                'corp_id': int(a['corporationID']),
+                'title': a['title'],
+                'description': a['description'],
+            }
+    return result
+
+
+def parse_corp_medals(api_result):
+    """Parse the medals created by a corporation."""
+    rowset = api_result.find('rowset')
+    results = {}
+    for row in rowset.findall('row'):
+        a = row.attrib
+        medal = {
+            'id': int(a['medalID']),
+            'creator_id': int(a['creatorID']),
+            'title': a['title'],
+            'description': a['description'],
+            'create_ts': api.parse_ts(a['created']),
+        }
+        results[medal['id']] = medal
+    return results
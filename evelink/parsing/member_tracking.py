@@ -0,0 +1,63 @@
+from evelink import api
+from evelink.parsing import formats
+from evelink.parsing.formats import DICTS
+
+_MEMBER_KEYS = ['id', 'name', 'join_ts', 'base', 'title']
+
+Member = formats.record_type('Member', _MEMBER_KEYS, nested={
+    'base': ['id', 'name'],
+})
+
+ExtendedMember = formats.record_type('ExtendedMember', _MEMBER_KEYS + [
+    'logon_ts', 'logoff_ts', 'location', 'ship_type', 'roles', 'can_grant',
+], nested={
+    'base': ['id', 'name'],
+    'location': ['id', 'name'],
+    'ship_type': ['id', 'name'],
+})
+
+
+def parse_member(row, extended, result_format=DICTS):
+    convert = formats.converter(result_format,
+                                ExtendedMember if extended else Member)
+    a = row.attrib
+    member = {
+        'id': int(a['characterID']),
+        'name': a['name'],
+        'join_ts': api.parse_ts(a['startDateTime']),
+        'base': {
+            # TODO(aiiane): Maybe remove this?
+            # It doesn't seem to ever have a useful value.
+            'id': int(a['baseID']),
+            'name': a['base'],
+        },
+        # Note that title does not include role titles,
+        # only ones like 'CEO'
+        'title': a['title'],
+    }
+    if extended:
+        member.update({
+            'logon_ts': api.parse_ts(a['logonDateTime']),
+            'logoff_ts': api.parse_ts(a['logoffDateTime']),
+            'location': {
+                'id': int(a['locationID']),
+                'name': a['location'],
+            },
+            'ship_type': {
+                # "Not available" = -1 ship id; we change to None
+                'id': max(int(a['shipTypeID']), 0) or None,
+                'name': a['shipType'] or None,
+            },
+            'roles': int(a['roles']),
+            'can_grant': int(a['grantableRoles']),
+        })
+    return convert(member)
+
+
+def parse_member_tracking(api_result, extended, result_format=DICTS):
+    rowset = api_result.find('rowset')
+    results = {}
+    for row in rowset.findall('row'):
+        member = parse_member(row, extended, result_format)
+        results[member['id']] = member
+    return results
@@ -0,0 +1,22 @@
+_STANDING_TYPES = {
+    'agents': 'agents',
+    'corps': 'NPCCorporations',
+    'factions': 'factions',
+}
+
+
+def parse_npc_standings(container):
+    """Parse the NPC standings rowsets of a character or corporation."""
+    rowsets = dict((r.attrib['name'], r) for r in container.findall('rowset'))
+    results = {}
+    for key, rowset_name in _STANDING_TYPES.iteritems():
+        results[key] = {}
+        for row in rowsets[rowset_name].findall('row'):
+            a = row.attrib
+            standing = {
+                'id': int(a['fromID']),
+                'name': a['fromName'],
+                'standing': float(a['standing']),
+            }
+            results[key][standing['id']] = standing
+    return results
@@ -1,42 +1,86 @@
 from evelink import api
+from evelink.parsing import columns
+from evelink.parsing import formats
+from evelink.parsing.formats import COLUMNS, DICTS
 
-def parse_wallet_journal(api_result):
+WalletJournalEntry = formats.record_type('WalletJournalEntry', [
+    'timestamp', 'id', 'type_id', 'party_1', 'party_2', 'arg', 'amount',
+    'balance', 'reason', 'tax',
+], nested={
+    'party_1': ['name', 'id'],
+    'party_2': ['name', 'id'],
+    'arg': ['name', 'id'],
+    'tax': ['taxer_id', 'amount'],
+})
+
+COLUMN_FIELDS = [
+    ('amount', columns.FLOAT),
+    ('arg.id', columns.INT),
+    ('arg.name', columns.STR),
+    ('balance', columns.FLOAT),
+    ('id', columns.INT),
+    ('party_1.id', columns.INT),
+    ('party_1.name', columns.STR),
+    ('party_2.id', columns.INT),
+    ('party_2.name', columns.STR),
+    ('reason', columns.STR),
+    ('tax.amount', columns.FLOAT),
+    ('tax.taxer_id', columns.INT),
+    ('timestamp', columns.INT),
+    ('type_id', columns.INT),
+]
+
+
+def _parse_entry(a):
+    return {
+        'timestamp': api.parse_ts(a['date']),
+        'id': int(a['refID']),
+        'type_id': int(a['refTypeID']),
+        'party_1': {
+            'name': a['ownerName1'],
+            'id': int(a['ownerID1']),
+        },
+        'party_2': {
+            'name': a['ownerName2'],
+            'id': int(a['ownerID2']),
+        },
+        'arg': {
+            'name': a['argName1'],
+            'id': int(a['argID1']),
+        },
+        'amount': float(a['amount']),
+        'balance': float(a['balance']),
+        'reason': a['reason'],
+        # The tax fields might be an empty string, or not present
+        # at all (e.g., for corp wallet records.)  Need to handle
+        # both edge cases.
+        'tax': {
+            'taxer_id': int(a.get('taxReceiverID') or 0),
+            'amount': float(a.get('taxAmount') or 0),
+        },
+    }
+
+
+def parse_wallet_journal_entry(row, result_format=DICTS):
+    convert = formats.converter(result_format, WalletJournalEntry)
+    return convert(_parse_entry(row.attrib))
+
+
+def parse_wallet_journal(api_result, result_format=DICTS):
     rowset = api_result.find('rowset')
-    result = []
 
+    if result_format == COLUMNS:
+        builder = columns.ColumnsBuilder(COLUMN_FIELDS)
+        for row in rowset.findall('row'):
+            builder.append(_parse_entry(row.attrib))
+        result = builder.build()
+        result.sort_by('id')
+        return result
+
+    convert = formats.converter(result_format, WalletJournalEntry)
+    result = []
     for row in rowset.findall('row'):
-        a = row.attrib
-        entry = {
-            'timestamp': api.parse_ts(a['date']),
-            'id': int(a['refID']),
-            'type_id': int(a['refTypeID']),
-            'party_1': {
-                'name': a['ownerName1'],
-                'id': int(a['ownerID1']),
-            },
-            'party_2': {
-                'name': a['ownerName2'],
-                'id': int(a['ownerID2']),
-            },
-            'arg': {
-                'name': a['argName1'],
-                'id': int(a['argID1']),
-            },
-            'amount': float(a['amount']),
-            'balance': float(a['balance']),
-            'reason': a['reason'],
-            # The tax fields might be an empty string, or not present
-            # at all (e.g., for corp wallet records.)  Need to handle
-            # both edge cases.
-            'tax': {
-                'taxer_id': int(a.get('taxReceiverID') or 0),
-                'amount': float(a.get('taxAmount') or 0),
-            },
-        }
-
-        result.append(entry)
+        result.append(convert(_parse_entry(row.attrib)))
 
     result.sort(key=lambda x: x['id'])
     return result
-
-
@@ -1,37 +1,80 @@
 from evelink import api
+from evelink.parsing import columns
+from evelink.parsing import formats
+from evelink.parsing.formats import COLUMNS, DICTS
 
-def parse_wallet_transactions(api_result):
+WalletTransaction = formats.record_type('WalletTransaction', [
+    'timestamp', 'id', 'journal_id', 'quantity', 'type', 'price', 'client',
+    'station', 'action', 'for', 'char',
+], optional=['char'], nested={
+    'type': ['id', 'name'],
+    'client': ['id', 'name'],
+    'station': ['id', 'name'],
+    'char': ['id', 'name'],
+})
+
+COLUMN_FIELDS = [
+    ('action', columns.STR),
+    ('char.id', columns.INT),
+    ('char.name', columns.STR),
+    ('client.id', columns.INT),
+    ('client.name', columns.STR),
+    ('for', columns.STR),
+    ('id', columns.INT),
+    ('journal_id', columns.INT),
+    ('price', columns.FLOAT),
+    ('quantity', columns.INT),
+    ('station.id', columns.INT),
+    ('station.name', columns.STR),
+    ('timestamp', columns.INT),
+    ('type.id', columns.INT),
+    ('type.name', columns.STR),
+]
+
+
+def _parse_transaction(a):
+    entry = {
+        'timestamp': api.parse_ts(a['transactionDateTime']),
+        'id': int(a['transactionID']),
+        'journal_id': int(a['journalTransactionID']),
+        'quantity': int(a['quantity']),
+        'type': {
+            'id': int(a['typeID']),
+            'name': a['typeName'],
+        },
+        'price': float(a['price']),
+        'client': {
+            'id': int(a['clientID']),
+            'name': a['clientName'],
+        },
+        'station': {
+            'id': int(a['stationID']),
+            'name': a['stationName'],
+        },
+        'action': a['transactionType'],
+        'for': a['transactionFor'],
+    }
+    if 'characterID' in a:
+        entry['char'] = {
+            'id': int(a['characterID']),
+            'name': a['characterName'],
+        }
+    return entry
+
+
+def parse_wallet_transactions(api_result, result_format=DICTS):
     rowset = api_result.find('rowset')
     rows = rowset.findall('row')
+
+    if result_format == COLUMNS:
+        builder = columns.ColumnsBuilder(COLUMN_FIELDS)
+        for row in rows:
+            builder.append(_parse_transaction(row.attrib))
+        return builder.build()
+
+    convert = formats.converter(result_format, WalletTransaction)
     result = []
     for row in rows:
-        a = row.attrib
-        entry = {
-            'timestamp': api.parse_ts(a['transactionDateTime']),
-            'id': int(a['transactionID']),
-            'journal_id': int(a['journalTransactionID']),
-            'quantity': int(a['quantity']),
-            'type': {
-                'id': int(a['typeID']),
-                'name': a['typeName'],
-            },
-            'price': float(a['price']),
-            'client': {
-                'id': int(a['clientID']),
-                'name': a['clientName'],
-            },
-            'station': {
-                'id': int(a['stationID']),
-                'name': a['stationName'],
-            },
-            'action': a['transactionType'],
-            'for': a['transactionFor'],
-        }
-        if 'characterID' in a:
-            entry['char'] = {
-                'id': int(a['characterID']),
-                'name': a['characterName'],
-            }
-        result.append(entry)
+        result.append(convert(_parse_transaction(row.attrib)))
 
     return result
@@ -0,0 +1,227 @@
+"""Skip the API calls an API key isn't allowed to make.
+
+The EVE API answers a call which the accessMask of the key doesn't
+permit, or made with an expired key, with an error; each of these costs
+a round trip and counts toward the error rate limits of the API. An
+AccessPlanner fetches the key's details once with Account.key_info(),
+keeps them until they expire, and refuses such calls locally:
+
+    planner = evelink.planner.AccessPlanner()
+    eve_api = evelink.api.API(api_key=key, access_planner=planner)
+    char = evelink.char.Char(char_id, api=eve_api)
+
+    if planner.can_call(char, 'wallet_journal'):
+        journal = char.wallet_journal()
+
+A refused call raises AccessDenied, a subclass of APIError carrying the
+error the API would have returned. The saved attribute counts them.
+"""
+
+from collections import Counter
+import logging
+import threading
+import time
+
+from evelink import account
+from evelink import api
+from evelink import char
+from evelink import constants
+from evelink import corp
+
+_log = logging.getLogger('evelink.planner')
+
+# The path requested by each method of the Char and Corp wrappers.
+CHAR_METHODS = {
+    'assets': 'char/AssetList',
+    'iter_assets': 'char/AssetList',
+    'contract_bids': 'char/ContractBids',
+    'contract_items': 'char/ContractItems',
+    'contracts': 'char/Contracts',
+    'wallet_journal': 'char/WalletJournal',
+    'iter_wallet_journal': 'char/WalletJournal',
+    'wallet_info': 'char/AccountBalance',
+    'wallet_transactions': 'char/WalletTransactions',
+    'industry_jobs': 'char/IndustryJobs',
+    'kills': 'char/KillLog',
+    'iter_kills': 'char/KillLog',
+    'notifications': 'char/Notifications',
+    'notification_texts': 'char/NotificationTexts',
+    'standings': 'char/Standings',
+    'character_sheet': 'char/CharacterSheet',
+    'contacts': 'char/ContactList',
+    'orders': 'char/MarketOrders',
+    'research': 'char/Research',
+    'current_training': 'char/SkillInTraining',
+    'skill_queue': 'char/SkillQueue',
+    'messages': 'char/MailMessages',
+    'message_bodies': 'char/MailBodies',
+    'mailing_lists': 'char/MailingLists',
+    'calendar_events': 'char/UpcomingCalendarEvents',
+    'calendar_attendees': 'char/CalendarEventAttendees',
+    'faction_warfare_stats': 'char/FacWarStats',
+    'medals': 'char/Medals',
+    'contact_notifications': 'char/ContactNotifications',
+    'locations': 'char/Locations',
+}
+
+CORP_METHODS = {
+    'corporation_sheet': 'corp/CorporationSheet',
+    'industry_jobs': 'corp/IndustryJobs',
+    'npc_standings': 'corp/Standings',
+    'kills': 'corp/KillLog',
+    'iter_kills': 'corp/KillLog',
+    'wallet_info': 'corp/AccountBalance',
+    'wallet_journal': 'corp/WalletJournal',
+    'iter_wallet_journal': 'corp/WalletJournal',
+    'wallet_transactions': 'corp/WalletTransactions',
+    'orders': 'corp/MarketOrders',
+    'assets': 'corp/AssetList',
+    'iter_assets': 'corp/AssetList',
+    'faction_warfare_stats': 'corp/FacWarStats',
+    'contract_bids': 'corp/ContractBids',
+    'contract_items': 'corp/ContractItems',
+    'contracts': 'corp/Contracts',
+    'shareholders': 'corp/Shareholders',
+    'contacts': 'corp/ContactList',
+    'titles': 'corp/Titles',
+    'starbases': 'corp/StarbaseList',
+    'starbase_details': 'corp/StarbaseDetail',
+    'members': 'corp/MemberTracking',
+    'iter_members': 'corp/MemberTracking',
+    'permissions': 'corp/MemberSecurity',
+    'permissions_log': 'corp/MemberSecurityLog',
+    'stations': 'corp/OutpostList',
+    'station_services': 'corp/OutpostServiceDetail',
+    'medals': 'corp/Medals',
+    'member_medals': 'corp/MemberMedals',
+    'container_log': 'corp/ContainerLog',
+    'locations': 'corp/Locations',
+}
+
+# The errors returned by the EVE API for forbidden calls.
+SECURITY_LEVEL_ERROR = ('200', 'Current security level not high enough.')
+CHARACTER_ERROR = ('201', 'Character does not belong to account.')
+EXPIRED_KEY_ERROR = ('222', 'Key has expired. Contact key owner for access renewal.')
+
+
+class AccessDenied(api.APIError):
+    """Raised instead of making a call which the API key doesn't permit."""
+    pass
+
+
+def required_mask(path, params=None):
+    """Return the accessMask bit required by a call, or None if any key works."""
+    params = dict(params or ())
+    if path == 'corp/CorporationSheet' and 'corporationID' in params:
+        # The public sheet of a corporation needs no key.
+        return None
+    if path == 'corp/MemberTracking' and params.get('extended'):
+        return constants.APIKey.extended_member_tracking_mask
+    return constants.APIKey.access_masks.get(path)
+
+
+class AccessPlanner(object):
+    """Refuse calls forbidden by the details of the API keys.
+
+    The details of each key (its type, accessMask, expiry and characters)
+    are fetched on its first call, and fetched again once the response
+    expires. The planner can be shared by the APIs of several keys, and
+    by several threads.
+
+    saved:
+        the number of calls refused.
+    refused:
+        a Counter of the refused calls, by path.
+    """
+
+    def __init__(self):
+        self.saved = 0
+        self.refused = Counter()
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def key_info(self, eve_api):
+        """Return the details of the key of an API, as Account.key_info().
+
+        Raises the APIError returned by the API for an invalid key.
+        """
+        now = time.time()
+        with self._lock:
+            cached = self._keys.get(eve_api.api_key)
+        if cached is None or cached[1] <= now:
+            try:
+                result = account.Account(eve_api).key_info()
+                cached = (result.result, now + result.cache_for())
+            except api.APIError as e:
+                if e.timestamp is None or e.expires is None:
+                    raise
+                cached = (e, now + e.expires - e.timestamp)
+            with self._lock:
+                self._keys[eve_api.api_key] = cached
+        if isinstance(cached[0], api.APIError):
+            raise cached[0]
+        return cached[0]
+
+    def forget(self, eve_api):
+        """Drop the cached details of the key of an API."""
+        with self._lock:
+            self._keys.pop(eve_api.api_key, None)
+
+    def denial(self, eve_api, path, params=None):
+        """Return the AccessDenied error a call would get, or None."""
+        mask = required_mask(path, params)
+        if mask is None or not eve_api.api_key:
+            return None
+        try:
+            info = self.key_info(eve_api)
+        except api.APIError as e:
+            return AccessDenied(e.code, e.message, e.timestamp, e.expires)
+
+        if info['expire_ts'] is not None and info['expire_ts'] <= time.time():
+            return AccessDenied(*EXPIRED_KEY_ERROR)
+        key_type = path.split('/', 1)[0]
+        if info['type'] == constants.CORPORATION:
+            if key_type != constants.CORPORATION:
+                return AccessDenied(*SECURITY_LEVEL_ERROR)
+        elif key_type == constants.CORPORATION:
+            return AccessDenied(*SECURITY_LEVEL_ERROR)
+        elif 'characterID' in dict(params or ()):
+            char_id = int(dict(params)['characterID'])
+            if char_id not in info['characters']:
+                return AccessDenied(*CHARACTER_ERROR)
+        if not info['access_mask'] & mask:
+            return AccessDenied(*SECURITY_LEVEL_ERROR)
+        return None
+
+    def check(self, eve_api, path, params=None):
+        """Raise AccessDenied if a call is forbidden; count it as saved."""
+        error = self.denial(eve_api, path, params)
+        if error is not None:
+            with self._lock:
+                self.saved += 1
+                self.refused[path] += 1
+            _log.debug("Refusing %s locally: %r", path, error)
+            raise error
+
+    def can_call(self, wrapper, method, **kwargs):
+        """Return whether a method of a Char or Corp wrapper is permitted.
+
+        kwargs are the arguments the method would be called with, where
+        they change the call's requirements (e.g. corp_id or extended).
+        """
+        if isinstance(wrapper, char.Char):
+            path = CHAR_METHODS[method]
+            params = {'characterID': wrapper.char_id}
+        elif isinstance(wrapper, corp.Corp):
+            path = CORP_METHODS[method]
+            params = {}
+            if kwargs.get('corp_id') is not None:
+                params['corporationID'] = kwargs['corp_id']
+            if method in ('members', 'iter_members') and kwargs.get('extended', True):
+                params['extended'] = 1
+        else:
+            raise ValueError("Unsupported wrapper %r" % wrapper)
+        return self.denial(wrapper.api, path, params) is None
+
+
+# vim: set ts=4 sts=4 sw=4 et:
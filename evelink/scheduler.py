@@ -0,0 +1,366 @@
+"""Poll API calls again as soon as their cached responses expire.
+
+A Scheduler holds jobs, each a zero-argument callable identified by a
+(key, endpoint) pair (e.g. an API key id and a method name), and runs
+each job again once the response it returned stops being cached:
+
+    scheduler = evelink.scheduler.Scheduler(workers=4,
+                                            state_file='polls.json')
+    char = evelink.char.Char(char_id, api=evelink.api.API(api_key=key))
+    scheduler.add(key[0], 'wallet_journal', char.wallet_journal,
+                  on_result=store_journal)
+    scheduler.start()
+
+Jobs return an APIResult (as the wrapper methods do); the job is due
+again when the cache entry of the response expires, which for a
+response served from the cache is sooner than the full cache period. Due jobs of the INTERACTIVE priority class run
+before any due job of the BACKGROUND class, and at most max_per_key jobs
+of a key run at once, so a key with many endpoints cannot take all of
+the workers.
+
+With a state_file, the due times of the jobs are saved periodically and
+on stop(), and restored by add(), so that a restarted scheduler resumes
+its polling instead of requesting every endpoint at once.
+"""
+
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from evelink import api
+
+_log = logging.getLogger('evelink.scheduler')
+
+# Priority classes; lower values run first.
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+# How often workers look for jobs while the due ones wait for their key.
+_BUSY_POLL_INTERVAL = 1
+
+
+class Job(object):
+    """A call polled by a Scheduler.
+
+    due is the local time at which the job runs next, runs the number of
+    times it has run, and last_error the exception raised by its last run
+    (or None).
+    """
+
+    def __init__(self, key, endpoint, call, priority=BACKGROUND,
+                 on_result=None, on_error=None):
+        if priority not in PRIORITIES:
+            raise ValueError("Unknown priority class %r" % priority)
+        self.key = key
+        self.endpoint = endpoint
+        self.call = call
+        self.priority = priority
+        self.on_result = on_result
+        self.on_error = on_error
+        self.due = None
+        self.runs = 0
+        self.last_error = None
+        self.running = False
+        # The heap entry of the job, if it is queued.
+        self._entry = None
+
+    @property
+    def id(self):
+        return '%s/%s' % (self.key, self.endpoint)
+
+    def __repr__(self):
+        return '<Job %s due at %r>' % (self.id, self.due)
+
+
+class Scheduler(object):
+    """Run jobs on a pool of worker threads when their results expire.
+
+    workers:
+        the number of worker threads started by start().
+    max_per_key:
+        the maximum number of jobs of a key running at once.
+    min_interval:
+        the minimum number of seconds between two runs of a job, whatever
+        the expiry of its result.
+    retry_interval:
+        the number of seconds after which a failed job runs again, unless
+        the API said how long its error is cached.
+    spread:
+        new jobs with no saved state are first due at a random time within
+        this many seconds, instead of all at once.
+    state_file:
+        a path where the due times of the jobs are saved as JSON.
+    save_interval:
+        the minimum number of seconds between two saves of the state by
+        the workers.
+    """
+
+    def __init__(self, workers=4, max_per_key=1, min_interval=30,
+                 retry_interval=300, spread=0, state_file=None,
+                 save_interval=60):
+        self.workers = workers
+        self.max_per_key = max_per_key
+        self.min_interval = min_interval
+        self.retry_interval = retry_interval
+        self.spread = spread
+        self.state_file = state_file
+        self.save_interval = save_interval
+
+        self.runs = 0
+        self.errors = 0
+
+        self._jobs = {}
+        self._queues = dict((priority, []) for priority in PRIORITIES)
+        self._counter = itertools.count()
+        self._running = {}
+        self._condition = threading.Condition()
+        self._threads = []
+        self._stopping = False
+        self._last_save = time.time()
+        self._saved_state = self._load_state()
+
+    def _load_state(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (IOError, ValueError) as e:
+            _log.warning("Ignoring unreadable scheduler state %s: %r",
+                         self.state_file, e)
+            return {}
+
+    def save_state(self):
+        """Write the due times of the jobs to the state file."""
+        if not self.state_file:
+            return
+        with self._condition:
+            state = dict((job.id, job.due) for job in self._jobs.itervalues()
+                         if job.due is not None)
+            self._last_save = time.time()
+        temp_file = '%s.tmp' % self.state_file
+        with open(temp_file, 'w') as f:
+            json.dump(state, f)
+        os.rename(temp_file, self.state_file)
+
+    def _push(self, job, due, priority):
+        """Queue a job; the caller holds the condition."""
+        if job._entry is not None:
+            # Invalidate the previous entry, which stays in its heap.
+            job._entry[-1] = None
+        job.due = due
+        job._entry = [due, next(self._counter), job]
+        heapq.heappush(self._queues[priority], job._entry)
+        self._condition.notify()
+
+    def add(self, key, endpoint, call, priority=BACKGROUND, due=None,
+            on_result=None, on_error=None):
+        """Add a job polling call; return the Job.
+
+        The job is first due at the given local time, or at the time saved
+        in the state file; otherwise, or if that time has passed, it is due
+        now (within the spread). Adding a job which already exists replaces
+        it.
+
+        on_result and on_error are called, from a worker thread, with the
+        job and the result of each run, or the exception it raised.
+        """
+        job = Job(key, endpoint, call, priority, on_result, on_error)
+        now = time.time()
+        if due is None:
+            due = self._saved_state.get(job.id)
+            if due is None or due < now:
+                due = now + random.uniform(0, self.spread)
+        with self._condition:
+            previous = self._jobs.get((key, endpoint))
+            if previous is not None and previous._entry is not None:
+                previous._entry[-1] = None
+            self._jobs[(key, endpoint)] = job
+            self._push(job, due, priority)
+        return job
+
+    def remove(self, key, endpoint):
+        """Stop polling a job."""
+        with self._condition:
+            job = self._jobs.pop((key, endpoint))
+            if job._entry is not None:
+                job._entry[-1] = None
+                job._entry = None
+
+    def request(self, key, endpoint):
+        """Run a job as soon as possible, ahead of the background jobs.
+
+        The job returns to its own priority class after this run.
+        """
+        with self._condition:
+            job = self._jobs[(key, endpoint)]
+            if not job.running:
+                self._push(job, time.time(), INTERACTIVE)
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def _next_job(self, now):
+        """Return a (job, wait) tuple; the caller holds the condition.
+
+        job is the next job to run, if one is due; otherwise wait is the
+        number of seconds until one is, or None if unknown.
+        """
+        earliest = None
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            busy = []
+            job = None
+            while queue and queue[0][0] <= now:
+                entry = heapq.heappop(queue)
+                if entry[-1] is None:
+                    continue
+                if self._running.get(entry[-1].key, 0) >= self.max_per_key:
+                    busy.append(entry)
+                    continue
+                job = entry[-1]
+                job._entry = None
+                break
+            for entry in busy:
+                heapq.heappush(queue, entry)
+            if job is not None:
+                return job, None
+            if busy:
+                due = now + _BUSY_POLL_INTERVAL
+            elif queue:
+                due = queue[0][0]
+            else:
+                continue
+            if earliest is None or due < earliest:
+                earliest = due
+        if earliest is None:
+            return None, None
+        return None, max(0, earliest - now)
+
+    def _start_job(self, job):
+        job.running = True
+        self._running[job.key] = self._running.get(job.key, 0) + 1
+
+    def _finish_job(self, job, delay, failed):
+        with self._condition:
+            job.running = False
+            job.runs += 1
+            self.runs += 1
+            if failed:
+                self.errors += 1
+            self._running[job.key] -= 1
+            if not self._running[job.key]:
+                del self._running[job.key]
+            if self._jobs.get((job.key, job.endpoint)) is job:
+                self._push(job, time.time() + max(delay, self.min_interval),
+                           job.priority)
+            self._condition.notify_all()
+
+    def _expiry_delay(self, cache_for):
+        """Return the number of seconds until the last response expires.
+
+        Uses the local expiry of the cache entry the response came from,
+        if the API recorded one, and cache_for otherwise.
+        """
+        expires = api.last_response_expiry()
+        if expires is None:
+            return cache_for
+        return expires - time.time()
+
+    def _run(self, job):
+        """Run a job and queue it again for when its result expires."""
+        api.reset_response_expiry()
+        try:
+            result = job.call()
+        except api.APIError as e:
+            _log.warning("Scheduled call %s failed: %r", job.id, e)
+            if e.timestamp is not None and e.expires is not None:
+                delay = self._expiry_delay(e.expires - e.timestamp)
+            else:
+                delay = self.retry_interval
+            error = e
+        except Exception as e:
+            _log.exception("Scheduled call %s failed", job.id)
+            delay = self.retry_interval
+            error = e
+        else:
+            error = None
+            if isinstance(result, api.APIResult):
+                delay = self._expiry_delay(result.cache_for())
+            else:
+                delay = self.min_interval
+
+        job.last_error = error
+        self._finish_job(job, delay, error is not None)
+        if error is not None:
+            if job.on_error is not None:
+                job.on_error(job, error)
+        elif job.on_result is not None:
+            job.on_result(job, result)
+
+    def run_pending(self):
+        """Run the due jobs in the calling thread; return how many ran."""
+        count = 0
+        while True:
+            with self._condition:
+                job, _ = self._next_job(time.time())
+                if job is None:
+                    return count
+                self._start_job(job)
+            self._run(job)
+            count += 1
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._stopping:
+                        return
+                    job, wait = self._next_job(time.time())
+                    if job is not None:
+                        self._start_job(job)
+                        break
+                    self._condition.wait(wait)
+            try:
+                self._run(job)
+            except Exception:
+                _log.exception("Callback of scheduled call %s failed", job.id)
+            if (self.state_file and
+                    time.time() - self._last_save >= self.save_interval):
+                self.save_state()
+
+    def start(self):
+        """Start the worker threads."""
+        with self._condition:
+            if self._threads:
+                return
+            self._stopping = False
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work,
+                    name='evelink-scheduler-%d' % i)
+                thread.daemon = True
+                self._threads.append(thread)
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the worker threads, once their current jobs complete.
+
+        Saves the state, if there is a state file.
+        """
+        with self._condition:
+            self._stopping = True
+            threads, self._threads = self._threads, []
+            self._condition.notify_all()
+        for thread in threads:
+            thread.join(timeout)
+        self.save_state()
+
+
+# vim: set ts=4 sts=4 sw=4 et:
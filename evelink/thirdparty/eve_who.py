@@ -1,3 +1,4 @@
+import hashlib
 import json
 import urllib
 import re
@@ -45,9 +46,9 @@ class EVEWho(object):
         return urllib2.urlopen(url).read()
 
     def _cache_key(self, path, params):
-        sorted_params = sorted(params.iteritems())
-        # Paradoxically, Shelve doesn't like integer keys.
-        return str(hash((path, tuple(sorted_params))))
+        # A digest rather than hash(), which changes between processes.
+        sorted_params = urllib.urlencode(sorted(params.iteritems()))
+        return 'evewho:%s:%s' % (path, hashlib.sha1(sorted_params).hexdigest())
 
     def _get(self, ext_id, api_type, page=0):
         """Request page from EveWho api."""
@@ -0,0 +1,238 @@
+"""Transports used by the API to send requests over HTTP.
+
+A transport sends a request for a URL, with an optional urlencoded POST
+body, and returns the body of the response. All transports limit the
+number of requests in flight, in total and per host, so they can be
+shared by the threads of API.get_many() or api.call_many().
+
+HTTPTransport:
+    keeps persistent (keep-alive) httplib connections in a pool, so that
+    consecutive requests to the same host don't pay for a new TCP and
+    TLS handshake each time.
+RequestsTransport:
+    uses a single requests.Session, whose connection pool is sized from
+    the same settings.
+FakeTransport:
+    serves canned responses in-process, for tests.
+
+asyncapi.AsyncHTTPTransport sends requests over non-blocking sockets,
+for an asyncapi.AsyncAPI.
+
+To use a transport, pass it to the API:
+
+    api = evelink.api.API(transport=evelink.transport.HTTPTransport())
+"""
+
+import httplib
+import logging
+import socket
+import threading
+import urllib2
+import urlparse
+from StringIO import StringIO
+
+_log = logging.getLogger('evelink.transport')
+
+try:
+    import requests
+    import requests.adapters
+    _has_requests = True
+except ImportError:
+    _log.info('`requests` not available, RequestsTransport is disabled')
+    _has_requests = False
+
+DEFAULT_TIMEOUT = 60
+DEFAULT_MAX_CONNECTIONS = 10
+DEFAULT_MAX_PER_HOST = 4
+
+
+class Transport(object):
+    """Base class of the transports.
+
+    timeout:
+        the timeout in seconds of the network operations of a request.
+    max_connections:
+        the maximum number of requests in flight, across all hosts.
+    max_per_host:
+        the maximum number of requests in flight to a single host.
+
+    Further requests wait until one of the requests in flight completes.
+    Subclasses implement _send().
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT,
+                 max_connections=DEFAULT_MAX_CONNECTIONS,
+                 max_per_host=DEFAULT_MAX_PER_HOST):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def _host_slot(self, host):
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(
+                    self.max_per_host)
+            return slot
+
+    def send(self, url, data=None):
+        """Request url and return the body of the response.
+
+        If data is given, it is sent as the urlencoded body of a POST
+        request; otherwise a GET request is made.
+        """
+        host = urlparse.urlsplit(url).netloc
+        with self._slots:
+            with self._host_slot(host):
+                return self._send(url, data)
+
+    def _send(self, url, data):
+        raise NotImplementedError()
+
+    def close(self):
+        """Release the resources (e.g. connections) held by the transport."""
+        pass
+
+
+class HTTPTransport(Transport):
+    """A transport reusing keep-alive httplib connections.
+
+    Idle connections are kept per host, and reused by the next request to
+    the same host. Error responses (4xx and 5xx) raise urllib2.HTTPError,
+    and network failures raise urllib2.URLError, as with urllib2.urlopen.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(HTTPTransport, self).__init__(*args, **kwargs)
+        self._idle = {}
+
+    def _connect(self, scheme, host):
+        if scheme == 'https':
+            return httplib.HTTPSConnection(host, timeout=self.timeout)
+        return httplib.HTTPConnection(host, timeout=self.timeout)
+
+    def _checkout(self, scheme, host):
+        """Return a (connection, reused) tuple for the host."""
+        with self._lock:
+            idle = self._idle.get((scheme, host))
+            if idle:
+                return idle.pop(), True
+        return self._connect(scheme, host), False
+
+    def _checkin(self, scheme, host, connection):
+        with self._lock:
+            self._idle.setdefault((scheme, host), []).append(connection)
+
+    def _request(self, connection, path, data):
+        headers = {'Connection': 'keep-alive'}
+        if data is not None:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            connection.request('POST', path, data, headers)
+        else:
+            connection.request('GET', path, headers=headers)
+        response = connection.getresponse()
+        return response, response.read()
+
+    def _send(self, url, data):
+        scheme, host, path, query, _ = urlparse.urlsplit(url)
+        if query:
+            path = '%s?%s' % (path, query)
+
+        connection, reused = self._checkout(scheme, host)
+        while True:
+            try:
+                response, body = self._request(connection, path, data)
+                break
+            except (httplib.HTTPException, socket.error) as e:
+                connection.close()
+                if not reused:
+                    raise urllib2.URLError(e)
+                # The server may have closed the idle connection; retry once
+                # on a new one.
+                _log.debug("Reconnecting to %s after %r", host, e)
+                connection, reused = self._connect(scheme, host), False
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._checkin(scheme, host, connection)
+
+        if response.status >= 400:
+            raise urllib2.HTTPError(url, response.status, response.reason,
+                                    response.msg, StringIO(body))
+        return body
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.itervalues():
+            for connection in connections:
+                connection.close()
+
+
+class RequestsTransport(Transport):
+    """A transport sending requests with a shared requests.Session.
+
+    The session is created with the transport, so that it is never
+    created concurrently; its connection pool keeps up to max_per_host
+    connections to each of max_connections hosts. As with HTTPTransport,
+    error responses (4xx and 5xx) raise urllib2.HTTPError.
+    """
+
+    def __init__(self, *args, **kwargs):
+        if not _has_requests:
+            raise ValueError("RequestsTransport requires the requests library.")
+        super(RequestsTransport, self).__init__(*args, **kwargs)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.max_connections,
+            pool_maxsize=self.max_per_host)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _send(self, url, data):
+        if data is not None:
+            r = self.session.post(url, data=data, timeout=self.timeout,
+                headers={'Content-Type': 'application/x-www-form-urlencoded'})
+        else:
+            r = self.session.get(url, timeout=self.timeout)
+        if r.status_code >= 400:
+            raise urllib2.HTTPError(url, r.status_code, r.reason, r.headers,
+                                    StringIO(r.content))
+        return r.content
+
+    def close(self):
+        self.session.close()
+
+
+class FakeTransport(Transport):
+    """A transport serving canned responses, without any network access.
+
+    responses maps URLs to either the body of the response, an exception
+    to raise, or a callable taking (url, data) and returning the body.
+    Unknown URLs raise a 404 urllib2.HTTPError. Requests are recorded, as
+    (url, data) tuples, in the requests attribute.
+    """
+
+    def __init__(self, responses=None, *args, **kwargs):
+        super(FakeTransport, self).__init__(*args, **kwargs)
+        self.responses = dict(responses or {})
+        self.requests = []
+
+    def _send(self, url, data):
+        with self._lock:
+            self.requests.append((url, data))
+        response = self.responses.get(url)
+        if response is None:
+            raise urllib2.HTTPError(url, 404, 'Not Found', {}, StringIO(''))
+        if isinstance(response, Exception):
+            raise response
+        if callable(response):
+            return response(url, data)
+        return response
+
+
+# vim: set ts=4 sts=4 sw=4 et:
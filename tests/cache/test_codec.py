@@ -0,0 +1,33 @@
+import unittest2 as unittest
+
+from evelink.cache import codec
+
+
+class CodecTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.codec = codec.Codec(threshold=100)
+
+    def test_round_trip(self):
+        for value in ['short', 'x' * 1000, u'unicode', {'a': [1, 2]},
+                      range(1000), '']:
+            self.assertEqual(self.codec.decode(self.codec.encode(value)), value)
+
+    def test_tags(self):
+        self.assertEqual(self.codec.encode('short'), 'Sshort')
+        self.assertEqual(self.codec.encode('x' * 1000)[0], codec.ZLIB)
+        self.assertEqual(self.codec.encode(1)[0], codec.PICKLE)
+        self.assertEqual(self.codec.encode(range(1000))[0], codec.ZLIB_PICKLE)
+        self.assertEqual(codec.Codec(level=0).encode('x' * 1000)[0], codec.RAW)
+
+    def test_compression(self):
+        value = '<row refID="1" amount="1.00" />\n' * 100
+        self.assertLess(len(self.codec.encode(value)), len(value) / 10)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, codec.Codec, level=10)
+        self.assertRaises(ValueError, self.codec.decode, 'Xfoo')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import os
+import shutil
+import tempfile
+import time
+
+import unittest2 as unittest
+
+from evelink.cache.mmaplog import MAGIC, MmapLogCache
+
+class MmapLogCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.cache_dir, 'log')
+        self.cache = MmapLogCache(self.cache_path)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.cache_dir)
+
+    def test_cache(self):
+        self.cache.put('foo', 'bar', 3600)
+        self.cache.put('bar', 1, 3600)
+        self.cache.put('baz', True, 3600)
+        self.assertEqual(self.cache.get('foo'), 'bar')
+        self.assertEqual(self.cache.get('bar'), 1)
+        self.assertEqual(self.cache.get('baz'), True)
+        self.assertEqual(self.cache.get('missing'), None)
+        self.assertEqual(len(self.cache), 3)
+
+    def test_expire(self):
+        self.cache.put('foo', 'bar', 3600)
+        self.cache.put('foo', 'baz', -1)
+        self.cache.put('qux', 'quux', 0.01)
+        time.sleep(0.02)
+        self.assertEqual(self.cache.get('foo'), None)
+        self.assertEqual(self.cache.get('qux'), None)
+        self.assertEqual(self.cache.sweep(), 1)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_get_with_expiration(self):
+        self.cache.put('foo', 'bar', 60)
+        value, expiration = self.cache.get_with_expiration('foo')
+        self.assertEqual(value, 'bar')
+        self.assertAlmostEqual(expiration, time.time() + 60, delta=1)
+
+    def test_get_buffer(self):
+        self.cache.close()
+        self.cache = MmapLogCache(self.cache_path, codec=None)
+        self.cache.put('foo', '<eveapi/>', 3600)
+        data = self.cache.get_buffer('foo')
+        self.assertIsInstance(data, buffer)
+        self.assertEqual(str(data), 'S<eveapi/>')
+        self.assertEqual(self.cache.get_buffer('missing'), None)
+
+    def test_codec(self):
+        payload = '<row id="1" name="foo" />\n' * 100
+        self.cache.put('foo', payload, 3600)
+        self.assertLess(os.path.getsize(self.cache_path), len(payload) / 5)
+        self.assertEqual(self.cache.get('foo'), payload)
+
+    def test_multi(self):
+        self.cache.put_multi([('foo', 'bar', 3600), ('bar', 1, 3600),
+                              ('baz', 'qux', -1)])
+        self.assertEqual(
+            self.cache.get_multi(['foo', 'bar', 'baz', 'missing']),
+            {'foo': 'bar', 'bar': 1})
+
+    def test_reopen(self):
+        self.cache.put('foo', 'bar', 3600)
+        self.cache.put('foo', 'baz', 3600)
+        self.cache.put('qux', 'quux', -1)
+        self.cache.close()
+
+        self.cache = MmapLogCache(self.cache_path)
+        self.assertEqual(self.cache.get('foo'), 'baz')
+        self.assertEqual(self.cache.get('qux'), None)
+        self.assertEqual(len(self.cache), 1)
+
+    def test_not_a_log(self):
+        path = os.path.join(self.cache_dir, 'other')
+        with open(path, 'w') as f:
+            f.write('something else')
+        self.assertRaises(ValueError, MmapLogCache, path)
+
+    def test_shared(self):
+        other = MmapLogCache(self.cache_path)
+        self.cache.put('foo', 'bar', 3600)
+        # Missing keys are looked up in the records written since.
+        self.assertEqual(other.get('foo'), 'bar')
+
+        self.cache.put('foo', 'baz', 3600)
+        self.assertEqual(other.get('foo'), 'bar')
+        other._next_refresh = 0
+        self.assertEqual(other.get('foo'), 'baz')
+
+        other.put('qux', 'quux', 3600)
+        self.assertEqual(self.cache.get('qux'), 'quux')
+        other.close()
+
+    def test_compact(self):
+        for i in range(10):
+            self.cache.put('foo', 'bar%d' % i, 3600)
+        self.cache.put('baz', 'qux', 3600)
+        self.cache.put('expired', 'value', -1)
+        other = MmapLogCache(self.cache_path)
+        buffer_before = self.cache.get_buffer('foo')
+        size = os.path.getsize(self.cache_path)
+
+        self.cache.compact()
+        self.assertLess(os.path.getsize(self.cache_path), size / 4)
+        self.assertEqual(self.cache.compactions, 1)
+        self.assertEqual(self.cache.get('foo'), 'bar9')
+        self.assertEqual(self.cache.get('baz'), 'qux')
+        self.assertEqual(len(self.cache), 2)
+        # Buffers over the previous map stay valid.
+        self.assertEqual(str(buffer_before), 'Sbar9')
+
+        # Other users of the log reopen it.
+        other._next_refresh = 0
+        self.assertEqual(other.get('foo'), 'bar9')
+        self.assertEqual(other._inode, self.cache._inode)
+        other.close()
+
+    def test_background_compaction(self):
+        self.cache.close()
+        self.cache = MmapLogCache(self.cache_path, compact_min_size=0)
+        for i in range(10):
+            self.cache.put('foo', 'bar%d' % i, 3600)
+        compactor = self.cache._compactor
+        if compactor is not None:
+            compactor.join()
+        self.assertGreater(self.cache.compactions, 0)
+        self.assertEqual(self.cache.get('foo'), 'bar9')
+
+    def test_compact_expired(self):
+        self.cache.close()
+        self.cache = MmapLogCache(self.cache_path, compact_min_size=0,
+                                  sweep_interval=0)
+        for i in range(10):
+            self.cache.put('key%d' % i, 'value', 0.01)
+        time.sleep(0.02)
+        compactor = self.cache._compactor
+        if compactor is not None:
+            compactor.join()
+        compactions = self.cache.compactions
+        # Without any manual sweep(), the expired records count as garbage.
+        self.cache.put('foo', 'bar', 3600)
+        compactor = self.cache._compactor
+        if compactor is not None:
+            compactor.join()
+        self.assertGreater(self.cache.compactions, compactions)
+        self.assertEqual(self.cache.get('foo'), 'bar')
+
+    def test_incomplete_record(self):
+        self.cache.put('foo', 'bar', 3600)
+        self.cache.close()
+        with open(self.cache_path, 'ab') as f:
+            f.write('\x00' * 10)
+
+        self.cache = MmapLogCache(self.cache_path)
+        self.assertEqual(self.cache.get('foo'), 'bar')
+        self.cache.put('baz', 'qux', 3600)
+        self.cache.close()
+
+        self.cache = MmapLogCache(self.cache_path)
+        self.assertEqual(self.cache.get('foo'), 'bar')
+        self.assertEqual(self.cache.get('baz'), 'qux')
+
+    def test_clear(self):
+        other = MmapLogCache(self.cache_path)
+        self.cache.put('foo', 'bar', 3600)
+        self.assertEqual(other.get('foo'), 'bar')
+        self.cache.clear()
+        self.assertEqual(self.cache.get('foo'), None)
+        self.assertEqual(os.path.getsize(self.cache_path), len(MAGIC))
+        other._next_refresh = 0
+        self.assertEqual(other.get('foo'), None)
+        other.close()
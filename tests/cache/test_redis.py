@@ -0,0 +1,208 @@
+import fnmatch
+import SocketServer
+import threading
+import time
+
+import unittest2 as unittest
+
+from evelink.cache import redis as evelink_redis
+from evelink.cache.redis import RedisCache
+
+
+class FakeRedisServer(SocketServer.ThreadingTCPServer):
+    """An in-process server speaking enough of the redis protocol for
+    RedisCache, through redis-py."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        SocketServer.ThreadingTCPServer.__init__(self, ('127.0.0.1', 0), FakeRedisHandler)
+        self.data = {}
+        self.commands = []
+        self.lock = threading.Lock()
+        self.password = None
+
+    def get(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expiration = entry
+        if expiration is not None and expiration <= time.time():
+            del self.data[key]
+            return None
+        return value
+
+
+class FakeRedisHandler(SocketServer.StreamRequestHandler):
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        assert line[0] == '*', line
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def reply(self, value):
+        if value is None:
+            return '$-1\r\n'
+        if isinstance(value, int):
+            return ':%d\r\n' % value
+        if isinstance(value, list):
+            return '*%d\r\n%s' % (len(value), ''.join(self.reply(v) for v in value))
+        if isinstance(value, Exception):
+            return '-ERR %s\r\n' % value
+        return '$%d\r\n%s\r\n' % (len(value), value)
+
+    def handle(self):
+        server = self.server
+        authenticated = server.password is None
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            name, args = args[0].upper(), args[1:]
+            with server.lock:
+                server.commands.append(name)
+                if name == 'AUTH':
+                    authenticated = args[0] == server.password
+                    result = 'OK' if authenticated else Exception('invalid password')
+                elif not authenticated:
+                    result = Exception('NOAUTH Authentication required.')
+                else:
+                    result = self.run(name, args)
+            if result == 'OK':
+                self.wfile.write('+OK\r\n')
+            else:
+                self.wfile.write(self.reply(result))
+
+    def run(self, name, args):
+        server = self.server
+        if name == 'SELECT':
+            return 'OK'
+        if name == 'GET':
+            return server.get(args[0])
+        if name == 'MGET':
+            return [server.get(key) for key in args]
+        if name == 'PSETEX':
+            key, milliseconds, value = args
+            server.data[key] = (value, time.time() + int(milliseconds) / 1000.0)
+            return 'OK'
+        if name == 'PTTL':
+            if server.get(args[0]) is None:
+                return -2
+            expiration = server.data[args[0]][1]
+            return int((expiration - time.time()) * 1000)
+        if name == 'DEL':
+            return sum(1 for key in args if server.data.pop(key, None) is not None)
+        if name == 'SCAN':
+            keys = [key for key in list(server.data) if server.get(key) is not None
+                    and fnmatch.fnmatchcase(key, args[2])]
+            return ['0', keys]
+        return Exception("unknown command '%s'" % name)
+
+
+@unittest.skipUnless(evelink_redis._has_redis,
+                     'redis-py is not installed (pip install -r requirements.txt)')
+class RedisCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeRedisServer()
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs={'poll_interval': 0.05})
+        self.thread.daemon = True
+        self.thread.start()
+        self.cache = RedisCache(*self.server.server_address)
+
+    def tearDown(self):
+        self.cache.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_cache(self):
+        self.cache.put('foo', 'bar', 3600)
+        self.cache.put('bar', 1, 3600)
+        self.cache.put('baz', True, 3600)
+        self.assertEqual(self.cache.get('foo'), 'bar')
+        self.assertEqual(self.cache.get('bar'), 1)
+        self.assertEqual(self.cache.get('baz'), True)
+        self.assertEqual(self.cache.get('missing'), None)
+
+    def test_native_ttl(self):
+        self.cache.put('foo', 'bar', 60)
+        value, expiration = self.server.data['evelink:foo']
+        self.assertAlmostEqual(expiration, time.time() + 60, delta=1)
+
+        value, expiration = self.cache.get_with_expiration('foo')
+        self.assertEqual(value, 'bar')
+        self.assertAlmostEqual(expiration, time.time() + 60, delta=1)
+        self.assertEqual(self.cache.get_with_expiration('missing'), (None, None))
+
+    def test_expire(self):
+        self.cache.put('foo', 'bar', 3600)
+        self.cache.put('foo', 'baz', -1)
+        self.assertEqual(self.cache.get('foo'), None)
+        self.assertEqual(self.server.data, {})
+
+    def test_codec(self):
+        payload = '<row id="1" name="foo" />\n' * 100
+        self.cache.put('foo', payload, 3600)
+        self.assertLess(len(self.server.data['evelink:foo'][0]), len(payload) / 10)
+        self.assertEqual(self.cache.get('foo'), payload)
+
+    def test_multi(self):
+        # Connect before recording the commands.
+        self.cache.get('missing')
+        del self.server.commands[:]
+        self.cache.put_multi([('foo', 'bar', 3600), ('bar', 1, 3600),
+                              ('baz', 'qux', -1)])
+        self.assertEqual(
+            self.cache.get_multi(['foo', 'bar', 'baz', 'missing']),
+            {'foo': 'bar', 'bar': 1})
+        self.assertEqual(self.server.commands, ['PSETEX', 'PSETEX', 'DEL', 'MGET'])
+        self.assertEqual(self.cache.get_multi([]), {})
+
+    def test_prefix(self):
+        other = RedisCache(*self.server.server_address, key_prefix='other:')
+        self.cache.put('foo', 'bar', 3600)
+        other.put('foo', 'baz', 3600)
+        self.assertEqual(self.cache.get('foo'), 'bar')
+        self.assertEqual(len(self.cache), 1)
+
+        self.cache.clear()
+        self.assertEqual(self.cache.get('foo'), None)
+        self.assertEqual(other.get('foo'), 'baz')
+        other.close()
+
+    def test_shared(self):
+        other = RedisCache(*self.server.server_address)
+        self.cache.put('foo', 'bar', 3600)
+        self.assertEqual(other.get('foo'), 'bar')
+        other.close()
+
+    def test_auth(self):
+        self.server.password = 'secret'
+        self.assertRaises(evelink_redis.redis.RedisError,
+                          RedisCache(*self.server.server_address).get, 'foo')
+        cache = RedisCache(*self.server.server_address, password='secret')
+        cache.put('foo', 'bar', 3600)
+        self.assertEqual(cache.get('foo'), 'bar')
+        cache.close()
+
+    def test_threads(self):
+        results = []
+
+        def run(i):
+            self.cache.put('key%d' % i, str(i), 3600)
+            results.append(self.cache.get('key%d' % i))
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(sorted(results), ['0', '1', '2', '3'])
@@ -1,9 +1,23 @@
+import multiprocessing
 import os
+import shelve
+import shutil
 import tempfile
+import time
 import unittest2 as unittest
+import zlib
 
+import mock
+
+from evelink.cache import shelf as evelink_shelf
 from evelink.cache.shelf import ShelveCache
 
+def _write_keys(path, worker):
+    cache = ShelveCache(path)
+    for i in range(20):
+        cache.put('%d-%d' % (worker, i), 'x' * i, 3600)
+    cache.close()
+
 class ShelveCacheTestCase(unittest.TestCase):
 
     def setUp(self):
@@ -12,15 +26,15 @@ class ShelveCacheTestCase(unittest.TestCase):
         self.cache = ShelveCache(self.cache_path)
 
     def tearDown(self):
-        self.cache.cache.close()
-        try:
-          os.remove(self.cache_path)
-        except OSError:
-          pass
+        self.cache.close()
+        shutil.rmtree(self.cache_dir)
+
+    def stored(self, key):
+        shelf = shelve.open(self.cache_path, 'r')
         try:
-          os.rmdir(self.cache_dir)
-        except OSError:
-          pass
+            return shelf[key]
+        finally:
+            shelf.close()
 
     def test_cache(self):
         self.cache.put('foo', 'bar', 3600)
@@ -29,3 +43,143 @@ class ShelveCacheTestCase(unittest.TestCase):
     def test_expire(self):
         self.cache.put('baz', 'qux', -1)
         self.assertEqual(self.cache.get('baz'), None)
+
+    def test_get_with_expiration(self):
+        self.cache.close()
+        self.cache = ShelveCache(self.cache_path, writeback=True)
+        self.cache.put('foo', 'bar', 60)
+        # Queued entries have their expiration too.
+        value, expiration = self.cache.get_with_expiration('foo')
+        self.assertEqual(value, 'bar')
+        self.assertAlmostEqual(expiration, time.time() + 60, delta=1)
+
+        self.cache.flush()
+        value, expiration = self.cache.get_with_expiration('foo')
+        self.assertEqual(value, 'bar')
+        self.assertAlmostEqual(expiration, time.time() + 60, delta=1)
+        self.assertEqual(self.cache.get_with_expiration('missing'), (None, None))
+
+    def test_codec(self):
+        payload = '<row id="1" name="foo" />\n' * 100
+        self.cache.put('foo', payload, 3600)
+        value, _, _ = self.stored('foo')
+        self.assertEqual(zlib.decompress(value[1:]), payload)
+        self.assertEqual(self.cache.get('foo'), payload)
+
+    def test_without_codec(self):
+        self.cache.codec = None
+        self.cache.put('foo', 'bar', 3600)
+        self.assertEqual(self.stored('foo')[0], 'bar')
+        self.assertEqual(self.cache.get('foo'), 'bar')
+
+    def test_multi(self):
+        self.cache.put_multi([('foo', 'bar', 3600), ('bar', 1, 3600),
+                              ('baz', 'qux', -1)])
+        self.assertEqual(
+            self.cache.get_multi(['foo', 'bar', 'baz', 'missing']),
+            {'foo': 'bar', 'bar': 1})
+        self.assertEqual(len(self.cache), 2)
+
+    def test_shared(self):
+        other = ShelveCache(self.cache_path)
+        self.cache.put('foo', 'bar', 3600)
+        self.assertEqual(other.get('foo'), 'bar')
+        other.put('foo', 'baz', 3600)
+        other.put('qux', 'quux', 3600)
+        self.assertEqual(self.cache.get('foo'), 'baz')
+        self.assertEqual(self.cache.get('qux'), 'quux')
+        other.close()
+
+    def test_writeback(self):
+        self.cache.close()
+        self.cache = ShelveCache(self.cache_path, writeback=True, batch_size=3)
+        other = ShelveCache(self.cache_path)
+
+        self.cache.put('a', 'x', 3600)
+        self.cache.put('b', 'x', 3600)
+        self.assertEqual(other.get('a'), None)
+        # Queued entries are visible to the cache's readers.
+        self.assertEqual(self.cache.get('a'), 'x')
+        self.cache.put('c', 'x', 3600)
+        self.assertEqual(other.get_multi(['a', 'b', 'c']), {'a': 'x', 'b': 'x', 'c': 'x'})
+
+        self.cache.put('d', 'x', 3600)
+        self.cache.flush()
+        self.assertEqual(other.get('d'), 'x')
+        other.close()
+
+    def test_sweep(self):
+        other = ShelveCache(self.cache_path)
+        payload = os.urandom(4096)
+        for i in range(50):
+            self.cache.put('key%d' % i, payload, -1)
+        self.cache.put('foo', 'bar', 3600)
+        size = sum(os.path.getsize(path) for path in self.cache._files())
+
+        self.assertEqual(self.cache.sweep(), 50)
+        self.assertLess(sum(os.path.getsize(path) for path in self.cache._files()),
+                        size / 10)
+        self.assertEqual(self.cache.get('foo'), 'bar')
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(other.get('foo'), 'bar')
+        other.close()
+
+    def test_clear(self):
+        self.cache.put('foo', 'bar', 3600)
+        self.cache.clear()
+        self.assertEqual(self.cache.get('foo'), None)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_reader_stays_open(self):
+        self.cache.put('foo', 'bar', 3600)
+        with mock.patch.object(evelink_shelf.shelve, 'open',
+                               wraps=shelve.open) as shelve_open:
+            for _ in range(3):
+                self.assertEqual(self.cache.get('foo'), 'bar')
+            self.assertEqual(len(shelve_open.mock_calls), 1)
+
+            # A write, by this cache or another, reopens it.
+            other = ShelveCache(self.cache_path)
+            other.put('foo', 'baz', 3600)
+            other.close()
+            self.assertEqual(self.cache.get('foo'), 'baz')
+
+    def test_without_flock(self):
+        self.cache.close()
+        with mock.patch.object(evelink_shelf, 'fcntl', None):
+            self.cache = ShelveCache(self.cache_path)
+            self.cache.put('foo', 'bar', 3600)
+            self.assertEqual(self.cache.get('foo'), 'bar')
+            self.assertEqual(self.cache.sweep(), 0)
+            self.assertEqual(self.cache.get('foo'), 'bar')
+
+    def test_processes(self):
+        processes = [multiprocessing.Process(target=_write_keys,
+                                             args=(self.cache_path, worker))
+                     for worker in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(30)
+        keys = ['%d-%d' % (worker, i) for worker in range(4) for i in range(20)]
+        self.assertEqual(len(self.cache.get_multi(keys)), 80)
+
+    def test_dbm_modules(self):
+        # The dbm modules which lock their files (e.g. gdbm) must let
+        # several caches share a shelf too.
+        modules = []
+        for name in ('gdbm', 'dbhash', 'dbm', 'dumbdbm'):
+            try:
+                modules.append(__import__(name))
+            except ImportError:
+                pass
+        for module in modules:
+            path = os.path.join(self.cache_dir, module.__name__)
+            module.open(path, 'c').close()
+            first, second = ShelveCache(path), ShelveCache(path)
+            first.put('foo', 'bar', 3600)
+            second.put('baz', 'qux', 3600)
+            self.assertEqual(second.get('foo'), 'bar', module.__name__)
+            self.assertEqual(first.get('baz'), 'qux', module.__name__)
+            first.close()
+            second.close()
@@ -1,7 +1,14 @@
+import functools
+import gc
 import os
+import pickle
+import sqlite3
 import tempfile
+import threading
+import time
 import unittest2 as unittest
 
+from evelink import api
 from evelink.cache.sqlite import SqliteCache
 
 class SqliteCacheTestCase(unittest.TestCase):
@@ -13,10 +20,11 @@ class SqliteCacheTestCase(unittest.TestCase):
 
     def tearDown(self):
         self.cache.connection.close()
-        try:
-          os.remove(self.cache_path)
-        except OSError:
-          pass
+        for suffix in ('', '-wal', '-shm'):
+            try:
+              os.remove(self.cache_path + suffix)
+            except OSError:
+              pass
         try:
           os.rmdir(self.cache_dir)
         except OSError:
@@ -33,3 +41,125 @@ class SqliteCacheTestCase(unittest.TestCase):
     def test_expire(self):
         self.cache.put('baz', 'qux', -1)
         self.assertEqual(self.cache.get('baz'), None)
+
+    def test_raw_strings(self):
+        self.cache.codec = None
+        self.cache.put('foo', '<eveapi/>', 3600)
+        self.cache.put('bar', u'unicode', 3600)
+        self.cache.flush()
+        rows = self.cache.connection.execute(
+            'select "key", pickled from cache order by "key"').fetchall()
+        self.assertEqual(rows, [('bar', 1), ('foo', 0)])
+        self.assertEqual(self.cache.get('foo'), '<eveapi/>')
+        self.assertEqual(self.cache.get('bar'), u'unicode')
+
+    def test_codec(self):
+        payload = '<row id="1" name="foo" />\n' * 100
+        self.cache.put('foo', payload, 3600)
+        self.cache.flush()
+        value, pickled = self.cache.connection.execute(
+            'select value, pickled from cache').fetchone()
+        self.assertEqual(pickled, 2)
+        self.assertLess(len(value), len(payload) / 10)
+        self.assertEqual(self.cache.get('foo'), payload)
+
+    def test_multi(self):
+        self.cache.put_multi([('foo', 'bar', 3600), ('bar', 1, 3600),
+                              ('baz', 'qux', -1)])
+        self.cache.flush()
+        self.cache.put('queued', True, 3600)
+        self.assertEqual(
+            self.cache.get_multi(['foo', 'bar', 'baz', 'queued', 'missing']),
+            {'foo': 'bar', 'bar': 1, 'queued': True})
+
+    def test_committed_writes(self):
+        other = sqlite3.connect(self.cache_path)
+        self.cache.put('a', 'x', 3600)
+        self.assertEqual(other.execute('select count(*) from cache').fetchone()[0], 1)
+        other.close()
+
+    def test_batched_writes(self):
+        self.cache.batch_size = 3
+        other = sqlite3.connect(self.cache_path)
+        count = lambda: other.execute('select count(*) from cache').fetchone()[0]
+
+        self.cache.put('a', 'x', 3600)
+        self.cache.put('b', 'x', 3600)
+        self.assertEqual(count(), 0)
+        # Queued entries are visible to the cache's readers.
+        self.assertEqual(self.cache.get('a'), 'x')
+        self.cache.put('c', 'x', 3600)
+        self.assertEqual(count(), 3)
+        other.close()
+
+    def test_reads_during_flush(self):
+        self.cache.batch_size = 10
+        self.cache.put('a', 'x', 3600)
+        # Hold the write lock of the database, so that the flush waits.
+        other = sqlite3.connect(self.cache_path)
+        other.execute('begin immediate')
+        flusher = threading.Thread(target=self.cache.flush)
+        flusher.start()
+        while not self.cache._flushing:
+            time.sleep(0.001)
+
+        # Readers neither wait for the flush nor miss its batch.
+        start = time.time()
+        self.assertEqual(self.cache.get('a'), 'x')
+        self.assertEqual(self.cache.get_multi(['a', 'b']), {'a': 'x'})
+        self.assertLess(time.time() - start, 1)
+
+        other.rollback()
+        flusher.join(5)
+        self.assertEqual(self.cache._flushing, {})
+        self.assertEqual(other.execute('select count(*) from cache').fetchone()[0], 1)
+        other.close()
+
+    def test_threads(self):
+        self.cache.put('foo', 'bar', 3600)
+        self.cache.flush()
+        results = []
+
+        def run(i):
+            self.cache.put('key%d' % i, str(i), 3600)
+            results.append(self.cache.get('foo'))
+            self.cache.flush()
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(results, ['bar'] * 4)
+        self.assertEqual(len(self.cache), 5)
+        # The connections of the threads were closed when they exited.
+        gc.collect()
+        self.assertEqual(len(self.cache._connections), 1)
+
+    def test_thread_pools(self):
+        for _ in range(10):
+            api.call_many([functools.partial(self.cache.get, 'key%d' % i)
+                           for i in range(8)], max_workers=8)
+        gc.collect()
+        self.assertEqual(len(self.cache._connections), 1)
+
+    def test_sweep(self):
+        self.cache.put('foo', 'bar', -1)
+        self.cache.put('baz', 'qux', 3600)
+        self.cache.flush()
+        self.assertEqual(self.cache.sweep(), 1)
+        self.assertEqual(len(self.cache), 1)
+
+    def test_legacy_table(self):
+        self.cache.close()
+        os.remove(self.cache_path)
+        connection = sqlite3.connect(self.cache_path)
+        connection.execute('create table cache ("key" text primary key on conflict replace,'
+                           'value blob, expiration integer)')
+        connection.execute('insert into cache values (?, ?, ?)',
+                           ('foo', sqlite3.Binary(pickle.dumps('bar', 2)), 2 ** 40))
+        connection.commit()
+        connection.close()
+
+        self.cache = SqliteCache(self.cache_path)
+        self.assertEqual(self.cache.get('foo'), 'bar')
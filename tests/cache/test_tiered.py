@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import time
+
+import mock
+import unittest2 as unittest
+
+from evelink import api
+from evelink.cache.shelf import ShelveCache
+from evelink.cache.sqlite import SqliteCache
+from evelink.cache.tiered import TieredCache
+
+class TieredCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.l1 = api.APICache()
+        self.l2 = SqliteCache(os.path.join(self.cache_dir, 'sqlite'))
+        self.cache = TieredCache(self.l1, self.l2)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.cache_dir)
+
+    def test_put(self):
+        self.cache.put('foo', 'bar', 3600)
+        self.assertEqual(self.l1.get('foo'), 'bar')
+        self.assertEqual(self.l2.get('foo'), 'bar')
+        self.assertEqual(self.cache.get('foo'), 'bar')
+
+    def test_shelve_promotion(self):
+        l2 = ShelveCache(os.path.join(self.cache_dir, 'shelf'), writeback=True)
+        cache = TieredCache(api.APICache(), l2)
+        l2.put('foo', 'bar', 3600)
+        self.assertEqual(cache.get('foo'), 'bar')
+        self.assertEqual(cache.promotions, 1)
+        cache.close()
+
+    def test_l1_hit(self):
+        self.cache.put('foo', 'bar', 3600)
+        with mock.patch.object(self.l2, 'get_with_expiration') as l2_get:
+            self.assertEqual(self.cache.get('foo'), 'bar')
+            self.assertFalse(l2_get.called)
+
+    def test_promotion(self):
+        self.l2.put('foo', 'bar', 3600)
+        self.assertEqual(self.cache.get('foo'), 'bar')
+        self.assertEqual(self.cache.promotions, 1)
+        value, expiration = self.l1.get_with_expiration('foo')
+        self.assertEqual(value, 'bar')
+        # The promoted entry expires with the second level's.
+        self.assertAlmostEqual(expiration, self.l2.get_with_expiration('foo')[1],
+                               delta=1)
+
+    def test_multi(self):
+        header = api.CacheHeader(time.time(), 0, 600, 0, None, None)
+        response = api.pack_cache_entry(header, '<eveapi/>')
+        self.l2.put_multi([('foo', response, 3600), ('bar', 'baz', 3600)])
+        self.l1.put('qux', 'quux', 3600)
+
+        self.assertEqual(self.cache.get_multi(['foo', 'bar', 'qux', 'missing']),
+                         {'foo': response, 'bar': 'baz', 'qux': 'quux'})
+        # Responses are promoted until they expire.
+        self.assertEqual(self.cache.promotions, 1)
+        self.assertAlmostEqual(self.l1.get_with_expiration('foo')[1],
+                               time.time() + 600, delta=1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (3, 1))
+
+        self.cache.put_multi([('a', 'b', 60)])
+        self.assertEqual(self.l1.get('a'), 'b')
+        self.assertEqual(self.l2.get('a'), 'b')
+
+    def test_miss(self):
+        self.assertEqual(self.cache.get('foo'), None)
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 1))
+
+    def test_expire(self):
+        self.cache.put('foo', 'bar', -1)
+        self.assertEqual(self.cache.get('foo'), None)
+
+    def test_max_l1_duration(self):
+        cache = TieredCache(self.l1, self.l2, max_l1_duration=60)
+        cache.put('foo', 'bar', 3600)
+        self.assertAlmostEqual(self.l1.get_with_expiration('foo')[1],
+                               time.time() + 60, delta=1)
+
+    def test_api(self):
+        self.assertIsInstance(self.cache, api.APICache)
+        eve_api = api.API(cache=self.cache)
+        self.assertIs(eve_api.cache, self.cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import threading
+import time
+
+import mock
+import unittest2 as unittest
+
+from evelink import api
+from evelink.cache.writebehind import WriteBehindCache
+
+class SlowCache(api.APICache):
+    """An APICache whose puts wait until released."""
+
+    def __init__(self):
+        super(SlowCache, self).__init__()
+        self.release = threading.Event()
+
+    def put(self, key, value, duration):
+        self.release.wait(5)
+        super(SlowCache, self).put(key, value, duration)
+
+
+class WriteBehindCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.wrapped = SlowCache()
+        self.cache = WriteBehindCache(self.wrapped, max_pending=2)
+
+    def tearDown(self):
+        self.wrapped.release.set()
+        self.cache.close()
+
+    def test_put_returns_before_write(self):
+        self.cache.put('foo', 'bar', 3600)
+        # Readable right away, while the write is still in progress.
+        self.assertEqual(self.cache.get('foo'), 'bar')
+        self.assertEqual(self.wrapped.get('foo'), None)
+
+        self.wrapped.release.set()
+        self.assertTrue(self.cache.flush(5))
+        self.assertEqual(self.wrapped.get('foo'), 'bar')
+        self.assertEqual(self.cache.writes, 1)
+
+    def test_expiration(self):
+        self.cache.put('foo', 'bar', -1)
+        self.assertEqual(self.cache.get('foo'), None)
+        self.cache.put('baz', 'qux', 60)
+        value, expiration = self.cache.get_with_expiration('baz')
+        self.assertAlmostEqual(expiration, time.time() + 60, delta=1)
+
+    def test_flush_timeout(self):
+        self.cache.put('foo', 'bar', 3600)
+        self.assertFalse(self.cache.flush(0.01))
+
+    def test_bounded_queue(self):
+        self.cache.batch_size = 1
+        self.cache.put('a', 'x', 3600)
+        deadline = time.time() + 5
+        while not self.cache._writing and time.time() < deadline:
+            time.sleep(0.001)
+        # The flusher holds 'a'; 'b' and 'c' fill the queue.
+        self.cache.put('b', 'x', 3600)
+        self.cache.put('c', 'x', 3600)
+        blocked = threading.Thread(target=self.cache.put, args=('d', 'x', 3600))
+        blocked.start()
+        blocked.join(0.05)
+        self.assertTrue(blocked.is_alive())
+
+        self.wrapped.release.set()
+        blocked.join(5)
+        self.assertFalse(blocked.is_alive())
+        self.cache.flush(5)
+        self.assertEqual([self.wrapped.get(k) for k in 'abcd'], ['x'] * 4)
+
+    def test_close(self):
+        self.wrapped.release.set()
+        self.cache.put('foo', 'bar', 3600)
+        self.cache.close()
+        self.assertEqual(self.wrapped.get('foo'), 'bar')
+        self.assertRaises(ValueError, self.cache.put, 'foo', 'bar', 3600)
+
+    def test_failed_write(self):
+        self.wrapped.release.set()
+        with mock.patch.object(self.wrapped, 'put', side_effect=IOError('full')):
+            self.cache.put('foo', 'bar', 3600)
+            self.cache.flush(5)
+        self.assertEqual(self.cache.errors, 1)
+        self.assertEqual(self.cache.get('foo'), None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import mock
+import unittest2 as unittest
+
+from tests.utils import make_api_result
+
+from evelink.parsing import columns
+from evelink.parsing import wallet_journal
+from evelink.parsing import wallet_transactions
+from evelink.parsing.formats import COLUMNS
+
+
+def flatten(entry, prefix=''):
+    """Flatten nested dicts into dotted keys, like the column names."""
+    result = {}
+    for key, value in entry.iteritems():
+        if isinstance(value, dict):
+            result.update(flatten(value, prefix + key + '.'))
+        else:
+            result[prefix + key] = value
+    return result
+
+
+class ColumnsTestCase(unittest.TestCase):
+
+    def test_wallet_journal(self):
+        api_result, _, _ = make_api_result("char/wallet_journal.xml")
+
+        result = wallet_journal.parse_wallet_journal(api_result, COLUMNS)
+        expected = wallet_journal.parse_wallet_journal(api_result)
+
+        self.assertEqual(result.keys(), sorted(flatten(expected[0])))
+        self.assertEqual(list(result['id']), [e['id'] for e in expected])
+        self.assertEqual(result.text('party_1.name'),
+                         [e['party_1']['name'] for e in expected])
+        self.assertEqual(list(result['amount']), [e['amount'] for e in expected])
+        self.assertEqual(list(result['timestamp']), [e['timestamp'] for e in expected])
+
+    def test_wallet_transactions(self):
+        api_result, _, _ = make_api_result("char/wallet_transactions.xml")
+
+        result = wallet_transactions.parse_wallet_transactions(api_result, COLUMNS)
+        expected = wallet_transactions.parse_wallet_transactions(api_result)
+
+        self.assertEqual(list(result['id']), [e['id'] for e in expected])
+        self.assertEqual(result.text('for'), [e['for'] for e in expected])
+        self.assertEqual(list(result['price']), [e['price'] for e in expected])
+        # Absent characters are stored as 0 / ''.
+        self.assertEqual(list(result['char.id']),
+                         [e['char']['id'] if 'char' in e else 0 for e in expected])
+        self.assertEqual(result.text('char.name'),
+                         [e['char']['name'] if 'char' in e else '' for e in expected])
+        # Strings are interned once.
+        self.assertEqual(len(result.strings), len(set(result.strings)))
+
+    def test_unsupported(self):
+        api_result, _, _ = make_api_result("char/wallet_journal.xml")
+        row = api_result.find('rowset/row')
+        self.assertRaises(ValueError,
+            wallet_journal.parse_wallet_journal_entry, row, COLUMNS)
+        self.assertRaises(ValueError, columns.Columns.text,
+            wallet_journal.parse_wallet_journal(api_result, COLUMNS), 'id')
+
+    @mock.patch('evelink.parsing.columns._has_numpy', False)
+    def test_array_fallback(self):
+        result = columns.Columns.build(['id', 'name'], [columns.INT, columns.STR],
+                                       [[3, 1, 2], [0, 1, 0]], {'a': 0, 'b': 1})
+        self.assertEqual(result['id'].typecode, columns._TYPECODES[columns.INT])
+        result.sort_by('id')
+        self.assertEqual(list(result['id']), [1, 2, 3])
+        self.assertEqual(result.text('name'), ['b', 'a', 'a'])
+        self.assertEqual(len(result), 3)
+
+    def test_builder(self):
+        builder = columns.ColumnsBuilder([
+            ('id', columns.INT),
+            ('char.id', columns.INT),
+            ('char.name', columns.STR),
+        ])
+        builder.append({'id': 1, 'char': {'id': 7, 'name': 'Foo'}})
+        builder.append({'id': 2})
+        builder.append({'id': 3, 'char': {'id': 8, 'name': 'Foo'}})
+        result = builder.build()
+        self.assertEqual(result.keys(), ['char.id', 'char.name', 'id'])
+        self.assertEqual(list(result['char.id']), [7, 0, 8])
+        self.assertEqual(result.text('char.name'), ['Foo', '', 'Foo'])
+        self.assertEqual(sorted(result.strings), ['', 'Foo'])
+
+    @unittest.skipIf(not columns._has_numpy, 'numpy not available')
+    def test_numpy(self):
+        result = columns.Columns.build(['id', 'price'], [columns.INT, columns.FLOAT],
+                                       [[3, 1, 2], [0.5, 1.5, 2.5]], {})
+        self.assertEqual(result['id'].dtype, columns.numpy.int64)
+        result.sort_by('id')
+        self.assertEqual(list(result['price']), [1.5, 2.5, 0.5])
+        self.assertEqual(result['price'].sum(), 4.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
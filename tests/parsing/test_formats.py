@@ -0,0 +1,73 @@
+import pickle
+
+import unittest2 as unittest
+
+from evelink.parsing import formats
+
+
+class RecordsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.record_type = formats.record_type('Test', [
+            'id', 'for', 'owner', 'char', 'contents',
+        ], optional=['char', 'contents'], nested={
+            'owner': ['id', 'name'],
+            'char': ['id'],
+        })
+        self.entries = [
+            {'id': 1, 'for': 'corp', 'owner': {'id': 7, 'name': 'Foo'},
+             'char': {'id': 3}},
+            {'id': 2, 'for': 'personal', 'owner': {'id': 8, 'name': 'Bar'}},
+        ]
+        self.convert = formats.converter(formats.RECORDS, self.record_type)
+
+    def test_from_dict(self):
+        record = self.convert(self.entries[0])
+        self.assertTrue(isinstance(record, formats.Record))
+        self.assertEqual(type(record).__name__, 'Test')
+        self.assertEqual(type(record.owner).__name__, 'TestOwner')
+        self.assertEqual(record.id, 1)
+        self.assertEqual(record['for'], 'corp')
+        self.assertEqual(record.owner.name, 'Foo')
+        self.assertEqual(record['owner']['id'], 7)
+        self.assertEqual(record.char.id, 3)
+        self.assertEqual(record.contents, None)
+        self.assertEqual(self.convert(self.entries[1]).char, None)
+        self.assertRaises(KeyError, lambda: record['missing'])
+        self.assertFalse(hasattr(record, '__dict__'))
+
+    def test_asdict(self):
+        for entry in self.entries:
+            self.assertEqual(self.convert(entry)._asdict(), entry)
+
+    def test_setitem(self):
+        record = self.convert(self.entries[0])
+        record['contents'] = []
+        self.assertEqual(record.contents, [])
+        self.assertEqual(record._asdict()['contents'], [])
+
+    def test_equality_and_pickle(self):
+        first, second = [self.convert(e) for e in self.entries]
+        self.assertEqual(first, self.convert(self.entries[0]))
+        self.assertNotEqual(first, second)
+        for protocol in (0, 2):
+            self.assertEqual(pickle.loads(pickle.dumps(first, protocol)), first)
+
+    def test_record_types_shared(self):
+        other = formats.record_type('Test', [
+            'contents', 'char', 'owner', 'for', 'id',
+        ], optional=['contents', 'char'], nested={
+            'owner': ['id', 'name'],
+            'char': ['id'],
+        })
+        self.assertTrue(other is self.record_type)
+
+    def test_converter(self):
+        entry = self.entries[0]
+        self.assertTrue(formats.converter(formats.DICTS, self.record_type)(entry) is entry)
+        self.assertRaises(ValueError, formats.converter, formats.COLUMNS, self.record_type)
+        self.assertRaises(ValueError, formats.converter, 'xml', self.record_type)
+
+
+if __name__ == "__main__":
+    unittest.main()
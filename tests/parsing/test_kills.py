@@ -102,3 +102,20 @@ class KillsTestCase(unittest.TestCase):
                     'name': 'Pilot 333',
                     'ship_type_id': 670}}
             })
+
+    def test_parse_kills_records(self):
+        api_result, _, _ = make_api_result("char/kills.xml")
+
+        expected = evelink_k.parse_kills(api_result)
+        result = evelink_k.parse_kills(api_result, 'records')
+
+        self.assertEqual(sorted(result), sorted(expected))
+        for kill_id, kill in result.iteritems():
+            self.assertEqual(kill.victim._asdict(), expected[kill_id]['victim'])
+            self.assertEqual(
+                dict((k, v._asdict()) for k, v in kill.attackers.iteritems()),
+                expected[kill_id]['attackers'])
+            self.assertEqual([i._asdict() for i in kill.items],
+                             expected[kill_id]['items'])
+            self.assertEqual(kill.system_id, expected[kill_id]['system_id'])
+            self.assertEqual(kill['time'], expected[kill_id]['time'])
@@ -1,9 +1,18 @@
+import calendar
+import hashlib
 from StringIO import StringIO
+import threading
+import time
 import unittest2 as unittest
+import urllib2
 
 import mock
 
 import evelink.api as evelink_api
+from evelink.parsing.formats import COLUMNS, DICTS, RECORDS
+from evelink.parsing.wallet_journal import parse_wallet_journal
+from evelink.transport import FakeTransport
+from tests.utils import make_api_result
 
 class HelperTestCase(unittest.TestCase):
 
@@ -13,6 +22,39 @@ class HelperTestCase(unittest.TestCase):
             1339502673,
         )
 
+    def test_parse_ts_matches_strptime(self):
+        for value in [
+                '1970-01-01 00:00:01',
+                '2000-02-29 23:59:59',
+                '2100-03-01 00:00:00',
+                '2012-12-31 12:00:60',
+                '1969-12-31 23:59:59',
+            ]:
+            self.assertEqual(evelink_api._parse_ts(value),
+                calendar.timegm(time.strptime(value, "%Y-%m-%d %H:%M:%S")),
+                value)
+
+    def test_parse_ts_none(self):
+        self.assertEqual(evelink_api.parse_ts(''), None)
+        self.assertEqual(evelink_api.parse_ts('0001-01-01 00:00:00'), None)
+        self.assertEqual(evelink_api.parse_ts('1970-01-01 00:00:00'), None)
+
+    def test_parse_ts_invalid(self):
+        for value in [
+                '2012-06-12',
+                '2012-06-12T12:04:33',
+                '2012-13-12 12:04:33',
+                '2013-02-29 12:04:33',
+                '2012-+6-12 12:04:33',
+                '0000-06-12 12:04:33',
+            ]:
+            self.assertRaises(ValueError, evelink_api.parse_ts, value)
+
+    def test_parse_ts_memo(self):
+        evelink_api._ts_memo.clear()
+        evelink_api.parse_ts("2012-06-12 12:04:33")
+        self.assertEqual(evelink_api._ts_memo, {"2012-06-12 12:04:33": 1339502673})
+
 
 class CacheTestCase(unittest.TestCase):
 
@@ -27,6 +69,57 @@ class CacheTestCase(unittest.TestCase):
         self.cache.put('baz', 'qux', -1)
         self.assertEqual(self.cache.get('baz'), None)
 
+    def test_lru_eviction(self):
+        cache = evelink_api.APICache(max_entries=2)
+        cache.put('a', 'x', 60)
+        cache.put('b', 'x', 60)
+        cache.get('a')
+        cache.put('c', 'x', 60)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), 'x')
+        self.assertEqual(cache.get('c'), 'x')
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (3, 1, 1))
+
+    def test_size_eviction(self):
+        cache = evelink_api.APICache(max_entries=None, max_size=10)
+        cache.put('a', 'x' * 4, 60)
+        cache.put('b', 'x' * 4, 60)
+        cache.put('c', 'x' * 4, 60)
+        self.assertEqual(list(cache.cache), ['b', 'c'])
+        self.assertEqual(cache.size, 8)
+        # Values larger than the cache are not stored.
+        cache.put('b', 'x' * 11, 60)
+        self.assertEqual(list(cache.cache), ['c'])
+        self.assertEqual(cache.size, 4)
+
+    def test_sweep(self):
+        cache = evelink_api.APICache()
+        cache.put('a', 'x', -1)
+        cache.put('b', 'x', 60)
+        self.assertEqual(cache.sweep(), 1)
+        self.assertEqual(list(cache.cache), ['b'])
+
+        # Sweeps also run from put(), every sweep_interval seconds.
+        cache.put('c', 'x', -1)
+        cache.sweep_interval = 0
+        cache._next_sweep = 0
+        cache.put('d', 'x', 60)
+        self.assertEqual(list(cache.cache), ['b', 'd'])
+        self.assertEqual((cache.size, cache.expirations), (2, 2))
+
+    def test_multi(self):
+        self.cache.put_multi([('foo', 'bar', 3600), ('baz', 'qux', -1)])
+        self.assertEqual(self.cache.get_multi(['foo', 'baz', 'quux']),
+                         {'foo': 'bar'})
+
+    def test_empty_cache_is_true(self):
+        class CustomCache(evelink_api.APICache):
+            def __len__(self):
+                return 0
+        for cache in (self.cache, CustomCache()):
+            self.assertTrue(cache)
+            self.assertIs(evelink_api.API(cache=cache).cache, cache)
+
     def test_context_with_empty_cache(self):
         with self.cache.cache_for('foo') as foo_cache:
             self.assertEqual(None, foo_cache.value)
@@ -90,6 +183,153 @@ class CacheTestCase(unittest.TestCase):
         self.assertEqual(None, self.cache.get('foo'))
 
 
+class CacheHeaderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.header = evelink_api.CacheHeader(
+            stored=1000, current_time=500, cached_until=560, size=7,
+            error_code=None, error_message=None)
+
+    def test_pack_unpack(self):
+        value = evelink_api.pack_cache_entry(self.header, '<a>\n</a>')
+        self.assertEqual(evelink_api.read_cache_header(value), self.header)
+        self.assertEqual(evelink_api.unpack_cache_entry(value),
+            (self.header, '<a>\n</a>'))
+
+    def test_unpack_legacy(self):
+        self.assertEqual(evelink_api.read_cache_header('<a/>'), None)
+        self.assertEqual(evelink_api.unpack_cache_entry('<a/>'), (None, '<a/>'))
+
+    def test_freshness(self):
+        self.assertEqual(self.header.expires, 1060)
+        self.assertTrue(self.header.is_fresh(now=1059))
+        self.assertFalse(self.header.is_fresh(now=1060))
+
+    def test_api_error(self):
+        self.assertEqual(self.header.api_error(), None)
+        error = self.header._replace(error_code='123', error_message='foo')
+        self.assertEqual(repr(error.api_error()),
+            repr(evelink_api.APIError('123', 'foo', 500, 560)))
+
+
+class ResultCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = evelink_api.ResultCache(max_entries=2)
+
+    def test_cache(self):
+        result = evelink_api.APIResult({'foo': 'bar'}, 0, 60)
+        self.cache.put('foo', result)
+        self.assertTrue(self.cache.get('foo') is result)
+        self.assertEqual(self.cache.get('bar'), None)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_expire(self):
+        self.cache.put('foo', evelink_api.APIResult({}, 60, 0))
+        self.assertEqual(self.cache.get('foo'), None)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_evict_lru(self):
+        self.cache.put('a', evelink_api.APIResult(1, 0, 60))
+        self.cache.put('b', evelink_api.APIResult(2, 0, 60))
+        self.cache.get('a')
+        self.cache.put('c', evelink_api.APIResult(3, 0, 60))
+
+        self.assertEqual(self.cache.get('b'), None)
+        self.assertEqual(self.cache.get('a').result, 1)
+        self.assertEqual(self.cache.get('c').result, 3)
+
+    def test_evict_size(self):
+        self.cache.max_entries = 10
+        self.cache.max_size = 2 * evelink_api._approx_size(['x' * 100])
+        self.cache.put('a', evelink_api.APIResult(['x' * 100], 0, 60))
+        self.cache.put('b', evelink_api.APIResult(['y' * 100], 0, 60))
+        self.cache.put('c', evelink_api.APIResult(['z' * 100], 0, 60))
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.get('a'), None)
+        self.assertTrue(self.cache.size <= self.cache.max_size)
+
+        # Results too big for the cache are not stored at all.
+        self.cache.put('d', evelink_api.APIResult(['x' * 1000], 0, 60))
+        self.assertEqual(self.cache.get('d'), None)
+        self.assertEqual(len(self.cache), 2)
+
+    def test_approx_size_formats(self):
+        api_result, _, _ = make_api_result("char/wallet_journal.xml")
+        dicts = parse_wallet_journal(api_result, DICTS)
+        records = parse_wallet_journal(api_result, RECORDS)
+        columns = parse_wallet_journal(api_result, COLUMNS)
+        # Each format counts its fields, not just its outer container.
+        dicts_size = evelink_api._approx_size(dicts)
+        for result in (records, columns):
+            size = evelink_api._approx_size(result)
+            self.assertGreater(size, dicts_size / 5)
+            self.assertLess(size, dicts_size)
+
+        fewer = parse_wallet_journal(api_result, COLUMNS)
+        fewer.columns = dict((name, values[:1])
+                             for name, values in fewer.columns.iteritems())
+        self.assertLess(evelink_api._approx_size(fewer),
+                        evelink_api._approx_size(columns))
+
+
+class CacheResultTestCase(unittest.TestCase):
+
+    class Wrapper(object):
+
+        def __init__(self, api):
+            self.api = api
+            self.calls = 0
+
+        @evelink_api.cache_result
+        def method(self, arg=None, api_result=None):
+            self.calls += 1
+            return api_result or evelink_api.APIResult([arg], 0, 60)
+
+    def setUp(self):
+        self.api = evelink_api.API(result_cache=evelink_api.ResultCache())
+        self.wrapper = self.Wrapper(self.api)
+
+    def test_cached(self):
+        result = self.wrapper.method(1)
+        self.assertTrue(self.wrapper.method(1) is result)
+        self.assertEqual(self.wrapper.calls, 1)
+
+        self.wrapper.method(2)
+        self.wrapper.method(arg=1)
+        self.assertEqual(self.wrapper.calls, 3)
+
+    def test_not_cached(self):
+        self.wrapper.method([1])
+        self.wrapper.method([1])
+        self.wrapper.method(api_result=evelink_api.APIResult(1, 0, 60))
+        self.wrapper.method(api_result=evelink_api.APIResult(1, 0, 60))
+        self.assertEqual(self.wrapper.calls, 4)
+
+    def test_positional_api_result(self):
+        given = evelink_api.APIResult(1, 0, 60)
+        self.assertTrue(self.wrapper.method(1, given) is given)
+        self.assertTrue(self.wrapper.method(1, given) is given)
+        self.assertEqual(self.wrapper.calls, 2)
+        self.assertEqual(len(self.api.result_cache), 0)
+
+    @mock.patch('time.time')
+    def test_hit_records_expiry(self, mock_time):
+        mock_time.return_value = 1000
+        self.wrapper.method(1)
+        mock_time.return_value = 1030
+        evelink_api.reset_response_expiry()
+        self.wrapper.method(1)
+        self.assertEqual(evelink_api.last_response_expiry(), 1060)
+
+    def test_no_result_cache(self):
+        self.api.result_cache = None
+        self.wrapper.method(1)
+        self.wrapper.method(1)
+        self.assertEqual(self.wrapper.calls, 2)
+
+
 class APIRequestTest(unittest.TestCase):
 
     def setUp(self):
@@ -169,7 +409,6 @@ class APIRequestTest(unittest.TestCase):
         self.assertNotEqual(req1, req2)
         self.assertNotEqual(str(req1), str(req2))
 
-    @unittest.skip("base url not part of the cache key hash")
     def test_variance_on_base_url(self):
         req1 = evelink_api.APIRequest(self.api, 'foo/bar', {})
         self.api.base_url = 'api.testeveonline.com'
@@ -181,9 +420,22 @@ class APIRequestTest(unittest.TestCase):
     def test_str(self):
         req = evelink_api.APIRequest(self.api, 'foo/bar', {'a': 1, 'b': 2})
         self.assertEqual(
-            '1-%s' % hash(('foo/bar', (('a', '1'), ('b', '2')),)),
+            '1:api.eveonline.com:foo/bar:-:%s' % hashlib.sha1('a=1&b=2').hexdigest(),
+            str(req)
+        )
+
+    def test_str_with_api_key(self):
+        self.api.api_key = (123, 'secret')
+        req = evelink_api.APIRequest(self.api, 'foo/bar', {'a': 1})
+        self.assertEqual(
+            '1:api.eveonline.com:foo/bar:123:%s' %
+                hashlib.sha1('a=1&keyID=123&vCode=secret').hexdigest(),
             str(req)
         )
+        self.assertNotIn('secret', str(req))
+
+        self.api.api_key = (123, 'other')
+        self.assertNotEqual(str(req), str(evelink_api.APIRequest(self.api, 'foo/bar', {'a': 1})))
 
 
 
@@ -317,6 +569,434 @@ class APITestCase(unittest.TestCase):
                 'cached_until': 1258571131,
             })
 
+    @mock.patch('urllib2.urlopen')
+    def test_get_many(self, mock_urlopen):
+        responses = {
+            'https://api.eveonline.com/foo/Bar.xml.aspx': self.test_xml,
+            'https://api.eveonline.com/eve/Error.xml.aspx': self.error_xml,
+        }
+        mock_urlopen.side_effect = lambda url, *args: StringIO(responses[url])
+
+        results = self.api.get_many([
+            ('foo/Bar', {'a': [1, 2, 3]}),
+            ('eve/Error', None),
+            ('foo/Bar', {'a': [4, 5, 6]}),
+        ], max_workers=2)
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(len(mock_urlopen.mock_calls), 3)
+
+        result, current, expiry = results[0]
+        rows = result.find('rowset').findall('row')
+        self.assertEqual(rows[0].attrib['foo'], 'bar')
+        self.assertEqual(current, 1255885531)
+        self.assertEqual(expiry, 1258563931)
+
+        self.assertTrue(isinstance(results[1], evelink_api.APIError))
+        self.assertEqual(results[1].code, '123')
+        self.assertEqual(results[2].expires, 1258563931)
+
+    @mock.patch('urllib2.urlopen')
+    def test_get_many_batches_cache_calls(self, mock_urlopen):
+        mock_urlopen.side_effect = lambda url, *args: StringIO(self.test_xml)
+        self.cache.get_multi = mock.Mock(wraps=self.cache.get_multi)
+        self.cache.put_multi = mock.Mock(wraps=self.cache.put_multi)
+        self.api.get_many([('foo/Bar', {'a': 1}), ('foo/Bar', {'a': 2})])
+
+        self.assertEqual(len(self.cache.get_multi.mock_calls), 1)
+        self.assertEqual(len(self.cache.put_multi.mock_calls), 1)
+        (entries,), _ = self.cache.put_multi.call_args
+        self.assertEqual(len(entries), 2)
+
+    @mock.patch('urllib2.urlopen')
+    def test_get_many_cached(self, mock_urlopen):
+        responses = {
+            'https://api.eveonline.com/foo/Bar.xml.aspx': self.test_xml,
+            'https://api.eveonline.com/eve/Error.xml.aspx': self.error_xml,
+        }
+        mock_urlopen.side_effect = lambda url, *args: StringIO(responses[url])
+        self.api.get('foo/Bar', {'a': [1, 2, 3]})
+        self.api.get_many([('eve/Error', None)])
+
+        mock_urlopen.reset_mock()
+        results = self.api.get_many([
+            ('eve/Error', None),
+            ('foo/Bar', {'a': [1, 2, 3]}),
+        ])
+
+        # Both the result and the API error were served from the cache.
+        self.assertFalse(mock_urlopen.called)
+        self.assertTrue(isinstance(results[0], evelink_api.APIError))
+        self.assertEqual(results[1].timestamp, 1255885531)
+
+    @mock.patch('urllib2.urlopen')
+    def test_get_many_network_error(self, mock_urlopen):
+        error = urllib2.URLError('down')
+        mock_urlopen.side_effect = error
+
+        results = self.api.get_many([('foo/Bar', None)])
+
+        self.assertEqual(results, [error])
+        self.assertEqual(self.cache.cache, {})
+
+    @mock.patch('urllib2.urlopen')
+    def test_cache_header(self, mock_urlopen):
+        mock_urlopen.return_value = StringIO(self.test_xml)
+        self.api.get('foo/Bar')
+
+        value, = [v for v, _ in self.cache.cache.values()]
+        header, payload = evelink_api.unpack_cache_entry(value)
+        self.assertEqual(payload, self.test_xml)
+        self.assertEqual(header.current_time, 1255885531)
+        self.assertEqual(header.cached_until, 1258563931)
+        self.assertEqual(header.size, len(self.test_xml))
+        self.assertEqual(header.error_code, None)
+
+    @mock.patch('urllib2.urlopen')
+    def test_cached_error_replay(self, mock_urlopen):
+        mock_urlopen.return_value = StringIO(self.error_xml)
+        self.assertRaises(evelink_api.APIError, self.api.get, 'eve/Error')
+
+        value, = [v for v, _ in self.cache.cache.values()]
+        self.assertEqual(evelink_api.read_cache_header(value).error_code, '123')
+
+        self.api._set_last_timestamps()
+        with mock.patch.object(self.api, 'process_response') as process:
+            with self.assertRaises(evelink_api.APIError) as cm:
+                self.api.get('eve/Error')
+            self.assertFalse(process.called)
+
+        self.assertEqual(cm.exception.code, '123')
+        self.assertEqual(cm.exception.message, 'Test error message.')
+        self.assertEqual(self.api.last_timestamps, {
+            'current_time': 1255885531,
+            'cached_until': 1258571131,
+        })
+
+    @mock.patch('urllib2.urlopen')
+    def test_iter_rows(self, mock_urlopen):
+        mock_urlopen.return_value = StringIO(self.test_xml)
+
+        result, current, expiry = self.api.iter_rows('foo/Bar')
+
+        self.assertEqual(current, 1255885531)
+        self.assertEqual(expiry, 1258563931)
+        self.assertEqual([row.attrib['foo'] for row in result], ['bar', 'baz'])
+
+        # The response was cached, with its header.
+        mock_urlopen.reset_mock()
+        result, _, _ = self.api.iter_rows('foo/Bar')
+        self.assertEqual(len(list(result)), 2)
+        self.assertFalse(mock_urlopen.called)
+        result, _, _ = self.api.get('foo/Bar')
+        self.assertEqual(len(result.findall('rowset/row')), 2)
+
+    @mock.patch('urllib2.urlopen')
+    def test_iter_rows_with_error(self, mock_urlopen):
+        mock_urlopen.return_value = StringIO(self.error_xml)
+
+        self.assertRaises(evelink_api.APIError, self.api.iter_rows, 'eve/Error')
+        self.assertEqual(self.api.last_timestamps, {
+            'current_time': 1255885531,
+            'cached_until': 1258571131,
+        })
+        self.assertRaises(evelink_api.APIError, self.api.get, 'eve/Error')
+        self.assertEqual(len(mock_urlopen.mock_calls), 1)
+
+
+class IterResultRowsTestCase(unittest.TestCase):
+
+    def test_nested_rowsets(self):
+        xml = """
+            <eveapi version="2">
+                <currentTime>2009-10-18 17:05:31</currentTime>
+                <result>
+                    <rowset name="assets">
+                        <row itemID="1">
+                            <rowset name="contents">
+                                <row itemID="2" />
+                            </rowset>
+                        </row>
+                        <row itemID="3" />
+                    </rowset>
+                    <rowset name="other">
+                        <row itemID="4" />
+                    </rowset>
+                </result>
+                <cachedUntil>2009-11-18 17:05:31</cachedUntil>
+            </eveapi>""".strip()
+
+        rows = []
+        for row in evelink_api.iter_result_rows(xml):
+            rows.append(row)
+            self.assertEqual(row.attrib['itemID'], str(len(rows) * 2 - 1))
+            if row.attrib['itemID'] == '1':
+                self.assertEqual(row.find('rowset/row').attrib['itemID'], '2')
+
+        # Rows are cleared once the iteration moves on.
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0].attrib, {})
+        self.assertEqual(len(rows[0]), 0)
+
+    def test_scan_response_header(self):
+        xml = """
+            <eveapi version="2">
+                <currentTime>2009-10-18 17:05:31</currentTime>
+                <error code="203">Authentication &amp; failure.</error>
+                <cachedUntil>2009-11-18 19:05:31</cachedUntil>
+            </eveapi>""".strip()
+
+        header = evelink_api.scan_response_header(xml)
+        self.assertEqual(header.current_time, 1255885531)
+        self.assertEqual(header.cached_until, 1258571131)
+        self.assertEqual(header.size, len(xml))
+        self.assertEqual(header.error_code, '203')
+        self.assertEqual(header.error_message, 'Authentication & failure.')
+
+
+class CallManyTestCase(unittest.TestCase):
+
+    def test_call_many(self):
+        error = evelink_api.APIError('1', 'failed')
+
+        def fail():
+            raise error
+
+        results = evelink_api.call_many([lambda: 1, fail, lambda: 3])
+        self.assertEqual(results, [1, error, 3])
+
+    def test_call_many_empty(self):
+        self.assertEqual(evelink_api.call_many([]), [])
+
+    def test_call_methods(self):
+        wrapper = mock.Mock()
+        wrapper.foo.return_value = mock.sentinel.foo
+        wrapper.bar.return_value = mock.sentinel.bar
+
+        results = evelink_api.call_methods(wrapper, ['foo', ('bar', {'a': 1})])
+
+        self.assertEqual(results, [mock.sentinel.foo, mock.sentinel.bar])
+        wrapper.foo.assert_called_once_with()
+        wrapper.bar.assert_called_once_with(a=1)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.001)
+
+
+class SingleFlightTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.flight = evelink_api.SingleFlight()
+        self.release = threading.Event()
+        self.calls = []
+
+    def blocking_call(self, result):
+        def call():
+            self.calls.append(result)
+            self.release.wait(5)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return call
+
+    def run_concurrently(self, func, count):
+        """Start count calls of func; return their outcomes once released."""
+        outcomes = [None] * count
+
+        def run(i):
+            try:
+                outcomes[i] = func()
+            except Exception as e:
+                outcomes[i] = e
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        threads[0].start()
+        wait_for(lambda: self.calls)
+        for thread in threads[1:]:
+            thread.start()
+        wait_for(lambda: self.flight.coalesced == count - 1)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+        return outcomes
+
+    def test_coalesced(self):
+        call = self.blocking_call('result')
+        outcomes = self.run_concurrently(lambda: self.flight.do('key', call), 4)
+        self.assertEqual(self.calls, ['result'])
+        self.assertEqual(sorted(outcomes), [('result', False)] + [('result', True)] * 3)
+        self.assertEqual(self.flight.in_progress(), 0)
+
+    def test_exception_shared(self):
+        error = urllib2.URLError('down')
+        call = self.blocking_call(error)
+        outcomes = self.run_concurrently(lambda: self.flight.do('key', call), 3)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(outcomes, [error] * 3)
+
+    def test_sequential_calls(self):
+        self.assertEqual(self.flight.do('key', lambda: 1), (1, False))
+        self.assertEqual(self.flight.do('key', lambda: 2), (2, False))
+        self.assertEqual(self.flight.coalesced, 0)
+
+    def test_api_get(self):
+        xml = """<?xml version='1.0' encoding='UTF-8'?>
+            <eveapi version="2">
+                <currentTime>2009-10-18 17:05:31</currentTime>
+                <result><foo>bar</foo></result>
+                <cachedUntil>2009-11-18 17:05:31</cachedUntil>
+            </eveapi>"""
+        transport = FakeTransport({
+            'https://api.eveonline.com/account/APIKeyInfo.xml.aspx':
+                lambda url, data: self.blocking_call(xml)(),
+        })
+        cache = evelink_api.APICache()
+        cache.put = mock.Mock(wraps=cache.put)
+        api = evelink_api.API(cache=cache, api_key=(1, 'abc'),
+                              transport=transport, single_flight=self.flight)
+
+        outcomes = self.run_concurrently(lambda: api.get('account/APIKeyInfo'), 3)
+
+        self.assertEqual(len(transport.requests), 1)
+        for result in outcomes:
+            self.assertEqual(result.result.find('foo').text, 'bar')
+        self.assertEqual(len(cache.put.mock_calls), 1)
+
+    def test_api_get_separate_caches(self):
+        xml = """<?xml version='1.0' encoding='UTF-8'?>
+            <eveapi version="2">
+                <currentTime>2009-10-18 17:05:31</currentTime>
+                <result><foo>bar</foo></result>
+                <cachedUntil>2009-11-18 17:05:31</cachedUntil>
+            </eveapi>"""
+        release = threading.Event()
+
+        def slow(url, data):
+            release.wait(5)
+            return xml
+        transport = FakeTransport({
+            'https://api.eveonline.com/account/APIKeyInfo.xml.aspx': slow,
+        })
+        apis = [evelink_api.API(api_key=(1, 'abc'), transport=transport)
+                for _ in range(2)]
+        self.assertIsNot(apis[0].single_flight, apis[1].single_flight)
+
+        threads = [threading.Thread(target=api.get, args=('account/APIKeyInfo',))
+                   for api in apis]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        # Each API has its own cache, which gets the response.
+        self.assertEqual(len(transport.requests), 2)
+        for api in apis:
+            self.assertEqual(len(api.cache), 1)
+
+    def test_api_shared_cache(self):
+        cache = evelink_api.APICache()
+        apis = [evelink_api.API(cache=cache) for _ in range(2)]
+        self.assertIs(apis[0].single_flight, apis[1].single_flight)
+
+
+class RefreshPolicyTestCase(unittest.TestCase):
+
+    XML = """<?xml version='1.0' encoding='UTF-8'?>
+        <eveapi version="2">
+            <currentTime>2009-10-18 17:05:31</currentTime>
+            <result><foo>%s</foo></result>
+            <cachedUntil>2009-10-18 18:05:31</cachedUntil>
+        </eveapi>"""
+    URL = 'https://api.eveonline.com/foo/Bar.xml.aspx'
+
+    def setUp(self):
+        self.transport = FakeTransport({self.URL: self.XML % 'fresh'})
+        self.cache = evelink_api.APICache()
+        self.api = evelink_api.API(cache=self.cache, transport=self.transport,
+            refresh_policy=evelink_api.RefreshPolicy(refresh_ahead=0.25,
+                                                     max_stale=600))
+
+    def store(self, age):
+        """Cache a response received age seconds ago, valid for an hour."""
+        xml = self.XML % 'cached'
+        current_time = evelink_api.parse_ts('2009-10-18 17:05:31')
+        header = evelink_api.CacheHeader(time.time() - age, current_time,
+            current_time + 3600, len(xml), None, None)
+        key = str(self.api.Request(self.api, 'foo/Bar', {}))
+        self.cache.put(key, evelink_api.pack_cache_entry(header, xml), 3600)
+
+    def get(self):
+        return self.api.get('foo/Bar').result.find('foo').text
+
+    def test_action(self):
+        policy = evelink_api.RefreshPolicy(refresh_ahead=0.25, max_stale=600)
+        header = evelink_api.CacheHeader(1000, 0, 3600, 0, None, None)
+        self.assertEqual(policy.action(header, now=1000), evelink_api.USE_CACHED)
+        self.assertEqual(policy.action(header, now=3699), evelink_api.USE_CACHED)
+        self.assertEqual(policy.action(header, now=3700),
+                         evelink_api.REFRESH_IN_BACKGROUND)
+        self.assertEqual(policy.action(header, now=4600),
+                         evelink_api.REFRESH_IN_BACKGROUND)
+        self.assertEqual(policy.action(header, now=5200), evelink_api.FETCH)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, evelink_api.RefreshPolicy, refresh_ahead=1)
+        self.assertRaises(ValueError, evelink_api.RefreshPolicy, max_stale=-1)
+
+    def test_fresh(self):
+        self.store(age=60)
+        self.assertEqual(self.get(), 'cached')
+        self.api.join_refreshes(5)
+        self.assertEqual(self.transport.requests, [])
+
+    def test_refresh_ahead(self):
+        self.store(age=3000)
+        self.assertEqual(self.get(), 'cached')
+        self.api.join_refreshes(5)
+        self.assertEqual(len(self.transport.requests), 1)
+        self.assertEqual(self.get(), 'fresh')
+
+    def test_stale_while_revalidate(self):
+        release = threading.Event()
+
+        def slow(url, data):
+            release.wait(5)
+            return self.XML % 'fresh'
+        self.transport.responses[self.URL] = slow
+
+        self.store(age=3900)
+        # Both requests are answered from the cache, with a single refresh.
+        self.assertEqual(self.get(), 'cached')
+        self.assertEqual(self.get(), 'cached')
+        release.set()
+        self.api.join_refreshes(5)
+        self.assertEqual(len(self.transport.requests), 1)
+        self.assertEqual(self.get(), 'fresh')
+
+    def test_too_stale(self):
+        self.store(age=4500)
+        self.assertEqual(self.get(), 'fresh')
+        self.assertEqual(len(self.transport.requests), 1)
+
+    def test_failed_refresh(self):
+        self.transport.responses[self.URL] = urllib2.URLError('down')
+        self.store(age=3900)
+        self.assertEqual(self.get(), 'cached')
+        self.api.join_refreshes(5)
+        self.assertEqual(self.get(), 'cached')
+        self.api.join_refreshes(5)
+        self.assertEqual(len(self.transport.requests), 2)
+
+    def test_cache_duration(self):
+        self.get()
+        key = str(self.api.Request(self.api, 'foo/Bar', {}))
+        expiration = self.cache.cache[key][1]
+        self.assertAlmostEqual(expiration, time.time() + 3600 + 600, delta=5)
+
 
 if __name__ == "__main__":
     unittest.main()
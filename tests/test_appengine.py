@@ -1,7 +1,12 @@
 import sys
+import time
+import types
+
 import mock
 import unittest2 as unittest
 
+import evelink
+
 try:
     from google.appengine.ext import testbed
     from google.appengine.ext import ndb
@@ -9,6 +14,7 @@ except ImportError:
     NOGAE = True
     ndb = mock.Mock()
 else:
+    from evelink import api as evelink_api
     from evelink import appengine
     from evelink import eve
     NOGAE = False
@@ -43,11 +49,33 @@ class DatastoreCacheTestCase(GAETestCase):
         self.assertEqual(cache.get('bar'), 1)
         self.assertEqual(cache.get('baz'), True)
 
+    def test_expiration_datastore(self):
+        cache = appengine.AppEngineDatastoreCache()
+        cache.put('foo', 'bar', 3600)
+        value, expiration = cache.get_with_expiration('foo')
+        self.assertEqual(value, 'bar')
+        self.assertAlmostEqual(expiration, time.time() + 3600, delta=5)
+        self.assertEqual(cache.get_with_expiration('qux'), (None, None))
+
     def test_expire_datastore(self):
         cache = appengine.AppEngineDatastoreCache()
         cache.put('baz', 'qux', -1)
         self.assertEqual(cache.get('baz'), None)
 
+    def test_multi_datastore(self):
+        cache = appengine.AppEngineDatastoreCache()
+        cache.put_multi([('foo', 'bar', 3600), ('bar', 1, 3600), ('baz', 'qux', -1)])
+        self.assertEqual(cache.get_multi(['foo', 'bar', 'baz', 'qux']),
+                         {'foo': 'bar', 'bar': 1})
+
+    def test_async_datastore(self):
+        cache = appengine.AppEngineDatastoreCache()
+        ndb.Future.wait_all([cache.put_async('foo', 'bar', 3600),
+                             cache.put_async('baz', 'qux', -1)])
+        self.assertEqual(cache.get_async('foo').get_result(), 'bar')
+        self.assertEqual(cache.get_async('baz').get_result(), None)
+        self.assertEqual(cache.get_async('missing').get_result(), None)
+
 
 class MemcacheCacheTestCase(GAETestCase):
     def setUp(self):
@@ -72,6 +100,19 @@ class MemcacheCacheTestCase(GAETestCase):
         cache.put('baz', 'qux', -1)
         self.assertEqual(cache.get('baz'), None)
 
+    def test_multi_memcache(self):
+        cache = appengine.AppEngineCache()
+        cache.put_multi([('foo', 'bar', 3600), ('bar', 1, 60), ('baz', 'qux', -1)])
+        self.assertEqual(cache.get_multi(['foo', 'bar', 'baz', 'qux']),
+                         {'foo': 'bar', 'bar': 1})
+
+    def test_async_memcache(self):
+        cache = appengine.AppEngineCache()
+        ndb.Future.wait_all([cache.put_async('foo', 'bar', 3600),
+                             cache.put_async('baz', 'qux', -1)])
+        self.assertEqual(cache.get_async('foo').get_result(), 'bar')
+        self.assertEqual(cache.get_async('baz').get_result(), None)
+
 
 class AppEngineAPITestCase(GAETestCase):
 
@@ -193,6 +234,264 @@ class AppEngineTaskletTestCase(GAETestCase):
         self.assertEqual(char, self.char)
         self.assertEqual('Test1 Corporation', char.key.get().corp_name)
 
+    def _mock_response(self, URLFetchResponse):
+        response = URLFetchResponse.return_value
+        response.contentwastruncated.return_value = False
+        response.statuscode.return_value = 200
+        response.content.return_value = self.test_xml
+        return self.testbed.get_stub('urlfetch')._Dynamic_Fetch
+
+    @mock.patch('google.appengine.api.urlfetch.urlfetch_service_pb.URLFetchResponse')
+    def test_get_async_cache(self, URLFetchResponse):
+        fetch = self._mock_response(URLFetchResponse)
+        api = appengine.AppEngineAPI()
+
+        first = api.get_async('eve/CharacterInfo', {'characterID': 1234}).get_result()
+        second = api.get_async('eve/CharacterInfo', {'characterID': 1234}).get_result()
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(first.expires, second.expires)
+        self.assertEqual(second.result.find('characterName').text, 'Test1 Character')
+
+    @mock.patch('google.appengine.api.urlfetch.urlfetch_service_pb.URLFetchResponse')
+    def test_wrapper(self, URLFetchResponse):
+        fetch = self._mock_response(URLFetchResponse)
+        client = appengine.AppEngineEVE()
+
+        @ndb.tasklet
+        def get_infos():
+            results = yield [client.character_info_from_id(char_id)
+                             for char_id in (1234, 2345, 3456)]
+            raise ndb.Return(results)
+
+        results = get_infos().get_result()
+        self.assertEqual(fetch.call_count, 3)
+        self.assertEqual([r.result['corp']['name'] for r in results],
+                         ['Test1 Corporation'] * 3)
+
+    @mock.patch('google.appengine.api.urlfetch.urlfetch_service_pb.URLFetchResponse')
+    def test_wrapper_get_many(self, URLFetchResponse):
+        self._mock_response(URLFetchResponse)
+        client = appengine.AppEngineEVE()
+
+        results = client.get_many([('character_info_from_id', {'char_id': 1234}),
+                                   'errors']).get_result()
+        self.assertEqual(results[0].result['id'], 1234)
+        # The response has no rowset of errors.
+        self.assertIsInstance(results[1], Exception)
+
+    @mock.patch('google.appengine.api.urlfetch.urlfetch_service_pb.URLFetchResponse')
+    def test_wrapper_iter(self, URLFetchResponse):
+        fetch = self._mock_response(URLFetchResponse)
+        URLFetchResponse.return_value.content.return_value = """
+            <?xml version='1.0' encoding='UTF-8'?>
+            <eveapi version="2">
+                <currentTime>2009-10-18 17:05:31</currentTime>
+                <result>
+                    <rowset name="entries" key="refID">
+                        <row date="2010-12-10 06:32:00" refID="2" refTypeID="72"
+                             ownerName1="foo" ownerID1="1" ownerName2="bar"
+                             ownerID2="2" argName1="" argID1="0" amount="-1.00"
+                             balance="10.00" reason="" />
+                        <row date="2010-12-10 06:31:00" refID="1" refTypeID="72"
+                             ownerName1="foo" ownerID1="1" ownerName2="bar"
+                             ownerID2="2" argName1="" argID1="0" amount="-1.00"
+                             balance="11.00" reason="" />
+                    </rowset>
+                </result>
+                <cachedUntil>2009-11-18 17:05:31</cachedUntil>
+            </eveapi>
+        """.strip()
+        client = appengine.AppEngineChar(1234, api=appengine.AppEngineAPI())
+
+        # The blocking iter_rows of the API must not be used.
+        with mock.patch.object(appengine.AppEngineAPI, 'iter_rows',
+                               side_effect=AssertionError):
+            result = client.iter_wallet_journal().get_result()
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual([entry['id'] for entry in result.result], [2, 1])
+
+    def test_wrapper_api(self):
+        self.assertRaises(ValueError, appengine.AppEngineChar, 1, api=evelink_api.API())
+
+
+class _FakeReturn(StopIteration):
+    pass
+
+
+class _FakeFuture(object):
+    """A completed ndb Future."""
+
+    def __init__(self, result=None, exception=None):
+        self.result = result
+        self.exception = exception
+
+    def get_result(self):
+        if self.exception is not None:
+            raise self.exception
+        return self.result
+
+
+def _fake_tasklet(func):
+    """Like ndb.tasklet, but runs the tasklet to completion at once."""
+
+    def wrapper(*args, **kwargs):
+        gen = func(*args, **kwargs)
+        if not isinstance(gen, types.GeneratorType):
+            return _FakeFuture(gen)
+        send, value = gen.send, None
+        while True:
+            try:
+                yielded = send(value)
+            except _FakeReturn as e:
+                return _FakeFuture(e.args[0] if e.args else None)
+            except StopIteration:
+                return _FakeFuture()
+            except Exception as e:
+                return _FakeFuture(exception=e)
+            try:
+                if isinstance(yielded, list):
+                    send, value = gen.send, [f.get_result() for f in yielded]
+                else:
+                    send, value = gen.send, yielded.get_result()
+            except Exception as e:
+                send, value = gen.throw, e
+    return wrapper
+
+
+class FakeMemcache(object):
+    """The memcache calls used by AppEngineCache, over a dict."""
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, time=0):
+        self.values[key] = value
+
+    def get_multi(self, keys):
+        return dict((key, self.values[key]) for key in keys
+                    if key in self.values)
+
+    def set_multi(self, mapping, time=0):
+        self.values.update(mapping)
+
+
+def _import_with_fake_sdk(memcache):
+    """Import evelink.appengine over fakes of the App Engine SDK modules."""
+    ndb = types.ModuleType('ndb')
+    ndb.Model = object
+    ndb.PickleProperty = ndb.IntegerProperty = mock.Mock()
+    ndb.tasklet = _fake_tasklet
+    ndb.Return = _FakeReturn
+    ndb.Future = _FakeFuture
+    ndb.get_context = mock.Mock()
+    ndb.get_context.return_value.memcache_get = (
+        lambda key: _FakeFuture(memcache.get(key)))
+
+    google = mock.Mock()
+    google.appengine.api.memcache = memcache
+    google.appengine.ext.ndb = ndb
+    modules = {
+        'google': google,
+        'google.appengine': google.appengine,
+        'google.appengine.api': google.appengine.api,
+        'google.appengine.api.memcache': memcache,
+        'google.appengine.api.urlfetch': google.appengine.api.urlfetch,
+        'google.appengine.ext': google.appengine.ext,
+        'google.appengine.ext.ndb': ndb,
+    }
+    previous = getattr(evelink, 'appengine', None)
+    with mock.patch.dict(sys.modules, modules):
+        sys.modules.pop('evelink.appengine', None)
+        import evelink.appengine as fake_appengine
+    if previous is not None:
+        evelink.appengine = previous
+    else:
+        del evelink.appengine
+    return fake_appengine
+
+
+class FakeSDKTestCase(unittest.TestCase):
+    """Tests of evelink.appengine run without the SDK, over fakes of
+    memcache and ndb."""
+
+    XML = """<?xml version='1.0' encoding='UTF-8'?>
+        <eveapi version="2">
+            <currentTime>2009-10-18 17:05:31</currentTime>
+            <result><foo>%s</foo></result>
+            <cachedUntil>2009-10-18 18:05:31</cachedUntil>
+        </eveapi>"""
+
+    class Wrapped(object):
+
+        def __init__(self, api):
+            self.api = api
+            # Shared with the copies the wrapper runs the methods on.
+            self.runs = []
+
+        def two_requests(self, arg):
+            self.runs.append(arg)
+            first = self.api.get('foo/First').result.find('foo').text
+            second = self.api.get('foo/Second', {'arg': arg})
+            return first, second.result.find('foo').text
+
+    def setUp(self):
+        self.memcache = FakeMemcache()
+        self.appengine = _import_with_fake_sdk(self.memcache)
+        self.api = self.appengine.AppEngineAPI()
+        self.api.get_async = mock.Mock(side_effect=self.get_async)
+
+        class Wrapper(self.appengine.AppEngineWrapper):
+            wrapped_class = self.Wrapped
+        self.wrapper = Wrapper(self.api)
+
+    def get_async(self, path, params=None):
+        if path == 'foo/Broken':
+            return _FakeFuture(exception=ValueError(path))
+        return _FakeFuture(self.api.process_response(self.XML % path))
+
+    def test_cache_expiration(self):
+        cache = self.appengine.AppEngineCache()
+        cache.put('foo', 'bar', 3600)
+        cache.put_multi([('baz', 'qux', 60)])
+        value, expiration = cache.get_with_expiration('foo')
+        self.assertEqual(value, 'bar')
+        self.assertAlmostEqual(expiration, time.time() + 3600, delta=5)
+        self.assertEqual(cache.get('baz'), 'qux')
+        self.assertEqual(cache.get_multi(['foo', 'baz', 'missing']),
+                         {'foo': 'bar', 'baz': 'qux'})
+        self.assertEqual(cache.get_async('foo').get_result(), 'bar')
+        self.assertEqual(cache.get_with_expiration('missing'), (None, None))
+
+    def test_tiered_promotion(self):
+        from evelink.cache.tiered import TieredCache
+        l1 = evelink.api.APICache()
+        self.appengine.AppEngineCache().put('foo', 'bar', 3600)
+        cache = TieredCache(l1, self.appengine.AppEngineCache())
+        self.assertEqual(cache.get('foo'), 'bar')
+        self.assertEqual(cache.promotions, 1)
+        self.assertEqual(l1.get('foo'), 'bar')
+
+    def test_wrapper_reruns_after_fetch(self):
+        result = self.wrapper.two_requests(1).get_result()
+        self.assertEqual(result, ('foo/First', 'foo/Second'))
+        self.assertEqual(self.api.get_async.mock_calls, [
+            mock.call('foo/First', None),
+            mock.call('foo/Second', {'arg': '1'}),
+        ])
+        # Once without any result, then once after each fetch.
+        self.assertEqual(self.wrapper.wrapped.runs, [1, 1, 1])
+
+    def test_wrapper_error(self):
+        self.Wrapped.broken = lambda wrapped: wrapped.api.get('foo/Broken')
+        self.addCleanup(delattr, self.Wrapped, 'broken')
+        results = self.wrapper.get_many([('two_requests', {'arg': 2}),
+                                         'broken']).get_result()
+        self.assertEqual(results[0], ('foo/First', 'foo/Second'))
+        self.assertIsInstance(results[1], ValueError)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,280 @@
+import BaseHTTPServer
+import SocketServer
+import socket
+import threading
+import time
+import urllib2
+
+import mock
+import unittest2 as unittest
+
+import evelink.api as evelink_api
+import evelink.asyncapi as evelink_async
+import evelink.transport as evelink_transport
+
+SERVER_STATUS_XML = """<?xml version='1.0' encoding='UTF-8'?>
+    <eveapi version="2">
+        <currentTime>2009-10-18 17:05:31</currentTime>
+        <result>
+            <serverOpen>True</serverOpen>
+            <onlinePlayers>38102</onlinePlayers>
+        </result>
+        <cachedUntil>2009-10-18 18:05:31</cachedUntil>
+    </eveapi>"""
+
+ERROR_XML = """<?xml version='1.0' encoding='UTF-8'?>
+    <eveapi version="2">
+        <currentTime>2009-10-18 17:05:31</currentTime>
+        <error code="123">Nope</error>
+        <cachedUntil>2009-10-18 18:05:31</cachedUntil>
+    </eveapi>"""
+
+STATUS_URL = 'https://api.eveonline.com/server/ServerStatus.xml.aspx'
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def _respond(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        try:
+            if self.path == '/slow':
+                time.sleep(0.2)
+            elif self.path == '/hang':
+                time.sleep(1)
+            if self.path == '/error':
+                self._respond(500, 'broken')
+            elif self.path == '/linger':
+                # The connection stays open after the response.
+                self._respond(200, 'done')
+                self.wfile.flush()
+                time.sleep(1)
+            elif self.path == '/truncated':
+                self.send_response(200)
+                self.send_header('Content-Length', '100')
+                self.end_headers()
+                self.wfile.write('short')
+            elif self.path == '/status':
+                self._respond(200, SERVER_STATUS_XML)
+            else:
+                self._respond(200, 'GET %s' % self.path)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self._respond(200, 'POST %s %s' % (self.path, body))
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    active = 0
+    peak = 0
+
+    def __init__(self, *args):
+        BaseHTTPServer.HTTPServer.__init__(self, *args)
+        self.lock = threading.Lock()
+
+
+class FutureTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = evelink_async.EventLoop()
+
+    def test_call_later(self):
+        calls = []
+        future = evelink_async.Future(self.loop)
+        self.loop.call_later(0.02, future.set_result, 'done')
+        self.loop.call_later(0.01, calls.append, 'first')
+        self.loop.call_later(0.01, calls.append, 'second')
+        self.loop.call_later(0.01, calls.append, 'cancelled').cancel()
+
+        self.assertEqual(future.result(), 'done')
+        self.assertEqual(calls, ['first', 'second'])
+
+    def test_callbacks(self):
+        future = evelink_async.Future(self.loop)
+        seen = []
+        future.add_done_callback(seen.append)
+        future.set_exception(ValueError('bad'))
+        future.add_done_callback(seen.append)
+
+        self.assertEqual(seen, [future, future])
+        self.assertTrue(isinstance(future.exception(), ValueError))
+        self.assertRaises(ValueError, future.result)
+        self.assertRaises(RuntimeError, future.set_result, 1)
+
+    def test_gather(self):
+        error = evelink_api.APIError('1', 'failed')
+        first = evelink_async.Future(self.loop)
+        second = evelink_async.Future(self.loop)
+        self.loop.call_later(0.01, second.set_exception, error)
+        self.loop.call_soon(first.set_result, 1)
+
+        self.assertEqual(evelink_async.gather([first, second]).result(), [1, error])
+        self.assertEqual(evelink_async.gather([]).result(), [])
+
+    def test_nothing_to_run(self):
+        future = evelink_async.Future(self.loop)
+        self.assertRaises(RuntimeError, future.result)
+
+
+class AsyncHTTPTransportTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = _Server(('127.0.0.1', 0), _Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs={'poll_interval': 0.01})
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        self.transport = evelink_async.AsyncHTTPTransport(timeout=5)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_get_and_post(self):
+        get = self.transport.send_async(self.url + '/foo?a=1')
+        post = self.transport.send_async(self.url + '/bar', 'a=1&b=2')
+        self.assertFalse(get.done())
+        self.assertEqual(post.result(), 'POST /bar a=1&b=2')
+        self.assertEqual(get.result(), 'GET /foo?a=1')
+        self.assertEqual(self.transport.send(self.url + '/baz'), 'GET /baz')
+
+    def test_concurrent(self):
+        start = time.time()
+        futures = [self.transport.send_async(self.url + '/slow') for _ in range(4)]
+        self.assertEqual(evelink_async.gather(futures).result(), ['GET /slow'] * 4)
+        # The requests are in flight together, on a single thread.
+        self.assertEqual(self.server.peak, 4)
+        self.assertTrue(time.time() - start < 0.6)
+
+    def test_per_host_limit(self):
+        transport = evelink_async.AsyncHTTPTransport(max_per_host=2)
+        futures = [transport.send_async(self.url + '/slow') for _ in range(5)]
+        self.assertEqual(evelink_async.gather(futures).result(), ['GET /slow'] * 5)
+        self.assertEqual(self.server.peak, 2)
+
+    def test_http_error(self):
+        with self.assertRaises(urllib2.HTTPError) as cm:
+            self.transport.send(self.url + '/error')
+        self.assertEqual(cm.exception.code, 500)
+        self.assertEqual(cm.exception.read(), 'broken')
+
+    def test_timeout(self):
+        transport = evelink_async.AsyncHTTPTransport(timeout=0.1)
+        with self.assertRaises(urllib2.URLError) as cm:
+            transport.send(self.url + '/hang')
+        self.assertTrue(isinstance(cm.exception.reason, socket.timeout))
+
+    def test_content_length(self):
+        transport = evelink_async.AsyncHTTPTransport(timeout=0.3)
+        self.assertEqual(transport.send(self.url + '/linger'), 'done')
+        with self.assertRaises(urllib2.URLError) as cm:
+            transport.send(self.url + '/truncated')
+        self.assertTrue('Incomplete' in str(cm.exception.reason))
+
+    def test_connection_refused(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.assertRaises(urllib2.URLError, self.transport.send, self.url + '/foo')
+
+    def test_api(self):
+        api = evelink_async.AsyncAPI(transport=self.transport)
+        with mock.patch.object(api.Request, 'absolute_url', self.url + '/status'):
+            status = evelink_async.AsyncServer(api=api).server_status()
+            self.assertEqual(status.result().result,
+                             {'online': True, 'players': 38102})
+
+
+class _DeferredTransport(evelink_transport.FakeTransport):
+    """A FakeTransport whose responses arrive on a later loop iteration."""
+
+    def __init__(self, *args, **kwargs):
+        self.loop = evelink_async.EventLoop()
+        super(_DeferredTransport, self).__init__(*args, **kwargs)
+
+    def send_async(self, url, data=None):
+        future = evelink_async.Future(self.loop)
+        self.loop.call_later(0.01, evelink_async._resolve, future, self.send, url, data)
+        return future
+
+
+class AsyncAPITestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = _DeferredTransport({
+            STATUS_URL: SERVER_STATUS_XML,
+            'https://api.eveonline.com/foo/Error.xml.aspx': ERROR_XML,
+        })
+        self.api = evelink_async.AsyncAPI(transport=self.transport)
+
+    def test_get_async(self):
+        future = self.api.get_async('server/ServerStatus')
+        self.assertFalse(future.done())
+        result, current, expires = future.result()
+        self.assertEqual(result.find('onlinePlayers').text, '38102')
+        self.assertEqual((current, expires), (1255885531, 1255889131))
+
+        # The response is cached.
+        self.assertTrue(self.api.get_async('server/ServerStatus').done())
+        self.assertEqual(len(self.transport.requests), 1)
+
+    def test_shared_in_flight(self):
+        first = self.api.get_async('server/ServerStatus')
+        second = self.api.get_async('server/ServerStatus')
+        self.assertEqual(first.result().timestamp, second.result().timestamp)
+        self.assertEqual(len(self.transport.requests), 1)
+
+    def test_api_error(self):
+        future = self.api.get_async('foo/Error')
+        self.assertEqual(future.exception().code, '123')
+        # Errors are cached too.
+        self.assertRaises(evelink_api.APIError, self.api.get, 'foo/Error')
+        self.assertEqual(len(self.transport.requests), 1)
+
+    def test_get_many(self):
+        results = self.api.get_many([('server/ServerStatus', None),
+                                     ('foo/Error', None)])
+        self.assertEqual(results[0].timestamp, 1255885531)
+        self.assertTrue(isinstance(results[1], evelink_api.APIError))
+
+    def test_blocking_transport(self):
+        transport = evelink_transport.FakeTransport({STATUS_URL: SERVER_STATUS_XML})
+        api = evelink_async.AsyncAPI(transport=transport)
+        future = api.get_async('server/ServerStatus')
+        self.assertTrue(future.done())
+        self.assertEqual(future.result().timestamp, 1255885531)
+
+    def test_wrappers(self):
+        server = evelink_async.AsyncServer(api=self.api)
+        status, again = server.get_many(['server_status', 'server_status']).result()
+        self.assertEqual(status.result, {'online': True, 'players': 38102})
+        self.assertEqual(again, status)
+        self.assertEqual(len(self.transport.requests), 1)
+
+        self.transport.responses[STATUS_URL] = urllib2.URLError('down')
+        self.api.cache.clear()
+        self.assertRaises(urllib2.URLError, server.server_status().result)
+
+    def test_wrapper_requires_async_api(self):
+        self.assertRaises(ValueError, evelink_async.AsyncChar, 1,
+            api=evelink_api.API())
+
+
+if __name__ == "__main__":
+    unittest.main()
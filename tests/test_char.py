@@ -3,6 +3,7 @@ import unittest2 as unittest
 
 import evelink.api as evelink_api
 import evelink.char as evelink_char
+import evelink.parsing.kills as evelink_kills
 from tests.utils import APITestCase
 
 
@@ -15,6 +16,18 @@ class CharTestCase(APITestCase):
         super(CharTestCase, self).setUp()
         self.char = evelink_char.Char(1, api=self.api)
 
+    def test_get_many(self):
+        self.api.get.return_value = self.make_api_result("char/wallet_info.xml")
+
+        results = self.char.get_many(['wallet_info', ('wallet_info', {})])
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(self.api.mock_calls, [
+                mock.call.get('char/AccountBalance', {'characterID': 1}),
+                mock.call.get('char/AccountBalance', {'characterID': 1}),
+            ])
+
     @mock.patch('evelink.char.parse_assets')
     def test_assets(self, mock_parse):
         self.api.get.return_value = API_RESULT_SENTINEL
@@ -23,7 +36,7 @@ class CharTestCase(APITestCase):
         result, current, expires = self.char.assets()
         self.assertEqual(result, mock.sentinel.parsed_assets)
         self.assertEqual(mock_parse.mock_calls, [
-                mock.call(mock.sentinel.api_result),
+                mock.call(mock.sentinel.api_result, 'dicts'),
             ])
         self.assertEqual(self.api.mock_calls, [
                 mock.call.get('char/AssetList', {'characterID': 1}),
@@ -31,6 +44,21 @@ class CharTestCase(APITestCase):
         self.assertEqual(current, 12345)
         self.assertEqual(expires, 67890)
 
+    def test_iter_kills(self):
+        self.api.iter_rows.return_value = self.make_api_rows("char/kills.xml")
+        expected = evelink_kills.parse_kills(
+            self.make_api_result("char/kills.xml").result)
+
+        result, current, expires = self.char.iter_kills(before_kill=12345)
+
+        self.assertEqual(dict((k['id'], k) for k in result), expected)
+        self.assertEqual(self.api.mock_calls, [
+                mock.call.iter_rows('char/KillLog',
+                    {'characterID': 1, 'beforeKillID': 12345}),
+            ])
+        self.assertEqual(current, 12345)
+        self.assertEqual(expires, 67890)
+
     @mock.patch('evelink.char.parse_contract_bids')
     def test_contract_bids(self, mock_parse):
         self.api.get.return_value = API_RESULT_SENTINEL
@@ -71,7 +99,7 @@ class CharTestCase(APITestCase):
         result, current, expires = self.char.contracts()
         self.assertEqual(result, mock.sentinel.parsed_contracts)
         self.assertEqual(mock_parse.mock_calls, [
-                mock.call(mock.sentinel.api_result),
+                mock.call(mock.sentinel.api_result, 'dicts'),
             ])
         self.assertEqual(self.api.mock_calls, [
                 mock.call.get('char/Contracts', {'characterID': 1}),
@@ -87,7 +115,7 @@ class CharTestCase(APITestCase):
         result, current, expires = self.char.wallet_journal()
         self.assertEqual(result, mock.sentinel.parsed_journal)
         self.assertEqual(mock_parse.mock_calls, [
-                mock.call(mock.sentinel.api_result),
+                mock.call(mock.sentinel.api_result, 'dicts'),
             ])
         self.assertEqual(self.api.mock_calls, [
                 mock.call.get('char/WalletJournal', {'characterID': 1}),
@@ -95,6 +123,16 @@ class CharTestCase(APITestCase):
         self.assertEqual(current, 12345)
         self.assertEqual(expires, 67890)
 
+    def test_wallet_journal_records(self):
+        self.api.get.return_value = self.make_api_result("char/wallet_journal.xml")
+
+        records, _, _ = self.char.wallet_journal(result_format='records')
+        dicts, _, _ = self.char.wallet_journal()
+
+        self.assertEqual([r._asdict() for r in records], dicts)
+        self.assertEqual(records[0].party_1.name, dicts[0]['party_1']['name'])
+        self.assertRaises(ValueError, self.char.wallet_journal, result_format='xml')
+
     def test_wallet_paged(self):
         self.api.get.return_value = self.make_api_result("char/wallet_journal.xml")
 
@@ -149,7 +187,7 @@ class CharTestCase(APITestCase):
         result, current, expires = self.char.wallet_transactions()
         self.assertEqual(result, mock.sentinel.parsed_transactions)
         self.assertEqual(mock_parse.mock_calls, [
-                mock.call(mock.sentinel.api_result),
+                mock.call(mock.sentinel.api_result, 'dicts'),
             ])
         self.assertEqual(self.api.mock_calls, [
                 mock.call.get('char/WalletTransactions', {'characterID': 1}),
@@ -204,7 +242,7 @@ class CharTestCase(APITestCase):
                 mock.call.get('char/KillLog', {'characterID': 1}),
             ])
         self.assertEqual(mock_parse.mock_calls, [
-                mock.call(mock.sentinel.api_result),
+                mock.call(mock.sentinel.api_result, 'dicts'),
             ])
 
     def test_kills_paged(self):
@@ -305,7 +343,7 @@ class CharTestCase(APITestCase):
         result, current, expires = self.char.orders()
         self.assertEqual(result, mock.sentinel.parsed_orders)
         self.assertEqual(mock_parse.mock_calls, [
-                mock.call(mock.sentinel.api_result),
+                mock.call(mock.sentinel.api_result, 'dicts'),
             ])
         self.assertEqual(self.api.mock_calls, [
                 mock.call.get('char/MarketOrders', {'characterID': 1}),
@@ -15,6 +15,18 @@ class CorpTestCase(APITestCase):
         super(CorpTestCase, self).setUp()
         self.corp = evelink_corp.Corp(api=self.api)
 
+    def test_get_many(self):
+        self.api.get.return_value = self.make_api_result("corp/wallet_info.xml")
+
+        results = self.corp.get_many(['wallet_info', ('wallet_info', {})])
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(self.api.mock_calls, [
+                mock.call.get('corp/AccountBalance'),
+                mock.call.get('corp/AccountBalance'),
+            ])
+
     def test_corporation_sheet_public(self):
         self.api.get.return_value = self.make_api_result("corp/corporation_sheet.xml")
 
@@ -152,7 +164,7 @@ class CorpTestCase(APITestCase):
                 mock.call.get('corp/KillLog', {}),
             ])
         self.assertEqual(mock_parse.mock_calls, [
-                mock.call(mock.sentinel.api_result),
+                mock.call(mock.sentinel.api_result, 'dicts'),
             ])
         self.assertEqual(current, 12345)
         self.assertEqual(expires, 67890)
@@ -197,7 +209,7 @@ class CorpTestCase(APITestCase):
         result, current, expires = self.corp.contracts()
         self.assertEqual(result, mock.sentinel.parsed_contracts)
         self.assertEqual(mock_parse.mock_calls, [
-                mock.call(mock.sentinel.api_result),
+                mock.call(mock.sentinel.api_result, 'dicts'),
             ])
         self.assertEqual(self.api.mock_calls, [
                 mock.call.get('corp/Contracts'),
@@ -249,7 +261,7 @@ class CorpTestCase(APITestCase):
         result, current, expires = self.corp.wallet_journal()
         self.assertEqual(result, mock.sentinel.parsed_journal)
         self.assertEqual(mock_parse.mock_calls, [
-                mock.call(mock.sentinel.api_result),
+                mock.call(mock.sentinel.api_result, 'dicts'),
             ])
         self.assertEqual(self.api.mock_calls, [
                 mock.call.get('corp/WalletJournal', {}),
@@ -281,7 +293,7 @@ class CorpTestCase(APITestCase):
         result, current, expires = self.corp.wallet_transactions()
         self.assertEqual(result, mock.sentinel.parsed_transactions)
         self.assertEqual(mock_parse.mock_calls, [
-                mock.call(mock.sentinel.api_result),
+                mock.call(mock.sentinel.api_result, 'dicts'),
             ])
         self.assertEqual(self.api.mock_calls, [
                 mock.call.get('corp/WalletTransactions', {}),
@@ -313,7 +325,7 @@ class CorpTestCase(APITestCase):
         result, current, expires = self.corp.orders()
         self.assertEqual(result, mock.sentinel.parsed_orders)
         self.assertEqual(mock_parse.mock_calls, [
-                mock.call(mock.sentinel.api_result),
+                mock.call(mock.sentinel.api_result, 'dicts'),
             ])
         self.assertEqual(self.api.mock_calls, [
                 mock.call.get('corp/MarketOrders'),
@@ -321,6 +333,16 @@ class CorpTestCase(APITestCase):
         self.assertEqual(current, 12345)
         self.assertEqual(expires, 67890)
 
+    def test_positional_api_result(self):
+        api_result = self.make_api_result("corp/members.xml")
+        expected = self.corp.members(True, api_result=api_result)
+        self.assertEqual(self.corp.members(True, api_result), expected)
+
+        api_result = self.make_api_result("char/wallet_journal.xml")
+        expected = self.corp.wallet_journal(api_result=api_result)
+        self.assertEqual(self.corp.wallet_journal(None, None, api_result), expected)
+        self.assertEqual(self.api.mock_calls, [])
+
     def test_faction_warfare_stats(self):
         self.api.get.return_value = self.make_api_result('corp/faction_warfare_stats.xml')
 
@@ -347,7 +369,7 @@ class CorpTestCase(APITestCase):
         result, current, expires = self.corp.assets()
         self.assertEqual(result, mock.sentinel.parsed_assets)
         self.assertEqual(mock_parse.mock_calls, [
-                mock.call(mock.sentinel.api_result),
+                mock.call(mock.sentinel.api_result, 'dicts'),
             ])
         self.assertEqual(self.api.mock_calls, [
                 mock.call.get('corp/AssetList'),
@@ -355,6 +377,64 @@ class CorpTestCase(APITestCase):
         self.assertEqual(current, 12345)
         self.assertEqual(expires, 67890)
 
+    @mock.patch('evelink.corp.parse_assets')
+    def test_assets_result_cache(self, mock_parse):
+        self.api.result_cache = evelink_api.ResultCache()
+        self.api.base_url = 'api.eveonline.com'
+        self.api.api_key = (1, 'code')
+        self.api.get.return_value = API_RESULT_SENTINEL
+        mock_parse.return_value = mock.sentinel.parsed_assets
+
+        self.corp.assets()
+        result, current, expires = self.corp.assets()
+        self.assertEqual(result, mock.sentinel.parsed_assets)
+        self.assertEqual(len(mock_parse.mock_calls), 1)
+        self.assertEqual(self.api.mock_calls, [
+                mock.call.get('corp/AssetList'),
+            ])
+
+    def test_iter_assets(self):
+        self.api.iter_rows.return_value = self.make_api_rows("corp/assets.xml")
+        expected = self.corp.assets(
+            api_result=self.make_api_result("corp/assets.xml")).result
+
+        result, current, expires = self.corp.iter_assets()
+
+        self.assertEqual(
+            sorted(item['id'] for item in result),
+            sorted(item['id'] for location in expected.values()
+                   for item in location['contents']))
+        self.assertEqual(self.api.mock_calls, [
+                mock.call.iter_rows('corp/AssetList'),
+            ])
+        self.assertEqual(current, 12345)
+        self.assertEqual(expires, 67890)
+
+    def test_iter_members(self):
+        self.api.iter_rows.return_value = self.make_api_rows("corp/members.xml")
+        expected = self.corp.members(
+            api_result=self.make_api_result("corp/members.xml")).result
+
+        result, current, expires = self.corp.iter_members()
+
+        self.assertEqual(list(result), sorted(expected.values(),
+            key=lambda m: m['id']))
+        self.assertEqual(self.api.mock_calls, [
+                mock.call.iter_rows('corp/MemberTracking', {'extended': 1}),
+            ])
+
+    def test_iter_wallet_journal(self):
+        self.api.iter_rows.return_value = self.make_api_rows("corp/wallet_journal.xml")
+        expected = self.corp.wallet_journal(
+            api_result=self.make_api_result("corp/wallet_journal.xml")).result
+
+        result, current, expires = self.corp.iter_wallet_journal(limit=10)
+
+        self.assertEqual(sorted(result, key=lambda e: e['id']), expected)
+        self.assertEqual(self.api.mock_calls, [
+                mock.call.iter_rows('corp/WalletJournal', {'rowCount': 10}),
+            ])
+
     def test_shareholders(self):
         self.api.get.return_value = self.make_api_result("corp/shareholders.xml")
 
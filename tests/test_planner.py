@@ -0,0 +1,138 @@
+import time
+
+import mock
+import unittest2 as unittest
+
+import evelink.api as evelink_api
+import evelink.char as evelink_char
+import evelink.corp as evelink_corp
+import evelink.planner as evelink_planner
+from evelink.transport import FakeTransport
+
+KEY_INFO = """<?xml version='1.0' encoding='UTF-8'?>
+<eveapi version="2">
+    <currentTime>2011-09-01 00:00:00</currentTime>
+    <result>
+        <key accessMask="%d" type="%s" expires="%s">
+            <rowset name="characters">
+                <row characterID="1" characterName="Alpha"
+                 corporationID="2" corporationName="Beta" />
+            </rowset>
+        </key>
+    </result>
+    <cachedUntil>2011-09-01 00:05:00</cachedUntil>
+</eveapi>"""
+
+RESULT = """<?xml version='1.0' encoding='UTF-8'?>
+<eveapi version="2">
+    <currentTime>2011-09-01 00:00:00</currentTime>
+    <result><rowset name="entries"/></result>
+    <cachedUntil>2011-09-01 00:30:00</cachedUntil>
+</eveapi>"""
+
+BASE = 'https://api.eveonline.com/'
+
+
+class AccessPlannerTestCase(unittest.TestCase):
+
+    def make_api(self, access_mask, key_type='Character', expires=''):
+        self.transport = FakeTransport({
+            BASE + 'account/APIKeyInfo.xml.aspx':
+                KEY_INFO % (access_mask, key_type, expires),
+            BASE + 'char/WalletJournal.xml.aspx': RESULT,
+            BASE + 'corp/WalletJournal.xml.aspx': RESULT,
+        })
+        self.planner = evelink_planner.AccessPlanner()
+        return evelink_api.API(api_key=(1, 'abc'), transport=self.transport,
+                               access_planner=self.planner)
+
+    def paths(self):
+        return [url[len(BASE):] for url, data in self.transport.requests]
+
+    def test_allowed(self):
+        api = self.make_api(2097152)
+        char = evelink_char.Char(1, api)
+        self.assertTrue(self.planner.can_call(char, 'wallet_journal'))
+        char.wallet_journal()
+        char.wallet_journal(before_id=5)
+        self.assertEqual(self.paths(), ['account/APIKeyInfo.xml.aspx',
+            'char/WalletJournal.xml.aspx', 'char/WalletJournal.xml.aspx'])
+        self.assertEqual(self.planner.saved, 0)
+
+    def test_forbidden_mask(self):
+        api = self.make_api(1)
+        char = evelink_char.Char(1, api)
+        self.assertFalse(self.planner.can_call(char, 'wallet_journal'))
+        self.assertTrue(self.planner.can_call(char, 'wallet_info'))
+        with self.assertRaises(evelink_planner.AccessDenied) as cm:
+            char.wallet_journal()
+        self.assertEqual(cm.exception.code, '200')
+        self.assertIsInstance(cm.exception, evelink_api.APIError)
+        self.assertRaises(evelink_planner.AccessDenied, char.wallet_journal)
+
+        self.assertEqual(self.paths(), ['account/APIKeyInfo.xml.aspx'])
+        self.assertEqual(self.planner.saved, 2)
+        self.assertEqual(self.planner.refused, {'char/WalletJournal': 2})
+
+    def test_other_character(self):
+        char = evelink_char.Char(3, self.make_api(2097152))
+        with self.assertRaises(evelink_planner.AccessDenied) as cm:
+            char.wallet_journal()
+        self.assertEqual(cm.exception.code, '201')
+
+    def test_key_type(self):
+        corp = evelink_corp.Corp(self.make_api(-1, 'Character'))
+        self.assertFalse(self.planner.can_call(corp, 'wallet_journal'))
+        # Public corporation sheets need no key.
+        self.assertTrue(self.planner.can_call(corp, 'corporation_sheet', corp_id=2))
+
+        corp = evelink_corp.Corp(self.make_api(1048576, 'Corporation'))
+        self.assertTrue(self.planner.can_call(corp, 'wallet_journal'))
+        self.assertFalse(self.planner.can_call(corp, 'members'))
+        self.assertFalse(self.planner.can_call(evelink_char.Char(1, corp.api),
+                                               'wallet_journal'))
+
+    def test_expired_key(self):
+        char = evelink_char.Char(1, self.make_api(-1, expires='2011-09-11 00:00:00'))
+        with self.assertRaises(evelink_planner.AccessDenied) as cm:
+            char.wallet_journal()
+        self.assertEqual(cm.exception.code, '222')
+
+    def test_invalid_key(self):
+        api = self.make_api(-1)
+        self.transport.responses[BASE + 'account/APIKeyInfo.xml.aspx'] = """
+            <eveapi version="2">
+                <currentTime>2011-09-01 00:00:00</currentTime>
+                <error code="203">Authentication failure.</error>
+                <cachedUntil>2011-09-01 01:00:00</cachedUntil>
+            </eveapi>"""
+        char = evelink_char.Char(1, api)
+        for i in range(2):
+            with self.assertRaises(evelink_planner.AccessDenied) as cm:
+                char.wallet_journal()
+            self.assertEqual(cm.exception.code, '203')
+        self.assertEqual(self.paths(), ['account/APIKeyInfo.xml.aspx'])
+
+    def test_key_info_expires(self):
+        api = self.make_api(-1)
+        self.planner.key_info(api)
+        with mock.patch('time.time', return_value=time.time() + 301):
+            self.planner.key_info(api)
+        self.assertEqual(len(self.transport.requests), 2)
+
+    def test_required_mask(self):
+        self.assertEqual(evelink_planner.required_mask('corp/MemberTracking'), 2048)
+        self.assertEqual(evelink_planner.required_mask('corp/MemberTracking',
+            {'extended': '1'}), 33554432)
+        self.assertEqual(evelink_planner.required_mask('eve/CharacterID'), None)
+
+    def test_method_tables(self):
+        for wrapper, methods in ((evelink_char.Char, evelink_planner.CHAR_METHODS),
+                                 (evelink_corp.Corp, evelink_planner.CORP_METHODS)):
+            for method, path in methods.iteritems():
+                self.assertTrue(hasattr(wrapper, method), method)
+                self.assertIsNotNone(evelink_planner.required_mask(path), path)
+
+
+if __name__ == "__main__":
+    unittest.main()
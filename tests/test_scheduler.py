@@ -0,0 +1,218 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import mock
+import unittest2 as unittest
+
+import evelink.api as evelink_api
+import evelink.scheduler as evelink_scheduler
+from evelink.transport import FakeTransport
+
+EXPIRY_XML = """<?xml version='1.0' encoding='UTF-8'?>
+    <eveapi version="2">
+        <currentTime>2009-10-18 17:05:31</currentTime>
+        %s
+        <cachedUntil>2009-10-18 18:05:31</cachedUntil>
+    </eveapi>"""
+
+
+class SchedulerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('time.time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scheduler = evelink_scheduler.Scheduler(min_interval=10,
+                                                     retry_interval=300)
+        self.calls = []
+
+    def call(self, name, cache_for=3600):
+        def call():
+            self.calls.append(name)
+            return evelink_api.APIResult(name, 5000, 5000 + cache_for)
+        return call
+
+    def test_polls_when_expired(self):
+        self.scheduler.add(1, 'a', self.call('a', 3600))
+        self.scheduler.add(1, 'b', self.call('b', 60), due=1010)
+
+        self.assertEqual(self.scheduler.run_pending(), 1)
+        self.now = 1010
+        self.assertEqual(self.scheduler.run_pending(), 1)
+        self.now = 1069
+        self.assertEqual(self.scheduler.run_pending(), 0)
+        self.now = 1070
+        self.assertEqual(self.scheduler.run_pending(), 1)
+        self.now = 4600
+        self.assertEqual(self.scheduler.run_pending(), 2)
+        self.assertEqual(self.calls, ['a', 'b', 'b', 'b', 'a'])
+        self.assertEqual(self.scheduler.runs, 5)
+
+    def test_min_interval(self):
+        job = self.scheduler.add(1, 'a', self.call('a', 0))
+        self.scheduler.run_pending()
+        self.assertEqual(job.due, 1010)
+
+    def test_errors(self):
+        errors = []
+        api_error = evelink_api.APIError(221, 'Illegal page request!', 5000, 5900)
+        self.scheduler.add(1, 'a', mock.Mock(side_effect=api_error),
+                           on_error=lambda job, e: errors.append(e))
+        self.scheduler.add(2, 'a', mock.Mock(side_effect=ValueError('boom')),
+                           on_error=lambda job, e: errors.append(e))
+        self.scheduler.run_pending()
+
+        self.assertEqual(errors[0], api_error)
+        self.assertIsInstance(errors[1], ValueError)
+        self.assertEqual(self.scheduler._jobs[(1, 'a')].due, 1900)
+        self.assertEqual(self.scheduler._jobs[(2, 'a')].due, 1300)
+        self.assertEqual(self.scheduler.errors, 2)
+
+    def cached_api(self, body, **kwargs):
+        """Return an API which has cached a response for an hour, until 4600."""
+        transport = FakeTransport({
+            'https://api.eveonline.com/foo/Bar.xml.aspx': EXPIRY_XML % body,
+        })
+        api = evelink_api.API(transport=transport, **kwargs)
+        try:
+            api.get('foo/Bar')
+        except evelink_api.APIError:
+            pass
+        return api, transport
+
+    def test_cached_response_due_at_its_expiry(self):
+        api, transport = self.cached_api('<result><foo>bar</foo></result>')
+        self.now = 3000
+        job = self.scheduler.add(1, 'a', lambda: api.get('foo/Bar'))
+        self.scheduler.run_pending()
+        self.assertEqual(len(transport.requests), 1)
+        self.assertEqual(job.due, 4600)
+
+    def test_cached_error_due_at_its_expiry(self):
+        api, transport = self.cached_api('<error code="123">Oops</error>')
+        self.now = 4000
+        job = self.scheduler.add(1, 'a', lambda: api.get('foo/Bar'))
+        self.scheduler.run_pending()
+        self.assertEqual(len(transport.requests), 1)
+        self.assertIsInstance(job.last_error, evelink_api.APIError)
+        self.assertEqual(job.due, 4600)
+
+    def test_stale_response_due_at_min_interval(self):
+        api, transport = self.cached_api('<result><foo>bar</foo></result>',
+            refresh_policy=evelink_api.RefreshPolicy(max_stale=600))
+        # The response is served stale while it is refreshed.
+        self.now = 4700
+        job = self.scheduler.add(1, 'a', lambda: api.get('foo/Bar'))
+        self.scheduler.run_pending()
+        api.join_refreshes(5)
+        self.assertEqual(len(transport.requests), 2)
+        self.assertEqual(job.due, 4710)
+
+    def test_interactive_first(self):
+        results = []
+        self.scheduler.add(1, 'background', self.call('background'), due=900)
+        self.scheduler.add(2, 'interactive', self.call('interactive'), due=950,
+            priority=evelink_scheduler.INTERACTIVE,
+            on_result=lambda job, result: results.append(result.result))
+        self.scheduler.run_pending()
+        self.assertEqual(self.calls, ['interactive', 'background'])
+        self.assertEqual(results, ['interactive'])
+
+    def test_request(self):
+        self.scheduler.add(1, 'a', self.call('a'), due=900)
+        self.scheduler.add(2, 'b', self.call('b'), due=2000)
+        self.scheduler.request(2, 'b')
+        self.scheduler.run_pending()
+        self.assertEqual(self.calls, ['b', 'a'])
+        # The job goes back to its own priority class.
+        self.assertEqual(self.scheduler._jobs[(2, 'b')].priority,
+                         evelink_scheduler.BACKGROUND)
+        self.assertEqual(self.scheduler._jobs[(2, 'b')].due, 4600)
+
+    def test_remove(self):
+        self.scheduler.add(1, 'a', self.call('a'))
+        self.scheduler.remove(1, 'a')
+        self.assertEqual(self.scheduler.run_pending(), 0)
+        self.assertEqual(len(self.scheduler), 0)
+
+    def test_per_key_fairness(self):
+        self.scheduler.add(1, 'a', self.call('1a'), due=900)
+        self.scheduler.add(1, 'b', self.call('1b'), due=910)
+        self.scheduler.add(2, 'a', self.call('2a'), due=920)
+        with self.scheduler._condition:
+            first, _ = self.scheduler._next_job(self.now)
+            self.scheduler._start_job(first)
+            second, _ = self.scheduler._next_job(self.now)
+        # Key 1 is busy with its first job, so key 2 goes next.
+        self.assertEqual((first.key, second.key), (1, 2))
+
+
+class SchedulerStateTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.path = os.path.join(self.tempdir, 'state.json')
+
+    def test_resume(self):
+        call = mock.Mock(return_value=evelink_api.APIResult(None, 0, 3600))
+        scheduler = evelink_scheduler.Scheduler(state_file=self.path)
+        scheduler.add(1, 'a', call)
+        scheduler.add(1, 'b', call, due=time.time() + 600)
+        scheduler.run_pending()
+        scheduler.save_state()
+
+        with open(self.path) as f:
+            state = json.load(f)
+        self.assertEqual(sorted(state), ['1/a', '1/b'])
+
+        restarted = evelink_scheduler.Scheduler(state_file=self.path)
+        restarted.add(1, 'a', call)
+        restarted.add(1, 'b', call)
+        restarted.add(1, 'c', call)
+        self.assertEqual(restarted.run_pending(), 1)
+        self.assertEqual(call.call_count, 2)
+        self.assertEqual(restarted._jobs[(1, 'a')].due, state['1/a'])
+        self.assertEqual(restarted._jobs[(1, 'b')].due, state['1/b'])
+
+    def test_unreadable_state(self):
+        with open(self.path, 'w') as f:
+            f.write('{')
+        scheduler = evelink_scheduler.Scheduler(state_file=self.path)
+        self.assertEqual(scheduler._saved_state, {})
+
+
+class SchedulerThreadsTestCase(unittest.TestCase):
+
+    def test_workers(self):
+        done = threading.Event()
+        results = []
+
+        def on_result(job, result):
+            results.append(job.id)
+            if len(results) == 6:
+                done.set()
+
+        scheduler = evelink_scheduler.Scheduler(workers=3, min_interval=3600)
+        for key in range(3):
+            for endpoint in ('a', 'b'):
+                scheduler.add(key, endpoint,
+                              lambda: evelink_api.APIResult(None, 0, 3600),
+                              on_result=on_result)
+        scheduler.start()
+        try:
+            self.assertTrue(done.wait(5))
+        finally:
+            scheduler.stop(5)
+        self.assertEqual(sorted(results),
+                         ['0/a', '0/b', '1/a', '1/b', '2/a', '2/b'])
+        self.assertEqual(scheduler._threads, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+import BaseHTTPServer
+import socket
+import SocketServer
+import threading
+import time
+import urllib2
+
+import mock
+import unittest2 as unittest
+
+import evelink.api as evelink_api
+import evelink.transport as evelink_transport
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def _respond(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/error':
+            self._respond(500, 'broken')
+        else:
+            self._respond(200, 'GET %s' % self.path)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self._respond(200, 'POST %s %s' % (self.path, body))
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    connections = 0
+
+
+class HTTPTransportTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = _Server(('127.0.0.1', 0), _Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs={'poll_interval': 0.01})
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        self.transport = evelink_transport.HTTPTransport(timeout=5)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keep_alive(self):
+        for i in range(3):
+            self.assertEqual(self.transport.send(self.url + '/foo?a=%d' % i),
+                             'GET /foo?a=%d' % i)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_post(self):
+        self.assertEqual(self.transport.send(self.url + '/bar', 'a=1&b=2'),
+                         'POST /bar a=1&b=2')
+
+    def test_http_error(self):
+        with self.assertRaises(urllib2.HTTPError) as cm:
+            self.transport.send(self.url + '/error')
+        self.assertEqual(cm.exception.code, 500)
+        self.assertEqual(cm.exception.read(), 'broken')
+        # The connection stays usable after an error response.
+        self.transport.send(self.url + '/foo')
+        self.assertEqual(self.server.connections, 1)
+
+    def test_reconnect_stale_connection(self):
+        stale = mock.Mock()
+        stale.request.side_effect = socket.error('connection reset')
+        self.transport._idle[('http', self.url[len('http://'):])] = [stale]
+
+        self.assertEqual(self.transport.send(self.url + '/foo'), 'GET /foo')
+        self.assertTrue(stale.close.called)
+
+    def test_connection_refused(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.assertRaises(urllib2.URLError, self.transport.send, self.url + '/foo')
+
+    def test_api(self):
+        api = evelink_api.API(base_url='unused', transport=self.transport)
+        request = api.Request(api, 'foo/Bar', {'a': 1})
+        with mock.patch.object(api.Request, 'absolute_url', self.url + '/foo/Bar'):
+            self.assertEqual(request.send(api), 'POST /foo/Bar a=1')
+
+
+class RequestsTransportTestCase(HTTPTransportTestCase):
+
+    def setUp(self):
+        if not evelink_transport._has_requests:
+            self.skipTest('requests not available')
+        super(RequestsTransportTestCase, self).setUp()
+        self.transport = evelink_transport.RequestsTransport(timeout=5)
+
+    def test_reconnect_stale_connection(self):
+        self.skipTest('stale connections are handled by urllib3')
+
+    def test_connection_refused(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.assertRaises(evelink_transport.requests.RequestException,
+                          self.transport.send, self.url + '/foo')
+
+
+class FakeTransportTestCase(unittest.TestCase):
+
+    def test_send(self):
+        error = urllib2.URLError('down')
+        transport = evelink_transport.FakeTransport({
+            'https://host/a': 'body',
+            'https://host/b': lambda url, data: 'echo %s' % data,
+            'https://host/c': error,
+        })
+        self.assertEqual(transport.send('https://host/a'), 'body')
+        self.assertEqual(transport.send('https://host/b', 'x=1'), 'echo x=1')
+        self.assertRaises(urllib2.URLError, transport.send, 'https://host/c')
+        with self.assertRaises(urllib2.HTTPError) as cm:
+            transport.send('https://host/d')
+        self.assertEqual(cm.exception.code, 404)
+        self.assertEqual(transport.requests, [
+            ('https://host/a', None),
+            ('https://host/b', 'x=1'),
+            ('https://host/c', None),
+            ('https://host/d', None),
+        ])
+
+    def test_per_host_limit(self):
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0}
+
+        def slow(url, data):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.02)
+            with lock:
+                state['active'] -= 1
+            return 'ok'
+
+        transport = evelink_transport.FakeTransport(
+            {'https://host/a': slow}, max_connections=10, max_per_host=2)
+        results = evelink_api.call_many(
+            [lambda: transport.send('https://host/a')] * 6, max_workers=6)
+        self.assertEqual(results, ['ok'] * 6)
+        self.assertEqual(state['peak'], 2)
+
+    def test_api_get(self):
+        xml = """<?xml version='1.0' encoding='UTF-8'?>
+            <eveapi version="2">
+                <currentTime>2009-10-18 17:05:31</currentTime>
+                <result><foo>bar</foo></result>
+                <cachedUntil>2009-11-18 17:05:31</cachedUntil>
+            </eveapi>"""
+        transport = evelink_transport.FakeTransport({
+            'https://api.eveonline.com/foo/Bar.xml.aspx': xml,
+        })
+        api = evelink_api.API(transport=transport, api_key=(1, 'abc'))
+
+        result = api.get('foo/Bar', {'a': 2})
+        self.assertEqual(result.result.find('foo').text, 'bar')
+        self.assertEqual(transport.requests, [
+            ('https://api.eveonline.com/foo/Bar.xml.aspx', 'a=2&keyID=1&vCode=abc'),
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,12 +7,20 @@ import mock
 import evelink.api as evelink_api
 
 
+XML_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'xml')
+
+
 def make_api_result(xml_path):
-    xml_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'xml')
-    with open(os.path.join(xml_dir, xml_path)) as f:
+    with open(os.path.join(XML_DIR, xml_path)) as f:
         return evelink_api.APIResult(ElementTree.parse(f), 12345, 67890)
 
 
+def make_api_rows(xml_path):
+    with open(os.path.join(XML_DIR, xml_path)) as f:
+        rows = evelink_api.iter_result_rows(f.read())
+    return evelink_api.APIResult(rows, 12345, 67890)
+
+
 class APITestCase(unittest.TestCase):
     def setUp(self):
         super(APITestCase, self).setUp()
@@ -20,3 +28,6 @@ class APITestCase(unittest.TestCase):
 
     def make_api_result(self, xml_path):
         return make_api_result(xml_path)
+
+    def make_api_rows(self, xml_path):
+        return make_api_rows(xml_path)